@@ -47,6 +47,16 @@
         * GE1.rtp  : guanine with ethyl-phosphate (modification located on non-bridging oxygen O1P)
 """
 
+import os
+import sys
+import json
+import time
+import tracemalloc
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
 ################################################################################################
 #
 # FUNCTIONS
@@ -391,6 +401,47 @@ def get_total_charge(merged_rtp_list):
     
     return charge
 
+def get_peak_rss():
+    # peak resident set size (MB) of the process so far (None where the resource module is missing, e.g. Windows)
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak/1024**2 if sys.platform == "darwin" else peak/1024 # bytes on macOS, kB on Linux
+
+def write_trace(stages):
+    """
+        Writes the time and memory taken by each residue to the files given by the environment
+        variables PLOT_TRACE (JSON) and PLOT_TRACE_CHROME (Chrome trace event format), if they are
+        set, in the format of the traces of the plotting scripts (see trace_stage and write_trace in
+        ../plotting/functions_for_plots.py).
+
+        Parameters:
+            stages (list[dict]) : name, start, wall time, CPU time, and peak memory of each stage
+    """
+
+    json_file = os.environ.get("PLOT_TRACE")
+    if json_file:
+        with open(json_file, "w") as f:
+            json.dump({"script"  : sys.argv[0],
+                       "argv"    : sys.argv[1:],
+                       "created" : time.strftime("%Y-%m-%dT%H:%M:%S"),
+                       "pid"     : os.getpid(),
+                       "stages"  : stages}, f, indent=4)
+
+    chrome_file = os.environ.get("PLOT_TRACE_CHROME")
+    if chrome_file:
+        events = [{"name" : stage["name"],
+                   "ph"   : "X",
+                   "ts"   : stage["start"]*1e6,
+                   "dur"  : stage["seconds"]*1e6,
+                   "pid"  : os.getpid(),
+                   "tid"  : 0,
+                   "args" : {key: value for key, value in stage.items() if key not in ["name", "start", "seconds"]}}
+                  for stage in stages]
+        events.insert(0, {"name": "process_name", "ph": "M", "pid": os.getpid(), "tid": 0, "args": {"name": os.path.basename(sys.argv[0])}})
+        with open(chrome_file, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
 ################################################################################################
 #
 # MAIN PROGRAM
@@ -398,6 +449,14 @@ def get_total_charge(merged_rtp_list):
 ################################################################################################
 
 def main():
+    # wall time, CPU time, and peak memory of each residue (see write_trace); tracemalloc only runs
+    # with PLOT_TRACE_MEMORY=1, since it slows the script down
+    stages = []
+    start  = time.perf_counter()
+    memory = bool(int(os.environ.get("PLOT_TRACE_MEMORY", 0))) and any(os.environ.get(name) for name in ["PLOT_TRACE", "PLOT_TRACE_CHROME"])
+    if memory:
+        tracemalloc.start()
+
     dimethyl_alkyl_phosphates = ["DP0", "DP1", "EP0", "EP1"]
     deoxyribonucleosides      = {"DTN" : "T",
                                  "DCN" : "C",
@@ -405,6 +464,10 @@ def main():
                                  "DGN" : "G"}
     for i in range(len(dimethyl_alkyl_phosphates)):
         for residue in deoxyribonucleosides:
+            wall, cpu = time.perf_counter(), time.process_time()
+            if memory:
+                tracemalloc.reset_peak()
+
             # CGenFF input (.mol2 files)
             dimethyl_alkyl_phosphate_mol2    = "rtp_mol2_files/" + dimethyl_alkyl_phosphates[i] + ".mol2"
             deoxyribonucleoside_mol2         = "rtp_mol2_files/" + residue + ".mol2"
@@ -428,5 +491,18 @@ def main():
                 # print the sum of charges (should be zero)
                 print("The total charge of the nucleotide is: " + str(get_total_charge(merged_rtp)) + "\n")
 
+            stages.append({"name"        : dimethyl_alkyl_phosphates[i] + " + " + residue,
+                           "depth"       : 0,
+                           "start"       : wall-start,
+                           "seconds"     : time.perf_counter()-wall,
+                           "cpu_seconds" : time.process_time()-cpu,
+                           "peak_rss_mb" : get_peak_rss()})
+            if memory:
+                stages[-1]["peak_traced_mb"] = tracemalloc.get_traced_memory()[1]/1024**2
+
+    if memory:
+        tracemalloc.stop()
+    write_trace(stages)
+
 if __name__ == "__main__": 
     main()
@@ -0,0 +1,126 @@
+"""
+    Author: Rachel Bricker
+    Year:   2025
+"""
+
+"""
+    Function file for reading .gro files, used by the index file makers and by the plotting scripts that
+    read trajectories (../plotting/functions_for_plots.py).
+
+    A .gro file has fixed columns: residue number (5 characters), residue name (5), atom name (5),
+    atom number (5), and x, y, z (8 characters each, or more if written with a higher precision),
+    followed by optional velocities. The residue and atom numbers are written modulo 100000, so
+    they wrap around in large (e.g. solvated) systems.
+
+    usage: from gro_file import read_gro_atom_table, parse_gro_atom_lines, get_atom_lookup, get_nucleobase
+"""
+
+import numpy as np
+
+# one row per atom
+GRO_ATOM_DTYPE = np.dtype([("resid",    np.int64),       # residue number (not wrapped)
+                           ("resname",  "U5"),           # residue name
+                           ("atomname", "U5"),           # atom name
+                           ("atomid",   np.int64),       # atom number (not wrapped), i.e. position in the file starting at 1, as in index files
+                           ("xyz",      np.float64, 3)]) # coordinates (measured in nm)
+
+# one-letter name of the nucleobase of the residues whose names are not (D)<base>(5 or 3): residue
+# names of other force fields and the modified nucleotides of the DNA models (see ../tleap and
+# ../construct_rtp_files); the modified phosphate residues DP0, DP1, EP0, and EP1 have no nucleobase
+NUCLEOBASE_RESIDUES = {"ADE": "A", "GUA": "G", "CYT": "C", "THY": "T", "URA": "U",
+                       "DAN": "A", "DGN": "G", "DCN": "C", "DTN": "T",
+                       "TD0": "T", "TD1": "T", "TE0": "T", "TE1": "T",
+                       "CD0": "C", "CD1": "C", "CE0": "C", "CE1": "C"}
+
+def read_gro_atom_table(path):
+    """
+        Reads the atoms of a .gro file into a structured array. The columns are parsed with NumPy
+        for all atoms at once, so large solvated systems are read at about the speed of the file
+        I/O.
+
+        Parameters:
+            path  (str)           : path to .gro file
+
+        Returns:
+            atoms (numpy.ndarray) : structured array with dtype GRO_ATOM_DTYPE, one row per atom
+            box   (numpy.ndarray) : box vectors (measured in nm) from the last line
+    """
+
+    with open(path, "rb") as f:
+        f.readline() # title
+        n_atoms = int(f.readline())
+        lines   = [f.readline() for atom in range(n_atoms)]
+        box     = np.array(f.readline().split(), dtype=np.float64)
+
+    return parse_gro_atom_lines(lines), box
+
+def parse_gro_atom_lines(lines):
+    """
+        Parses the atom lines of a .gro frame (see read_gro_atom_table), e.g. of each frame of a
+        multi-frame .gro trajectory.
+
+        Parameters:
+            lines (list[bytes])   : atom lines, with or without the line endings
+
+        Returns:
+            atoms (numpy.ndarray) : structured array with dtype GRO_ATOM_DTYPE, one row per line
+    """
+
+    n_atoms = len(lines)
+
+    # width of the coordinate fields (8 unless written with a higher precision)
+    first = lines[0][20:]
+    width = first.index(b".", first.index(b".")+1) - first.index(b".")
+
+    # fixed-width bytes of every line, split into the columns
+    columns = np.array(lines, dtype="S" + str(20+3*width)).view(np.dtype([("resid",    "S5"),
+                                                                          ("resname",  "S5"),
+                                                                          ("atomname", "S5"),
+                                                                          ("atomid",   "S5"),
+                                                                          ("xyz",      "S" + str(width), 3)]))
+
+    atoms             = np.empty(n_atoms, dtype=GRO_ATOM_DTYPE)
+    atoms["resname"]  = np.char.strip(columns["resname"].astype("U5"))
+    atoms["atomname"] = np.char.strip(columns["atomname"].astype("U5"))
+    atoms["atomid"]   = np.arange(1, n_atoms+1)
+    atoms["xyz"]      = columns["xyz"].astype(np.float64)
+
+    # residue numbers wrap from 99999 to 0
+    resid          = columns["resid"].astype(np.int64)
+    wraps          = np.concatenate(([0], np.cumsum(np.diff(resid) < -50000)))
+    atoms["resid"] = resid + 100000*wraps
+
+    return atoms
+
+def get_atom_lookup(atoms):
+    """
+        Maps the residue number and the atom name of every atom to its row in the atom table.
+
+        Parameters:
+            atoms  (numpy.ndarray) : atom table (see read_gro_atom_table)
+
+        Returns:
+            lookup (dict)          : row of each (resid, atomname)
+    """
+
+    return dict(zip(zip(atoms["resid"].tolist(), atoms["atomname"].tolist()), range(len(atoms))))
+
+def get_nucleobase(residue_name):
+    """
+        One-letter name of the nucleobase of a residue, e.g. "DG5" -> "G", "DA" -> "A", "U3" -> "U",
+        "TD0" -> "T" (see NUCLEOBASE_RESIDUES).
+
+        Parameters:
+            residue_name (str) : residue name
+
+        Returns:
+            base         (str) : "A", "C", "G", "T", or "U", or None if the residue is not a nucleotide
+    """
+
+    if residue_name in NUCLEOBASE_RESIDUES:
+        return NUCLEOBASE_RESIDUES[residue_name]
+
+    # AMBER names: D (DNA) prefix, and 5 or 3 suffix for the terminal residues
+    name = residue_name[1:] if residue_name[:1] in ["D", "R"] and len(residue_name) > 1 else residue_name
+    name = name[:-1] if name[-1:] in ["5", "3"] else name
+    return name if name in ["A", "C", "G", "T", "U"] else None
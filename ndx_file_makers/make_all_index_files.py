@@ -0,0 +1,139 @@
+"""
+    Author: Rachel Bricker
+    Year:   2025
+"""
+
+"""
+    Creates the index files of every system under a directory: for each 'em.gro' file found, the index files
+    'hbond_dist.ndx' and 'hbond_angle.ndx' (see make_hbond_index_files.py) and 'nucleobase_COM_atoms.ndx' and
+    'nucleobase_vec_atoms.ndx' (see make_nucleobase_plane_COM_index_files.py) are written next to it.
+
+    The systems are processed in parallel worker processes. The index files of a system are up to date, and
+    skipped, if they are newer than its .gro file and than the index file makers. The time taken by each system
+    is reported.
+"""
+
+"""
+   usage: python3 make_all_index_files.py
+      1. root directory searched (recursively) for .gro files
+
+   optional arguments:
+      --gro=NAME  name of the .gro files to look for (default: em.gro)
+      --jobs=N    number of worker processes (default: number of CPUs)
+      --force     also rewrite the index files that are up to date
+
+   example: python3 make_all_index_files.py \
+            /mnt/c/Users/brick/Documents/alkyl_chain_stuff/GROMACS_files/ \
+            --jobs=8
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import make_hbond_index_files
+import make_nucleobase_plane_COM_index_files
+
+# index files written for each system
+INDEX_FILES = ["hbond_dist.ndx", "hbond_angle.ndx", "nucleobase_COM_atoms.ndx", "nucleobase_vec_atoms.ndx"]
+
+# the index files are outdated if one of these programs changed
+MAKERS = [os.path.join(os.path.dirname(os.path.abspath(__file__)), name) for name in
+          ["make_hbond_index_files.py", "make_nucleobase_plane_COM_index_files.py", "gro_file.py"]]
+
+################################################################################################
+#
+# FUNCTIONS
+#
+################################################################################################
+
+def find_gro_files(root, gro_name="em.gro"):
+    # every .gro file named gro_name under root, sorted
+    gro_files = []
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories.sort()
+        if gro_name in files:
+            gro_files.append(os.path.join(directory, gro_name))
+    return sorted(gro_files)
+
+def is_up_to_date(gro_path):
+    # True if every index file of the system exists and is newer than the .gro file and the makers
+    output_dir = os.path.dirname(gro_path)
+    try:
+        oldest_output = min(os.path.getmtime(os.path.join(output_dir, name)) for name in INDEX_FILES)
+    except OSError:
+        return False
+    return oldest_output >= max(os.path.getmtime(path) for path in [gro_path] + MAKERS)
+
+def make_system_index_files(gro_path):
+    """
+        Writes the index files of one system (run in a worker process).
+
+        Parameters:
+            gro_path (str)          : path to .gro file; the index files are written in its directory
+
+        Returns:
+            timings  (list[float])  : time (measured in s) taken by make_hbond_index_files and by
+                                      make_nucleobase_plane_COM_index_files
+    """
+
+    output_dir = os.path.dirname(gro_path) + "/"
+
+    start = time.perf_counter()
+    make_hbond_index_files.make_hbond_index_files(gro_path, None, output_dir)
+    middle = time.perf_counter()
+    make_nucleobase_plane_COM_index_files.make_index_files(gro_path, None, output_dir)
+    end = time.perf_counter()
+
+    return [middle-start, end-middle]
+
+def make_all_index_files(root, gro_name="em.gro", jobs=None, force=False):
+    gro_files = find_gro_files(root, gro_name)
+    if not gro_files:
+        sys.exit("Error: no " + gro_name + " file under " + root)
+
+    todo = [gro_path for gro_path in gro_files if force or not is_up_to_date(gro_path)]
+    for gro_path in gro_files:
+        if gro_path not in todo:
+            print(gro_path + ": up to date")
+
+    start  = time.perf_counter()
+    failed = 0
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(make_system_index_files, gro_path): gro_path for gro_path in todo}
+        for future in as_completed(futures):
+            try:
+                hbond_time, nucleobase_time = future.result()
+                print(futures[future] + ": %.2f s (hydrogen bond index files %.2f s, nucleobase index files %.2f s)" % (hbond_time+nucleobase_time, hbond_time, nucleobase_time))
+            except (Exception, SystemExit) as error: # a failing system does not stop the others
+                failed += 1
+                print(futures[future] + ": FAILED (" + str(error) + ")")
+
+    print(str(len(todo)-failed) + " systems written, " + str(len(gro_files)-len(todo)) + " up to date, " + str(failed) + " failed in %.2f s" % (time.perf_counter()-start))
+    if failed:
+        sys.exit(1)
+
+################################################################################################
+#
+# MAIN PROGRAM
+#
+################################################################################################
+
+def main():
+    # command line input
+    positional = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    options    = dict(arg[2:].partition("=")[::2] for arg in sys.argv[1:] if arg.startswith("--"))
+    for name in options:
+        if name not in ["gro", "jobs", "force"]:
+            sys.exit("unknown option: --" + name + " (options: --gro, --jobs, --force)")
+
+    root     = str(positional[0])
+    gro_name = options.get("gro") or "em.gro"
+    jobs     = int(options["jobs"]) if options.get("jobs") else None
+    force    = "force" in options
+
+    make_all_index_files(root, gro_name, jobs, force)
+
+if __name__ == "__main__":
+    main()
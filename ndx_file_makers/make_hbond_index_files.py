@@ -5,37 +5,43 @@
 
 """
     Creates index files 'hbond_dist.ndx' and 'hbond_angle.ndx' which are used as input for GROMACS utilities 'distance' and 'angle', respectively.
-    
+
+    The base pairs are found from the coordinates: the ring nitrogen atoms (N1 of purines, N3 of pyrimidines) within
+    PAIR_CUTOFF of each other are found with a cell list, and two nucleotides are paired if their nucleobases are
+    complementary (G-C, A-T, or A-U) and they are not neighbors in the same strand (the ring nitrogen atoms of
+    stacked neighbors are about 0.35 nm apart). Each nucleotide is paired with at most one other nucleotide (the
+    closest one), so mismatches, overhangs, hairpins, single strands, and systems with several duplexes are handled;
+    unpaired nucleotides are reported and left out.
+
     THIS CODE REQUIRES:
         * ENERGY MINIMIZATION TO BE PERFORMED. HENCE, IT USES THE .gro FILE OUTPUTTED BY THE
           MDRUN THAT CARRIED OUT ENERGY MINIMIZATION
-        * DNA IS DOUBLE STRANDED
 """
 
 """
    usage: python3 make_hbond_index_files.py
       1. path to .gro file outputted by the mdrun that carried out energy minimization
-      2. number of base pairs in duplex
+      2. (optional) only consider the residues 1 to this residue id (default: all nucleotides)
       3. output directory
-   
+
    example: python3 make_hbond_index_files.py \
             /mnt/c/Users/brick/Documents/alkyl_chain_stuff/GROMACS_files/AMBER/dsDNA1/em.gro \
-            42 \
             /mnt/c/Users/brick/Documents/alkyl_chain_stuff/GROMACS_files/AMBER/dsDNA1/
 """
 
 import sys
 import numpy as np
+from gro_file import read_gro_atom_table, get_atom_lookup, get_nucleobase
 
-# command line input
-input_gro_file_path = str(sys.argv[1])
-max_residue_id      = int(sys.argv[2])
-output_dir          = str(sys.argv[3])
+# maximum distance (nm) between the ring nitrogen atoms of a base pair in the energy-minimized structure
+# (about 0.29 nm in a Watson-Crick base pair, about 0.35 nm between stacked nucleobases)
+PAIR_CUTOFF = 0.32
 
-# add trailing forward slash to directory path if necessary
-output_dir_split = output_dir.split("/")
-if output_dir_split[-1] != "":
-    output_dir = output_dir + "/"
+# maximum length (nm) of the O3'-P bond between consecutive nucleotides of a strand
+BACKBONE_BOND_CUTOFF = 0.2
+
+# complementary nucleobases
+COMPLEMENTARY = {("G", "C"), ("C", "G"), ("A", "T"), ("T", "A"), ("A", "U"), ("U", "A")}
 
 ################################################################################################
 #
@@ -43,89 +49,192 @@ if output_dir_split[-1] != "":
 #
 ################################################################################################
 
+def get_ring_nitrogens(atoms, lookup, max_residue_id=None):
+    """
+        Finds the nitrogen atom in the nucleobase ring of each nucleotide that is used to
+        characterize hydrogen bonding (N1 for purines, N3 for pyrimidines). Only the N1, N3, and N9
+        atoms are looked at, so the solvent does not slow down the search.
+
+        Parameters:
+            atoms          (numpy.ndarray) : atom table (see read_gro_atom_table)
+            lookup         (dict)          : row of each (residue id, atom name) (see get_atom_lookup)
+            max_residue_id (int)           : only consider the residues 1 to max_residue_id (None for all)
+
+        Returns:
+            rows           (numpy.ndarray) : row of the ring nitrogen atom of each nucleotide
+            bases          (list[str])     : one-letter name of the nucleobase of each nucleotide
+    """
+
+    rows  = []
+    bases = []
+    for residue_id in np.unique(atoms["resid"][np.isin(atoms["atomname"], ["N1", "N3"])]).tolist():
+        if max_residue_id is not None and not (1 <= residue_id <= max_residue_id):
+            continue
+        base = get_nucleobase(atoms["resname"][lookup.get((residue_id, "N1"), lookup.get((residue_id, "N3")))])
+        if base is None:
+            continue    # not a nucleotide
+
+        # if N9 atom is in residue, then nucleobase is purine
+        nitrogen = "N1" if (residue_id, "N9") in lookup else "N3"
+        if (residue_id, nitrogen) in lookup:
+            rows.append(lookup[(residue_id, nitrogen)])
+            bases.append(base)
+
+    return np.array(rows, dtype=np.int64), bases
+
+def get_close_pairs(xyz, cutoff, box=None):
+    """
+        Finds the pairs of points closer than a cutoff with a cell list: the points are sorted into
+        cubic cells of side at least the cutoff, so only the points of the same and of neighboring
+        cells are compared.
+
+        Parameters:
+            xyz       (numpy.ndarray) : coordinates (measured in nm), shape (points, 3)
+            cutoff    (float)         : maximum distance (measured in nm)
+            box       (numpy.ndarray) : lengths of a rectangular periodic box (measured in nm), or None
+                                        for no periodic boundary conditions
+
+        Returns:
+            pairs     (numpy.ndarray) : indices (i < j) of the pairs, shape (pairs, 2)
+            distances (numpy.ndarray) : distance of each pair
+    """
+
+    if box is None:
+        origin  = xyz.min(axis=0)
+        n_cells = np.maximum(1, np.floor((xyz.max(axis=0) - origin)/cutoff).astype(np.int64) + 1)
+        cells   = np.floor((xyz - origin)/cutoff).astype(np.int64)
+    else:
+        n_cells = np.maximum(1, np.floor(box/cutoff).astype(np.int64))
+        cells   = np.floor((xyz % box)/box*n_cells).astype(np.int64) % n_cells
+
+    cell_points = {}
+    for point, cell in enumerate(map(tuple, cells.tolist())):
+        cell_points.setdefault(cell, []).append(point)
+
+    offsets    = [(dx, dy, dz) for dx in [-1, 0, 1] for dy in [-1, 0, 1] for dz in [-1, 0, 1]]
+    candidates = set()
+    for cell, points in cell_points.items():
+        for offset in offsets:
+            neighbor = tuple(np.add(cell, offset) % n_cells) if box is not None else tuple(np.add(cell, offset))
+            for i in points:
+                for j in cell_points.get(neighbor, []):
+                    if i < j:
+                        candidates.add((i, j))
+
+    pairs = np.array(sorted(candidates), dtype=np.int64).reshape(-1, 2)
+    diff  = xyz[pairs[:, 1]] - xyz[pairs[:, 0]]
+    if box is not None:
+        diff -= box*np.round(diff/box)    # minimum image
+    distances = np.linalg.norm(diff, axis=1)
+
+    return pairs[distances <= cutoff], distances[distances <= cutoff]
+
+def get_strand_neighbors(atoms, lookup, rows, box=None):
+    """
+        Finds the consecutive nucleotides (residue ids i and i+1) that are neighbors in the same strand.
+        They are neighbors if the O3' atom of the first one is bonded to the P atom of the second one;
+        if the .gro file has no backbone atoms, they are neighbors unless the first one is a 3'
+        terminal residue or the second one is a 5' terminal residue (AMBER names, e.g. "DC3" and "DG5").
+
+        Parameters:
+            atoms     (numpy.ndarray) : atom table (see read_gro_atom_table)
+            lookup    (dict)          : row of each (residue id, atom name) (see get_atom_lookup)
+            rows      (numpy.ndarray) : row of the ring nitrogen atom of each nucleotide, ordered by
+                                        residue id (see get_ring_nitrogens)
+            box       (numpy.ndarray) : lengths of a rectangular periodic box (measured in nm), or None
+
+        Returns:
+            neighbors (set[tuple[int]]) : indices (i, i+1) (into rows) of the neighboring nucleotides
+    """
+
+    residue_ids = atoms["resid"][rows].tolist()
+
+    neighbors = set()
+    for i in range(len(rows)-1):
+        first, second = residue_ids[i], residue_ids[i+1]
+        if second != first + 1:
+            continue
+
+        if (first, "O3'") in lookup and (second, "P") in lookup:
+            diff = atoms["xyz"][lookup[(second, "P")]] - atoms["xyz"][lookup[(first, "O3'")]]
+            if box is not None:
+                diff -= box*np.round(diff/box)    # minimum image
+            bonded = np.linalg.norm(diff) <= BACKBONE_BOND_CUTOFF
+        else:
+            bonded = not (atoms["resname"][rows[i]].endswith("3") or atoms["resname"][rows[i+1]].endswith("5"))
+
+        if bonded:
+            neighbors.add((i, i+1))
+
+    return neighbors
+
+def get_base_pairs(atoms, rows, bases, box=None, cutoff=PAIR_CUTOFF, neighbors=frozenset()):
+    """
+        Pairs the nucleotides whose ring nitrogen atoms are close and whose nucleobases are
+        complementary, leaving out the neighbors in the same strand (see get_strand_neighbors). The
+        closest pairs are taken first, so each nucleotide is in at most one base pair.
+
+        Returns:
+            base_pairs (list[tuple[int]]) : indices (into rows) of the two nucleotides of each base
+                                            pair, ordered by the first nucleotide
+    """
+
+    pairs, distances = get_close_pairs(atoms["xyz"][rows], cutoff, box)
+
+    paired     = set()
+    base_pairs = []
+    for i, j in pairs[np.argsort(distances, kind="stable")].tolist():
+        if i in paired or j in paired or (bases[i], bases[j]) not in COMPLEMENTARY or (i, j) in neighbors:
+            continue
+        paired.update([i, j])
+        base_pairs.append((i, j))
+
+    return sorted(base_pairs)
+
 def make_hbond_index_files(input_gro_file_path, max_residue_id, output_dir):
-    # initialize dictionary which will track the atom id of the nitrogen atom in the nucleobase ring
-    # in each residue that we will use to characterize hydrogen bonding
-    atoms = {}
+    # atom table of the .gro file and the row of each (residue id, atom name)
+    atoms, box = read_gro_atom_table(input_gro_file_path)
+    lookup     = get_atom_lookup(atoms)
 
     ################################################
-    # read input .gro file
-
-    with open(input_gro_file_path, "r") as f:
-        # initialize residue id tracker
-        residue_id = 1
-        
-        # initialize residue name tracker
-        residue_name = None
-        
-        # initialize ring type tracker
-        purine = False
-
-        for line in f:
-            line_split = line.split()
-            if len(line_split) > 1:    # make sure line isn't empty
-                
-                # check if we are at the next residue
-                if (line_split[0] != residue_name) and (residue_name != None):
-                    residue_id += 1        # increment residue id tracker
-                    purine = False         # reset ring type tracker
-                    if residue_id >= (max_residue_id+1):
-                        break    # if we have iterated through the entire DNA duplex, then stop reading lines
-                
-                
-                if line_split[0][0:len(str(residue_id))] == str(residue_id):
-                    residue_name = line_split[0]    # get residue name
-                    if line_split[1] == 'N9':
-                        purine = True    # if N9 atom is in residue, then nucleobase is purine
-                    elif (line_split[1] == 'N3') and (not purine):
-                        atoms[residue_name] = line_split[2]    # N3 atom is the nitrogen atom in the nucleobase ring for pyrimidines, so record the atom ID
-                    elif (line_split[1] == 'N1') and purine: 
-                        atoms[residue_name] = line_split[2]    # N1 atom is the nitrogen atom in the nucleobase ring for purines, so record the atom ID
+    # find the base pairs
+
+    rows, bases = get_ring_nitrogens(atoms, lookup, max_residue_id)
+
+    # only rectangular boxes are treated as periodic
+    rectangular = len(box) == 3 or not np.any(box[3:])
+    box         = box[:3] if rectangular else None
+    neighbors   = get_strand_neighbors(atoms, lookup, rows, box)
+    base_pairs  = get_base_pairs(atoms, rows, bases, box, neighbors=neighbors)
+
+    paired   = rows[np.ravel(base_pairs)] if base_pairs else rows[:0]
+    unpaired = sorted(set(atoms["resid"][rows].tolist()) - set(atoms["resid"][paired].tolist()))
+    print(input_gro_file_path + ": " + str(len(base_pairs)) + " base pairs, " + str(len(rows) - 2*len(base_pairs)) + " unpaired nucleotides" +
+          (" (residues " + ", ".join(str(residue_id) for residue_id in unpaired) + ")" if unpaired else ""))
 
     ################################################
     # create index files
-    
-    # list of all recorded atom IDs
-    all_ids = list(atoms.values())
-    
-    # list of all recorded residue names
-    all_resi_names = list(atoms.keys())
-    
-    # compute midpoint (essentially the number of nucleotides/residues in each strand)
-    mid_point = len(all_ids)//2
-    
-    # list of all recorded atom IDs in the first strand
-    first_strand_ids = all_ids[:mid_point]
-    
-    # list of all recorded residue names in the first strand
-    first_strand_resi_names = all_resi_names[:mid_point]
-    
-    # list of all recorded atom IDs in the second strand
-    second_strand_ids = all_ids[mid_point:]
-    
-    # reverse list so that it is the reverse-complement counterpart of first_strand_ids
-    second_strand_ids.reverse()
-    
-    
+
     file_name = "hbond_dist.ndx"    # file used as input for GROMACS utility 'distance'
     with open(output_dir + file_name, "w+") as output:
         output.write("[ H_BOND_FOR_DIST ]\n")
-        for i in range(mid_point):
+        for i, j in base_pairs:
             # write the atom ids of the nitrogen atoms in each base pair
-            output.write(first_strand_ids[i] + " " + second_strand_ids[i] + "\n")
+            output.write(str(atoms["atomid"][rows[i]]) + " " + str(atoms["atomid"][rows[j]]) + "\n")
 
     file_name = "hbond_angle.ndx"    # file used as input for GROMACS utility 'angle'
     with open(output_dir + file_name, "w+") as output:
         output.write("[ H_BOND_FOR_ANGLE ]\n")
-        for i in range(mid_point):
-            if 'G' in first_strand_resi_names[i] or 'T' in first_strand_resi_names[i]:
-                # if the nucleobase of the first strand is guanine or thymine, then the first strand contains the donor/hydrogen;
-                # thus, use the atom id of the nitrogen atom in the first strand to obtain the atom id of the hydrogen atom
-                output.write(str(int(first_strand_ids[i])+1) + " " + first_strand_ids[i] + " " + second_strand_ids[i] + "\n")
-            else:
-                # else, the nucleobase of the second strand is guanine or thymine, meaning that the second strand contains the donor/hydrogen;
-                # thus, use the atom id of the nitrogen atom in the second strand to obtain the atom id of the hydrogen atom
-                output.write(str(int(second_strand_ids[i])+1) + " " + second_strand_ids[i] + " " + first_strand_ids[i] + "\n")
+        for i, j in base_pairs:
+            # guanine, thymine, or uracil is the donor of the hydrogen bond between the nitrogen atoms
+            donor, acceptor = (i, j) if bases[i] in "GTU" else (j, i)
+
+            # the hydrogen atom is bonded to the nitrogen atom of the donor (H1 of guanine, H3 of thymine or uracil)
+            residue_id = atoms["resid"][rows[donor]]
+            hydrogen   = "H1" if bases[donor] == "G" else "H3"
+            if (residue_id, hydrogen) not in lookup:
+                sys.exit("Error: no " + hydrogen + " atom in residue " + str(residue_id) + " of " + input_gro_file_path)
+            output.write(str(atoms["atomid"][lookup[(residue_id, hydrogen)]]) + " " + str(atoms["atomid"][rows[donor]]) + " " + str(atoms["atomid"][rows[acceptor]]) + "\n")
 
 ################################################################################################
 #
@@ -134,7 +243,17 @@ def make_hbond_index_files(input_gro_file_path, max_residue_id, output_dir):
 ################################################################################################
 
 def main():
+    # command line input
+    input_gro_file_path = str(sys.argv[1])
+    max_residue_id      = int(sys.argv[2]) if len(sys.argv) > 3 else None
+    output_dir          = str(sys.argv[-1])
+
+    # add trailing forward slash to directory path if necessary
+    output_dir_split = output_dir.split("/")
+    if output_dir_split[-1] != "":
+        output_dir = output_dir + "/"
+
     make_hbond_index_files(input_gro_file_path, max_residue_id, output_dir)
 
-if __name__ == "__main__": 
+if __name__ == "__main__":
     main()
@@ -13,7 +13,7 @@
 
 """
    usage: python3 make_nucleobase_plane_COM_index_files.py
-      1. total number of nucleotides
+      1. total number of nucleotides (0 to use every residue with the ring atoms N1 and N3)
       2. path to .gro file outputted by the mdrun that carried out energy minimization
       3. output directory
    
@@ -25,16 +25,7 @@
 
 import sys
 import numpy as np
-
-# command line input
-max_residue_id = int(sys.argv[1])
-path           = str(sys.argv[2])
-output_dir     = str(sys.argv[3])
-
-# add trailing forward slash to directory path if necessary
-output_dir_split = output_dir.split("/")
-if output_dir_split[-1] != "":
-    output_dir = output_dir + "/"
+from gro_file import read_gro_atom_table
 
 ################################################################################################
 #
@@ -42,60 +33,50 @@ if output_dir_split[-1] != "":
 #
 ################################################################################################
 
-def make_index_files(path, max_residue_id):
+def write_index_file(output_dir, file_name, groups):
+    # writes one group per residue, named RESI_1, RESI_2, ...
+    with open(output_dir + file_name, "w+") as output:
+        for resi_ID, group in enumerate(groups, start=1):
+            output.write("[ RESI_" + str(resi_ID) + " ]\n")
+            output.write(" ".join(str(atom) for atom in group) + "\n")
+
+def make_index_files(path, max_residue_id, output_dir):
     nucleobase_atoms = ["C2", "C4", "C5", "C6", "C7", "C8", "C5M", "N1", "N2", "N3", "N4", "N6", "N7", "N9", "O2", "O4", "O6"]
-    atoms_COM        = {}
     thymine          = ["O2", "O4"]
     adenine          = ["N6", "C8"]
     guanine          = ["O6", "C8"]
     cytosine         = ["O2", "N4"]
-    atoms_vec        = {}
-
-    with open(path, "r") as f:
-        residue_id   = 1
-        residue_name = None
-        for line in f:
-            line_split = line.split()
-            if len(line_split) > 1:
-                if line_split[0] != residue_name and residue_name != None:
-                    residue_id += 1
-                    if residue_id >= max_residue_id+1:
-                        break
-                if line_split[0][0:len(str(residue_id))] == str(residue_id):
-                    residue_name = line_split[0]
-                    
-                    if line_split[1] in nucleobase_atoms:
-                        atoms_COM.setdefault(residue_name, []).append(line_split[2])
-                    
-                    if ( ('A' in residue_name and line_split[1] in adenine)  or
-                         ('T' in residue_name and line_split[1] in thymine)  or
-                         ('G' in residue_name and line_split[1] in guanine)  or
-                         ('C' in residue_name and line_split[1] in cytosine) ):
-                        atoms_vec.setdefault(residue_name, []).append(line_split[2])
-
-    file_name = "nucleobase_COM_atoms.ndx"
-    with open(output_dir + file_name, "w+") as output:
-        resi_ID = 1
-        for residue in atoms_COM:
-            output.write("[ RESI_" + str(resi_ID) + " ]\n")
-            for atom in atoms_COM[residue]:
-                if atom != atoms_COM[residue][-1]:
-                    output.write(atom + " ")
-                else:
-                    output.write(atom + "\n")
-            resi_ID += 1
-
-    file_name = "nucleobase_vec_atoms.ndx"
-    with open(output_dir + file_name, "w+") as output:
-        resi_ID = 1
-        for residue in atoms_vec:
-            output.write("[ RESI_" + str(resi_ID) + " ]\n")
-            for atom in atoms_vec[residue]:
-                if atom != atoms_vec[residue][-1]:
-                    output.write(atom + " ")
-                else:
-                    output.write(atom + "\n")
-            resi_ID += 1
+
+    atoms, box = read_gro_atom_table(path)
+
+    # atoms of the nucleotides (residues 1 to max_residue_id, or every residue with the ring atoms N1
+    # and N3 if max_residue_id is None), ordered by residue then by atom number
+    if max_residue_id is None:
+        nucleotides = np.intersect1d(atoms["resid"][atoms["atomname"] == "N1"], atoms["resid"][atoms["atomname"] == "N3"])
+        atoms       = atoms[np.isin(atoms["resid"], nucleotides)]
+    else:
+        atoms = atoms[(atoms["resid"] >= 1) & (atoms["resid"] <= max_residue_id)]
+    atoms = atoms[np.lexsort((atoms["atomid"], atoms["resid"]))]
+
+    atoms_COM = []
+    atoms_vec = []
+    for residue in np.split(atoms, np.flatnonzero(np.diff(atoms["resid"]))+1):
+        residue_name = residue["resname"][0]
+        atom_names   = residue["atomname"]
+
+        vec_atoms = []
+        for base, base_atoms in [('A', adenine), ('T', thymine), ('G', guanine), ('C', cytosine)]:
+            if base in residue_name:
+                vec_atoms = vec_atoms + base_atoms
+
+        # residues without nucleobase atoms (e.g. ions) are skipped
+        for groups, names in [(atoms_COM, nucleobase_atoms), (atoms_vec, vec_atoms)]:
+            group = residue["atomid"][np.isin(atom_names, names)]
+            if len(group) > 0:
+                groups.append(group)
+
+    write_index_file(output_dir, "nucleobase_COM_atoms.ndx", atoms_COM)
+    write_index_file(output_dir, "nucleobase_vec_atoms.ndx", atoms_vec)
 
 ################################################################################################
 #
@@ -104,7 +85,17 @@ def make_index_files(path, max_residue_id):
 ################################################################################################
 
 def main():
-    make_index_files(path, max_residue_id)
+    # command line input
+    max_residue_id = int(sys.argv[1]) or None
+    path           = str(sys.argv[2])
+    output_dir     = str(sys.argv[3])
+
+    # add trailing forward slash to directory path if necessary
+    output_dir_split = output_dir.split("/")
+    if output_dir_split[-1] != "":
+        output_dir = output_dir + "/"
+
+    make_index_files(path, max_residue_id, output_dir)
 
 if __name__ == "__main__": 
     main()
@@ -0,0 +1,279 @@
+"""
+    Author: Rachel Bricker
+    Year:   2025
+"""
+
+"""
+    Times and memory-profiles each stage of the plotting scripts on synthetic inputs (see make_synthetic_data.py)
+    and saves the results as JSON, so that two runs on the same machine (e.g. before and after a change) can be
+    compared stage by stage.
+
+    Stages:
+        * parse hbond.xvg, parse gyrate.xvg, parse L-BPS .dat, parse em.gro : reading the inputs (without the
+          binary cache of read_xvg_file_cached)
+        * get_hbond_existence                    : plot_hbond.get_hbond_existence
+        * pack .xvg files                        : open_nucleobase_coord_store on the first run, which packs
+                                                   the .xvg files of `traj` into a store of
+                                                   NUCLEOBASE_COORD_STORE_DIR
+        * get_data (stacking)                    : plot_stacking.get_data on the coordinate store, i.e. xi
+                                                   and the stacking counts, one window of frames at a time
+        * moving_average                         : the two smoothing passes of plot_data
+        * render time series, savefig time series: drawing (Agg) and saving (.svg) the figure of plot_data
+        * plot_color_map                         : drawing and saving the hydrogen bond color map
+
+    Each stage is run --repeat times; the wall and CPU times of every run are recorded. The peak memory of a stage
+    is measured in one more run with tracemalloc (which slows the stage down, so it is not timed), together with
+    the peak resident set size of the process after the stage.
+"""
+
+"""
+   usage: python3 benchmark_plots.py
+      1. path to output .json file
+
+   optional arguments:
+      --frames=N      number of frames of each scenario (default: 20000)
+      --base-pairs=N  number of base pairs (default: 21)
+      --scenarios=N   number of scenarios (default: 3)
+      --repeat=N      number of timed runs of each stage (default: 3)
+      --data-dir=DIR  directory of the synthetic inputs; they are written if DIR does not hold inputs made
+                      with the same parameters, and kept (default: a temporary directory, removed at the end)
+      --compare=FILE  .json file of an earlier run to compare with: the ratio of the median times of each
+                      stage is printed, and the exit status is 1 if a stage got slower by more than the
+                      tolerance
+      --tolerance=X   relative slowdown reported as a regression (default: 0.2, i.e. 20 %)
+
+   example: python3 benchmark_plots.py before.json --frames=50000 --data-dir=/tmp/synthetic
+            (change the code)
+            python3 benchmark_plots.py after.json --frames=50000 --data-dir=/tmp/synthetic --compare=before.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import importlib
+import tempfile
+import tracemalloc
+import numpy as np
+from functions_for_plots import *
+from make_synthetic_data import make_synthetic_data
+
+# slowdowns (measured in s) below this are timing noise, not regressions
+MIN_REGRESSION_SECONDS = 0.01
+
+################################################################################################
+#
+# FUNCTIONS
+#
+################################################################################################
+
+def import_script(name, argv):
+    # the plotting scripts read their command line when they are imported
+    saved_argv = sys.argv
+    sys.argv   = [name + ".py"] + [str(arg) for arg in argv]
+    try:
+        return importlib.import_module(name)
+    finally:
+        sys.argv = saved_argv
+
+def get_synthetic_data(data_dir, n_frames, n_base_pairs, n_scenarios):
+    # scenario directories of the synthetic inputs in data_dir, written unless made with the same parameters
+    parameters = {"frames": n_frames, "base_pairs": n_base_pairs, "scenarios": n_scenarios}
+    try:
+        with open(os.path.join(data_dir, "synthetic_data.json")) as f:
+            existing = json.load(f)
+        if all(existing.get(key) == value for key, value in parameters.items()):
+            return [os.path.join(data_dir, "scenario_" + str(scenario+1)) for scenario in range(n_scenarios)]
+    except (OSError, ValueError):
+        pass
+
+    print("Writing synthetic inputs to " + data_dir + " ...")
+    return make_synthetic_data(data_dir, n_frames, n_base_pairs, n_scenarios)
+
+def benchmark_stage(name, stage, repeat, setup=None):
+    """
+        Times a stage and measures its peak memory.
+
+        Parameters:
+            name    (str)      : name of the stage
+            stage   (function) : runs the stage (no arguments); its return value is returned
+            repeat  (int)      : number of timed runs
+            setup   (function) : run before every run of the stage, without being timed (e.g. to remove
+                                 a cache the stage would otherwise use)
+
+        Returns:
+            result  (dict)     : wall and CPU time (measured in s) of every run, their medians, the peak
+                                 memory allocated by the stage (MB, from tracemalloc), and the peak
+                                 resident set size of the process after the stage (MB)
+            output             : return value of the stage (from the last run)
+    """
+
+    seconds     = []
+    cpu_seconds = []
+    for run in range(repeat):
+        if setup is not None:
+            setup()
+        start_wall = time.perf_counter()
+        start_cpu  = time.process_time()
+        stage()
+        cpu_seconds.append(time.process_time()-start_cpu)
+        seconds.append(time.perf_counter()-start_wall)
+
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    output      = stage()
+    peak_traced = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    result = {"name"               : name,
+              "seconds"            : seconds,
+              "cpu_seconds"        : cpu_seconds,
+              "median_seconds"     : float(np.median(seconds)),
+              "median_cpu_seconds" : float(np.median(cpu_seconds)),
+              "peak_traced_mb"     : peak_traced/1024**2,
+              "peak_rss_mb"        : get_peak_rss()}
+    print("%-32s %9.3f s (CPU %9.3f s) %10.1f MB allocated (peak)" % (name, result["median_seconds"], result["median_cpu_seconds"], result["peak_traced_mb"]))
+
+    return result, output
+
+def run_benchmark(paths, n_base_pairs, repeat):
+    """
+        Runs every stage on the scenario directories (see the description above).
+
+        Returns:
+            stages (list[dict]) : result of each stage (see benchmark_stage)
+    """
+
+    n_residues = 2*n_base_pairs
+    legend     = ",".join("(" + chr(ord("a")+scenario) + ")" for scenario in range(len(paths)))
+    plot_hbond    = import_script("plot_hbond",    [legend, "hbond.xvg", "hbond_angle.xvg", 0, 9.1, 1, 0] + paths)
+    plot_stacking = import_script("plot_stacking", [legend, "com_files", "vec_files", n_residues, 1] + paths)
+    plot_x3DNA    = import_script("plot_x3DNA",    [legend, 0, "L-BPS", "twist", "Twist"] + [os.path.join(path, "x3DNA") for path in paths])
+
+    stages = []
+    def run(name, stage, setup=None):
+        result, output = benchmark_stage(name, stage, repeat, setup)
+        stages.append(result)
+        return output
+
+    ################################################
+    # parse the inputs
+
+    def parse_hbond():
+        distances = [read_xvg_file(os.path.join(path, "hbond.xvg"))[0][:, 1:] for path in paths]
+        angles    = [read_xvg_file(os.path.join(path, "hbond_angle.xvg"))[0][:, 1:] for path in paths]
+        return distances, angles
+    distances, angles = run("parse hbond.xvg", parse_hbond)
+    run("parse gyrate.xvg", lambda: [read_xvg_file(os.path.join(path, "gyrate.xvg")) for path in paths])
+    run("parse L-BPS .dat", lambda: [plot_x3DNA.get_data(os.path.join(path, "x3DNA", "L-BPS"), ["twist"]) for path in paths])
+    run("parse em.gro", lambda: [gro_file.read_gro_atom_table(os.path.join(path, "em.gro")) for path in paths])
+
+    ################################################
+    # analyses
+
+    hbond_bool_matrix = run("get_hbond_existence", lambda: plot_hbond.get_hbond_existence(distances, angles))
+
+    def remove_coord_stores():
+        for path in paths:
+            store = get_nucleobase_coord_store(get_nucleobase_coord_sources(path, n_residues, "com_files", "vec_files"), path)
+            if store is not None:
+                shutil.rmtree(store, ignore_errors=True)
+    run("pack .xvg files", lambda: [open_nucleobase_coord_store(path, n_residues, "com_files", "vec_files") for path in paths], setup=remove_coord_stores)
+    frame_time, n_broken_stacking, consecutive_stacked = run("get_data (stacking)", lambda: plot_stacking.get_data(paths, n_residues, "com_files", "vec_files", True, plot_stacking.strand_lengths))
+    y_smoothed = run("moving_average", lambda: smooth_data(n_broken_stacking)[-1])
+
+    ################################################
+    # figures
+
+    set_rcParameters()
+    def draw_time_series():
+        plt.close("all")
+        fig, ax = plt.subplots(1, figsize=(5, 3.1))
+        for i in range(len(y_smoothed)):
+            ax.plot(frame_time, y_smoothed[i], label=legend.split(",")[i])
+        ax.legend(loc="center left", bbox_to_anchor=(1, 0.5))
+        ax.grid()
+        fig.canvas.draw()
+        return fig
+    fig = run("render time series", draw_time_series)
+    run("savefig time series", lambda: fig.savefig("benchmark_time_series.svg", bbox_inches="tight", dpi=600))
+    plt.close("all")
+
+    def draw_color_map():
+        plot_hbond.plot_color_map(frame_time, hbond_bool_matrix, n_base_pairs, False, set_rcParameters())
+        plt.close("all")
+    run("plot_color_map", draw_color_map)
+
+    return stages
+
+def compare_benchmarks(old, new, tolerance):
+    # prints the ratio of the median times of each stage; True if a stage got slower by more than tolerance
+    if old["parameters"] != new["parameters"]:
+        print("Warning: the runs used different parameters: " + json.dumps(old["parameters"]) + " and " + json.dumps(new["parameters"]))
+
+    old_stages = {stage["name"]: stage for stage in old["stages"]}
+    regression = False
+    print("\n%-32s %10s %10s %8s" % ("stage", "before (s)", "after (s)", "ratio"))
+    for stage in new["stages"]:
+        if stage["name"] not in old_stages:
+            continue
+        before = old_stages[stage["name"]]["median_seconds"]
+        after  = stage["median_seconds"]
+        ratio  = after/before if before > 0 else float("inf")
+        slower = (ratio > 1+tolerance) and (after-before > MIN_REGRESSION_SECONDS)
+        regression |= slower
+        print("%-32s %10.3f %10.3f %8.2f%s" % (stage["name"], before, after, ratio, "  REGRESSION" if slower else ""))
+
+    return regression
+
+################################################################################################
+#
+# MAIN PROGRAM
+#
+################################################################################################
+
+def main():
+    # command line input
+    argv, options = split_command_line(sys.argv[1:], {"frames": 20000, "base_pairs": 21, "scenarios": 3, "repeat": 3,
+                                                      "data_dir": "", "compare": "", "tolerance": 0.2})
+    output_file   = os.path.abspath(str(argv[0]))
+    parameters    = {"frames": options["frames"], "base_pairs": options["base_pairs"], "scenarios": options["scenarios"], "repeat": options["repeat"]}
+
+    # synthetic inputs and the figures of the stages are written in the data directory
+    temp_dir = None
+    data_dir = options["data_dir"]
+    if not data_dir:
+        temp_dir = tempfile.TemporaryDirectory()
+        data_dir = temp_dir.name
+    os.makedirs(data_dir, exist_ok=True)
+    paths = get_synthetic_data(data_dir, options["frames"], options["base_pairs"], options["scenarios"])
+
+    cwd = os.getcwd()
+    os.chdir(data_dir)
+    try:
+        stages = run_benchmark(paths, options["base_pairs"], options["repeat"])
+    finally:
+        os.chdir(cwd)
+        if temp_dir is not None:
+            temp_dir.cleanup()
+
+    result = {"created"    : time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "machine"    : {"platform": platform.platform(), "processor": platform.processor(), "cpus": os.cpu_count(),
+                              "python": platform.python_version(), "numpy": np.__version__, "matplotlib": importlib.import_module("matplotlib").__version__},
+              "parameters" : parameters,
+              "stages"     : stages}
+    with open(output_file, "w") as f:
+        json.dump(result, f, indent=4)
+    print("Results written to " + output_file)
+
+    if options["compare"]:
+        with open(options["compare"]) as f:
+            old = json.load(f)
+        if compare_benchmarks(old, result, options["tolerance"]):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,56 @@
 # usage: from functions_for_plots import *
 # Author: Rachel Bricker
 
-import matplotlib.pyplot as plt
+import io
+import os
+import copy
+import sys
+import re
+import json
+import time
+import shutil
+import hashlib
+import functools
+import zipfile
+import importlib
+import tracemalloc
+import numpy as np
 import statistics
-import matplotlib.font_manager as font_manager
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+class LazyModule:
+    """
+        Stands in for a module that is only imported when one of its attributes is first used (e.g.
+        plt.subplots), so that the scripts run with --stats-only never import matplotlib, which is slow
+        to import on a node without a warm font cache. Submodules not imported by the module itself
+        are imported on first use as well (e.g. mpl.ticker).
+    """
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attribute):
+        module = importlib.import_module(self._name)
+        try:
+            return getattr(module, attribute)
+        except AttributeError:
+            return importlib.import_module(self._name + "." + attribute)
+
+plt          = LazyModule("matplotlib.pyplot")
+font_manager = LazyModule("matplotlib.font_manager")
+
+# readers of .xtc trajectories (this directory) and of .gro files (../ndx_file_makers, shared with the
+# index file makers), only imported by the scripts that read trajectories
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ndx_file_makers"))
+xtc_file = LazyModule("xtc_file")
+gro_file = LazyModule("gro_file")
+
+# legend font of a worker of run_figures.py, which sets the rcParams once and restores them after
+# every figure; set_rcParameters then only returns a copy of it (None outside the workers)
+WORKER_FONT_LEG = None
 
 def set_rcParameters():
     """
@@ -14,6 +61,9 @@ def set_rcParameters():
             font_leg : for setting the font for legends
     """
     
+    if WORKER_FONT_LEG is not None:
+        return WORKER_FONT_LEG.copy()
+
     font_size    = 8
     font_leg     = font_manager.FontProperties(family="Arial", style='normal', size=font_size)
     widths       = 1
@@ -38,29 +88,1110 @@ def set_rcParameters():
     
     return font_leg
 
-def read_xvg_file(file):
+def split_command_line(argv, defaults):
+    """
+        Separates the optional arguments, given as `--name=value` (or `--name` for switches), from
+        the positional arguments of a script.
+
+        Parameters:
+            argv       (list[str]) : command line arguments (without the script name)
+            defaults   (dict)      : default value of every optional argument; the value given on
+                                     the command line is converted to the type of the default
+                                     (e.g. `--chunk-size=1000` sets "chunk_size" to 1000)
+
+        Returns:
+            positional (list[str]) : positional arguments
+            options    (dict)      : value of every optional argument
+    """
+
+    positional = []
+    options    = dict(defaults)
+    for arg in argv:
+        if not arg.startswith("--"):
+            positional.append(arg)
+            continue
+
+        name, has_value, value = arg[2:].partition("=")
+        name = name.replace("-", "_")
+        if name not in defaults:
+            sys.exit("unknown option: --" + name.replace("_", "-") + " (options: " + ", ".join("--" + key.replace("_", "-") for key in defaults) + ")")
+
+        default = defaults[name]
+        if isinstance(default, bool):
+            options[name] = (not has_value) or value.lower() in ["1", "true", "yes"]
+        elif default is None:
+            options[name] = value
+        else:
+            options[name] = type(default)(value)
+
+    return positional, options
+
+# per-stage timing and memory of the scripts (see trace_stage), enabled with environment variables:
+#     PLOT_TRACE        : path to the .json trace, written when the outermost stage (main) ends
+#     PLOT_TRACE_CHROME : path to the same trace in the Chrome trace event format (chrome://tracing, Perfetto)
+#     PLOT_TRACE_MEMORY : set to 1 to also measure the peak memory allocated in each stage with tracemalloc
+#                         (which slows the stages down)
+# relative paths are relative to the working directory, so every job of run_figures.py writes its own trace
+TRACE_FILES = ["PLOT_TRACE", "PLOT_TRACE_CHROME"]
+
+# trace being recorded (see trace_stage); None while no traced stage is running
+TRACE = None
+
+def get_peak_rss():
+    # peak resident set size (MB) of the process so far (None where the resource module is missing, e.g. Windows)
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak/1024**2 if sys.platform == "darwin" else peak/1024 # bytes on macOS, kB on Linux
+
+class trace_stage:
+    """
+        Records the wall time, CPU time, and memory of a named stage of a script, as a context manager
+        (`with trace_stage("read .xvg files"): ...`) or as a decorator (`@trace_stage("main")`). Stages
+        may be nested; the trace is written when the outermost one ends (see PLOT_TRACE). When tracing
+        is disabled, a stage only looks up the environment variables and records nothing.
+
+        Each stage of the trace holds:
+            name            (str)   : name of the stage
+            depth           (int)   : number of stages it is nested in
+            start           (float) : start time (measured in s) from the start of the outermost stage
+            seconds         (float) : wall time (measured in s)
+            cpu_seconds     (float) : CPU time of the process (measured in s)
+            peak_rss_mb     (float) : peak resident set size of the process at the end of the stage (MB)
+            peak_traced_mb  (float) : peak memory allocated while the stage ran (MB, from tracemalloc;
+                                      only with PLOT_TRACE_MEMORY=1)
+            error           (str)   : exception that ended the stage (only if one did)
+    """
+
+    def __init__(self, name):
+        self.name   = name
+        self.record = None
+
+    def __call__(self, function):
+        @functools.wraps(function)
+        def traced_function(*args, **kwargs):
+            with trace_stage(self.name):
+                return function(*args, **kwargs)
+        return traced_function
+
+    def __enter__(self):
+        global TRACE
+        if TRACE is None:
+            if not any(os.environ.get(name) for name in TRACE_FILES):
+                return self
+            memory = bool(int(os.environ.get("PLOT_TRACE_MEMORY", 0)))
+            TRACE  = {"start"       : time.perf_counter(),
+                      "stages"      : [],
+                      "stack"       : [],
+                      "memory"      : memory,
+                      "tracemalloc" : memory and not tracemalloc.is_tracing()} # started here (and stopped at the end)
+            if TRACE["tracemalloc"]:
+                tracemalloc.start()
+
+        if TRACE["memory"]:
+            # the peak so far belongs to the enclosing stages; the peak of this stage starts now
+            peak = tracemalloc.get_traced_memory()[1]
+            for record in TRACE["stack"]:
+                record["peak_traced"] = max(record["peak_traced"], peak)
+            tracemalloc.reset_peak()
+
+        self.record = {"name"        : self.name,
+                       "depth"       : len(TRACE["stack"]),
+                       "wall"        : time.perf_counter(),
+                       "cpu"         : time.process_time(),
+                       "peak_traced" : 0}
+        TRACE["stack"].append(self.record)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        global TRACE
+        if self.record is None:
+            return False
+        cpu_seconds = time.process_time()-self.record["cpu"]
+        seconds     = time.perf_counter()-self.record["wall"]
+        record      = TRACE["stack"].pop()
+        self.record = None
+
+        stage = {"name"        : record["name"],
+                 "depth"       : record["depth"],
+                 "start"       : record["wall"]-TRACE["start"],
+                 "seconds"     : seconds,
+                 "cpu_seconds" : cpu_seconds,
+                 "peak_rss_mb" : get_peak_rss()}
+        if TRACE["memory"]:
+            stage["peak_traced_mb"] = max(record["peak_traced"], tracemalloc.get_traced_memory()[1])/1024**2
+        if exc_type is not None:
+            stage["error"] = exc_type.__name__
+        TRACE["stages"].append(stage)
+
+        if not TRACE["stack"]:
+            trace = TRACE
+            TRACE = None
+            if trace["tracemalloc"]:
+                tracemalloc.stop()
+            write_trace(trace["stages"])
+        return False
+
+def write_trace(stages):
+    """
+        Writes the stages recorded by trace_stage to the files given by PLOT_TRACE (JSON) and
+        PLOT_TRACE_CHROME (Chrome trace event format: one complete event per stage, in microseconds).
+
+        Parameters:
+            stages (list[dict]) : recorded stages (see trace_stage)
+    """
+
+    stages = sorted(stages, key=lambda stage: (stage["start"], stage["depth"]))
+
+    json_file = os.environ.get("PLOT_TRACE")
+    if json_file:
+        with open(json_file, "w") as f:
+            json.dump({"script"  : sys.argv[0],
+                       "argv"    : sys.argv[1:],
+                       "created" : time.strftime("%Y-%m-%dT%H:%M:%S"),
+                       "pid"     : os.getpid(),
+                       "stages"  : stages}, f, indent=4)
+
+    chrome_file = os.environ.get("PLOT_TRACE_CHROME")
+    if chrome_file:
+        events = [{"name" : stage["name"],
+                   "ph"   : "X",
+                   "ts"   : stage["start"]*1e6,
+                   "dur"  : stage["seconds"]*1e6,
+                   "pid"  : os.getpid(),
+                   "tid"  : 0,
+                   "args" : {key: value for key, value in stage.items() if key not in ["name", "start", "seconds"]}}
+                  for stage in stages]
+        events.insert(0, {"name": "process_name", "ph": "M", "pid": os.getpid(), "tid": 0, "args": {"name": os.path.basename(sys.argv[0])}})
+        with open(chrome_file, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+# binary cache of parsed .xvg files (see read_xvg_file_cached), configured with environment variables:
+#     XVG_CACHE_DIR    : directory holding the cache entries (set to an empty string to disable the cache)
+#     XVG_CACHE_MAX_MB : size cap of the cache in MB; the least recently used entries are evicted first
+#     XVG_CACHE_HASH   : set to 1 to also key the entries by a hash of the file content
+XVG_CACHE_DIR      = os.environ.get("XVG_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "alkyl_paper_scripts", "xvg"))
+XVG_CACHE_MAX_SIZE = float(os.environ.get("XVG_CACHE_MAX_MB", 4096))*(1024**2)
+XVG_CACHE_HASH     = bool(int(os.environ.get("XVG_CACHE_HASH", 0)))
+
+# patterns used to recover the title, axis labels, and column legends from the '@' lines of a .xvg file
+XVG_METADATA_PATTERNS = {"title"  : re.compile(r'^@\s+title\s+"(.*)"'),
+                         "xaxis"  : re.compile(r'^@\s+xaxis\s+label\s+"(.*)"'),
+                         "yaxis"  : re.compile(r'^@\s+yaxis\s+label\s+"(.*)"'),
+                         "legend" : re.compile(r'^@\s+(?:s(\d+)\s+legend|legend\s+string\s+(\d+))\s+"(.*)"')}
+
+def parse_xvg_header_line(line, metadata):
+    """
+        Records the title, axis label, or column legend stored in an '@' line of a .xvg file.
+
+        Parameters:
+            line     (str)  : line of the .xvg file starting with '@'
+            metadata (dict) : metadata of the .xvg file (see read_xvg_file), updated in place
+    """
+
+    for key, pattern in XVG_METADATA_PATTERNS.items():
+        match = pattern.match(line)
+        if match is None:
+            continue
+        if key == "legend":
+            # legends are written as `@ s<n> legend "..."` (or `@ legend string <n> "..."` in older
+            # versions of GROMACS), where <n> is the data set, i.e. column n+1 of the data
+            set_id  = int(match.group(1) if match.group(1) is not None else match.group(2))
+            legends = metadata["legends"]
+            legends.extend([None]*(set_id+1-len(legends)))
+            legends[set_id] = match.group(3)
+        else:
+            metadata[key] = match.group(1)
+        return
+
+def parse_fixed_width_xvg_body(body, block_size=512):
+    """
+        Converts the data lines of a .xvg file to an array without creating a Python float for
+        every value.
+
+        GROMACS writes every column of a .xvg file with a fixed printf format (e.g. "%12.3f" for
+        time and "%13.7f" for the data), so every line has the same length and the decimal point
+        of each column is always at the same position. In that case, the characters form a
+        (frames x line width) matrix, and every column can be decoded with a handful of array
+        operations. The decoded values are identical to float(), because each value is the
+        division of an exact integer mantissa by an exact power of ten.
+
+        Parameters:
+            body       (bytes)              : data lines of a .xvg file (no '#' or '@' lines)
+            block_size (int)                : number of lines decoded at once (small blocks keep
+                                              the intermediate arrays in the CPU cache)
+
+        Returns:
+            data       (numpy.ndarray|None) : 2D float64 array (frames x columns), or None if the
+                                              lines are not written in a fixed-width layout
+    """
+
+    chars = np.frombuffer(body, dtype=np.uint8)
+    if chars.size == 0 or chars[-1] != ord("\n"):
+        return None
+
+    # every line must have the same width
+    width = int(np.argmax(chars == ord("\n"))) + 1
+    if chars.size % width:
+        return None
+    lines = chars.reshape(-1, width)
+
+    # use the first line to locate the columns: each column ends at the first space after its
+    # decimal point and starts where the previous column ended
+    first = lines[0]
+    dots  = np.flatnonzero(first == ord("."))
+    if dots.size == 0:
+        return None
+    ends = np.empty_like(dots)
+    for col, d in enumerate(dots):
+        e = d + 1
+        while e < width-1 and first[e] != ord(" "):
+            e += 1
+        ends[col] = e
+    starts = np.concatenate(([0], ends[:-1]))
+    n_frac = ends - dots - 1
+    if (n_frac < 1).any() or (dots-starts < 1).any() or (ends-starts-1 > 15).any():
+        return None # no digits on one side of the decimal point, or too many digits for a float64
+
+    # character positions that must hold a digit (the fractional part and the ones digit), and
+    # the positions of the integer part (spaces, an optional minus sign, then digits)
+    required = np.zeros(width, dtype=bool)
+    integer  = np.zeros(width, dtype=bool)
+    for col in range(dots.size):
+        required[dots[col]-1:ends[col]] = True
+        required[dots[col]]             = False
+        integer[starts[col]:dots[col]]  = True
+    integer  = np.flatnonzero(integer)
+    pairs    = np.diff(integer) == 1 # neighbouring positions inside the same integer part
+    breaks   = np.concatenate((starts[1:], [width-1])) # whitespace between columns and the newline
+
+    # consecutive columns with the same layout are decoded together
+    groups = []
+    for col in range(dots.size):
+        layout = (ends[col]-starts[col], dots[col]-starts[col])
+        if groups and groups[-1][2] == layout:
+            groups[-1][1] = col+1
+        else:
+            groups.append([col, col+1, layout])
+
+    # buffers reused by every block
+    data     = np.empty((lines.shape[0], dots.size))
+    values   = np.empty((min(block_size, lines.shape[0]), width), dtype=np.uint8)
+    digit    = np.empty(values.shape, dtype=bool)
+    mantissa = [np.empty((values.shape[0], last_col-first_col), dtype=np.int64) for first_col, last_col, layout in groups]
+
+    for block_start in range(0, lines.shape[0], block_size):
+        block = lines[block_start:block_start+block_size]
+        n     = block.shape[0]
+        np.subtract(block, np.uint8(ord("0")), out=values[:n]) # non-digit characters wrap around to values > 9
+        np.less(values[:n], 10, out=digit[:n])
+
+        # verify that the block has the same layout as the first line
+        if ( (not digit[:n].all(axis=0)[required].all()) or
+             (not (block[:, dots] == ord(".")).all()) or
+             (not ((block[:, breaks] == ord(" ")) | (block[:, breaks] == ord("\n"))).all()) ):
+            return None
+        integer_chars = block[:, integer]
+        integer_digit = integer_chars - np.uint8(ord("0")) < 10
+        if not ((integer_chars == ord(" ")) | (integer_chars == ord("-")) | integer_digit).all():
+            return None
+        # inside an integer part, a minus sign or digit must be followed by a digit
+        if ((integer_chars[:, :-1] != ord(" ")) & ~integer_digit[:, 1:]).any(axis=0)[pairs].any():
+            return None
+
+        # build the integer mantissa of every column digit by digit (Horner's method) and divide
+        # it by the power of ten given by the number of decimals
+        np.multiply(values[:n], digit[:n], out=values[:n])
+        for group, (first_col, last_col, (field_width, dot_offset)) in enumerate(groups):
+            s      = starts[first_col]
+            fields = values[:n, s:s+(last_col-first_col)*field_width].reshape(n, last_col-first_col, field_width)
+            acc    = mantissa[group][:n]
+            acc[:] = fields[:, :, 0]
+            for position in range(1, field_width):
+                if position == dot_offset:
+                    continue
+                acc *= 10
+                acc += fields[:, :, position]
+            np.divide(acc, 10.0**n_frac[first_col:last_col], out=data[block_start:block_start+n, first_col:last_col])
+
+        # apply minus signs
+        minus_rows, minus_positions = np.divmod(np.flatnonzero(integer_chars == ord("-")), integer.size)
+        data[block_start+minus_rows, np.searchsorted(starts, integer[minus_positions], side="right")-1] *= -1
+
+    return data
+
+def read_xvg_file(file, dtype=np.float64):
     """
         Gets data from a .xvg file from GROMACS. Function is based off of code from:
         https://github.com/kulasinski/python-for-gromacs/blob/master/xvgplot.py
 
         Parameters:
-            file (xvg file)          : MD simulation analysis script from GROMACS
+            file     (str or file)   : path to (or open file of) a MD simulation analysis output
+                                       from GROMACS
+            dtype    (numpy.dtype)   : data type of the returned array (numpy.float64 or
+                                       numpy.float32)
 
         Returns:
-            data (list[list[float]]) : list which stores each line of the input file as a list which
-                                       stores each column of that line as an element
+            data     (numpy.ndarray) : contiguous 2D array which stores each line of the input file
+                                       as a row and each column of that line as an element
+            metadata (dict)          : title ("title"), axis labels ("xaxis" and "yaxis"), and
+                                       column legends ("legends"; the i-th legend labels column
+                                       i+1 of data) given in the '@' lines of the input file
     """
 
-    data = []
-    for line in file:
-        if line[0] in ['#','@']: # ignore title, labels, and comments in file
+    if hasattr(file, "read"):
+        content = file.read()
+        if isinstance(content, str):
+            content = content.encode()
+    else:
+        with open(file, "rb") as f:
+            content = f.read()
+
+    metadata = {"title": None, "xaxis": None, "yaxis": None, "legends": []}
+
+    # title, labels, and comments are written at the top of the file
+    position = 0
+    while position < len(content) and content[position:position+1] in [b"#", b"@", b"\n"]:
+        next_line = content.find(b"\n", position)
+        if next_line == -1:
+            next_line = len(content)
+        line = content[position:next_line].decode()
+        if line.startswith("@"):
+            parse_xvg_header_line(line, metadata)
+        position = next_line+1
+    body = content[position:]
+
+    # title, labels, and comments in between the data lines
+    if (b"#" in body) or (b"@" in body):
+        for line in body.decode().splitlines():
+            if line.startswith("@"):
+                parse_xvg_header_line(line, metadata)
+
+    return np.ascontiguousarray(parse_xvg_body(body), dtype=dtype), metadata
+
+def iter_xvg_file(file, chunk_size=4096, columns=None, stride=1, dtype=np.float64, watermark=None):
+    """
+        Reads a .xvg file from GROMACS in chunks of frames, so that the memory used does not depend
+        on the length of the trajectory. Reading starts at a watermark (see get_xvg_watermark), so
+        that only the lines appended since an earlier read are parsed. A last line that is not
+        terminated yet (i.e. still being written) is left for the next read.
+
+        Parameters:
+            file       (str)           : path to a MD simulation analysis output from GROMACS
+            chunk_size (int)           : maximum number of frames per chunk (counted after striding);
+                                         if 0, all new frames are yielded as one chunk, and a file
+                                         read from the start is loaded through the binary cache (see
+                                         read_xvg_file_cached) and kept in memory for the other
+                                         figures drawn by the process (see read_shared_input)
+            columns    (list[int])     : columns to keep (column 0 is time); all columns are kept if
+                                         None
+            stride     (int)           : only read every stride-th frame, counted from the first
+                                         frame of the file
+            dtype      (numpy.dtype)   : data type of the chunks
+            watermark  (dict)          : where an earlier read stopped (None to read the whole file)
+
+        Yields:
+            chunk      (numpy.ndarray) : contiguous 2D array (frames x columns) of the next frames
+            watermark  (dict)          : watermark after the chunk
+    """
+
+    if watermark is None:
+        watermark = {"offset": 0, "n_frames": 0}
+    offset   = watermark["offset"]
+    n_frames = watermark["n_frames"]
+
+    def parse_chunk(lines):
+        chunk = parse_xvg_body(b"".join(lines))
+        if columns is not None:
+            chunk = chunk[:, columns]
+        return np.ascontiguousarray(chunk, dtype=dtype)
+
+    with open(file, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        if size > 0:
+            f.seek(size-1)
+        complete = f.read(1) == b"\n" # no line is being written
+        f.seek(offset)
+
+        if chunk_size == 0 and offset == 0 and complete:
+            # whole file at once, through the cache
+            data, metadata = read_shared_input(read_xvg_file_cached, file)
+            if os.path.getsize(file) == size: # not appended to while it was read
+                if len(data):
+                    chunk = data[::stride] if columns is None else data[::stride, columns]
+                    yield np.ascontiguousarray(chunk, dtype=dtype), get_xvg_watermark(file, size, len(data))
+                return
+
+        if chunk_size == 0 and stride == 1:
+            # parse all complete new lines at once
+            content = f.read()
+            content = content[:content.rfind(b"\n")+1]
+            if re.search(rb"^[ \t]*[^#@\s]", content, flags=re.M): # at least one new data line
+                data, metadata = read_xvg_file(io.BytesIO(content))
+                if columns is not None:
+                    data = data[:, columns]
+                yield np.ascontiguousarray(data, dtype=dtype), get_xvg_watermark(file, offset+len(content), n_frames+len(data))
+            return
+
+        lines = []
+        for line in f:
+            if not line.endswith(b"\n"): # still being written
+                break
+            offset += len(line)
+            if line[:1] in [b"#", b"@"] or not line.strip(): # ignore title, labels, comments, and empty lines
+                continue
+            if n_frames % stride == 0:
+                lines.append(line)
+            n_frames += 1
+            if chunk_size and len(lines) == chunk_size:
+                yield parse_chunk(lines), get_xvg_watermark(file, offset, n_frames)
+                lines = []
+        if lines:
+            yield parse_chunk(lines), get_xvg_watermark(file, offset, n_frames)
+
+def parse_xvg_body(body):
+    """
+        Converts the data lines of a .xvg file to an array.
+
+        Parameters:
+            body (bytes)         : data lines of a .xvg file
+
+        Returns:
+            data (numpy.ndarray) : 2D float64 array (frames x columns)
+    """
+
+    data = None
+    if (b"#" not in body) and (b"@" not in body):
+        data = parse_fixed_width_xvg_body(body)
+    if data is None:
+        # general (slower) parser for files that aren't written in a fixed-width layout or that
+        # have title, labels, and comments in between the data lines
+        data = np.loadtxt(io.BytesIO(body), comments=("#", "@"), ndmin=2)
+
+    return data
+
+def get_cache_key(file, content_hash=False):
+    """
+        Computes the key of the cache entry of a file from its path, size, and modification time,
+        so that the entry is no longer used once the file is modified (e.g. the trajectory was
+        extended and the analysis was rerun).
+
+        Parameters:
+            file         (str)  : path to file
+            content_hash (bool) : also hash the content of the file (slower, but safe against
+                                  files whose modification time was preserved, e.g. by `cp -p`)
+
+        Returns:
+            key          (str)  : hexadecimal key of the cache entry
+    """
+
+    stat = os.stat(file)
+    key  = hashlib.sha1()
+    key.update(os.path.abspath(file).encode())
+    key.update(str(stat.st_size).encode())
+    key.update(str(stat.st_mtime_ns).encode())
+    if content_hash:
+        content = hashlib.blake2b()
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(1024**2), b""):
+                content.update(chunk)
+        key.update(content.digest())
+
+    return key.hexdigest()
+
+def evict_cache_entries(cache_dir, max_cache_size):
+    """
+        Removes the least recently used entries of a cache directory until the total size of the
+        entries is below max_cache_size.
+
+        Parameters:
+            cache_dir      (str)   : cache directory
+            max_cache_size (float) : size cap of the cache in bytes
+    """
+
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith(".npz"):
             continue
-        s = line.split()
-        data.append([float(x) for x in s])
-    
-    return(data)
+        entry = os.path.join(cache_dir, name)
+        try:
+            stat = os.stat(entry)
+        except FileNotFoundError: # removed by another process
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry))
+
+    total_size = sum(size for last_used, size, entry in entries)
+    for last_used, size, entry in sorted(entries):
+        if total_size <= max_cache_size:
+            break
+        try:
+            os.remove(entry)
+        except FileNotFoundError:
+            pass
+        total_size -= size
+
+# parsed input files kept in memory (see read_shared_input) by processes that draw several figures
+# (see run_figures.py), so that figures with the same inputs read them only once; None disables it
+SHARED_INPUTS = None
+
+def read_shared_input(read, file, *args):
+    """
+        Calls read(file, *args). If SHARED_INPUTS is enabled, the result is kept in memory and a copy
+        of it is returned when the same file is read the same way again in this process, as long as
+        the file is not modified (see get_cache_key).
 
-def moving_average(data, max_window_size):
+        Parameters:
+            read   (function) : function reading the file, e.g. read_xvg_file_cached
+            file   (str)      : path to file
+            args   (tuple)    : further (hashable) arguments of read
+
+        Returns:
+            result            : result of read(file, *args)
+    """
+
+    if SHARED_INPUTS is None:
+        return read(file, *args)
+
+    key = (read.__name__, get_cache_key(file), args)
+    if key not in SHARED_INPUTS:
+        SHARED_INPUTS[key] = read(file, *args)
+
+    # a copy, so that a figure modifying its data does not change the data of the next figure
+    return copy.deepcopy(SHARED_INPUTS[key])
+
+def read_xvg_file_cached(file, dtype=np.float64, cache_dir=None, max_cache_size=None, content_hash=None):
+    """
+        Same as read_xvg_file, but the parsed data is saved in a binary (.npz) cache entry so that
+        rerunning a script (e.g. to change a label or the figure size) loads the array directly
+        instead of parsing the text file again.
+
+        Parameters:
+            file           (str)           : path to a MD simulation analysis output from GROMACS
+            dtype          (numpy.dtype)   : data type of the returned array
+            cache_dir      (str)           : cache directory (default: XVG_CACHE_DIR); the cache is
+                                             disabled if it is an empty string
+            max_cache_size (float)         : size cap of the cache in bytes (default:
+                                             XVG_CACHE_MAX_SIZE)
+            content_hash   (bool)          : key the entries by the file content as well (default:
+                                             XVG_CACHE_HASH)
+
+        Returns:
+            data           (numpy.ndarray) : see read_xvg_file
+            metadata       (dict)          : see read_xvg_file
+    """
+
+    if cache_dir is None:
+        cache_dir = XVG_CACHE_DIR
+    if max_cache_size is None:
+        max_cache_size = XVG_CACHE_MAX_SIZE
+    if content_hash is None:
+        content_hash = XVG_CACHE_HASH
+
+    if not cache_dir:
+        return read_xvg_file(file, dtype)
+
+    entry = os.path.join(cache_dir, get_cache_key(file, content_hash) + ".npz")
+
+    # warm run: load the cached array
+    try:
+        with np.load(entry) as cached:
+            data     = cached["data"]
+            metadata = json.loads(str(cached["metadata"]))
+        os.utime(entry) # mark entry as recently used
+        return np.ascontiguousarray(data, dtype=dtype), metadata
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile): # missing or unreadable entry
+        pass
+
+    # cold run: parse the text file and save the array
+    data, metadata = read_xvg_file(file)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        temp = entry + "." + str(os.getpid()) + ".tmp" # write to a temporary file, so that other processes never read a partial entry
+        with open(temp, "wb") as f:
+            np.savez(f, data=data, metadata=np.array(json.dumps(metadata)))
+        os.replace(temp, entry)
+        evict_cache_entries(cache_dir, max_cache_size)
+    except OSError: # e.g. read-only file system; the cache is only an optimization
+        pass
+
+    return np.ascontiguousarray(data, dtype=dtype), metadata
+
+# packed nucleobase coordinates (see make_nucleobase_coord_store), configured with an environment variable:
+#     NUCLEOBASE_COORD_STORE_DIR : directory holding the stores, one subdirectory per scenario directory and
+#                                  input files (set to an empty string to disable the stores)
+NUCLEOBASE_COORD_STORE_DIR = os.environ.get("NUCLEOBASE_COORD_STORE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "alkyl_paper_scripts", "nucleobase_coords"))
+
+def get_nucleobase_coord_files(path, n_residues, com_dir, vec_dir):
+    """
+        Lists the .xvg files outputted by GROMACS utility `traj` for every nucleobase.
+
+        Parameters:
+            path       (str)       : path to scenario directory
+            n_residues (int)       : total number of nucleotides
+            com_dir    (str)       : name of directory holding the .xvg files containing the COM of
+                                     each nucleobase
+            vec_dir    (str)       : name of directory holding the .xvg files containing the x, y, z
+                                     position of the atoms that define the vectors in each nucleobase
+
+        Returns:
+            com_files  (list[str]) : path to the COM .xvg file of each residue
+            vec_files  (list[str]) : path to the vector atoms .xvg file of each residue
+    """
+
+    com_files = [os.path.join(path, com_dir, "nucleobase_COM_coord_" + str(resi+1) + ".xvg") for resi in range(n_residues)]
+    vec_files = [os.path.join(path, vec_dir, "nucleobase_vec_coord_" + str(resi+1) + ".xvg") for resi in range(n_residues)]
+
+    return com_files, vec_files
+
+# atomic masses (g/mol) of the elements of nucleic acids, used to weight the centers of mass computed
+# from a .xtc file
+ATOMIC_MASSES = {"H": 1.008, "C": 12.011, "N": 14.0067, "O": 15.9994, "P": 30.973762, "S": 32.06}
+
+def read_ndx_file(file):
+    """
+        Reads a GROMACS index file.
+
+        Parameters:
+            file   (str)  : path to .ndx file
+
+        Returns:
+            groups (dict) : atom numbers (starting at 1, numpy.ndarray) of each group, in the order of
+                            the file
+    """
+
+    groups = {}
+    name   = None
+    with open(file, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("["):
+                name = line.strip("[] ")
+                groups[name] = []
+            elif line and name is not None:
+                groups[name].extend(int(atom) for atom in line.split())
+
+    return {name: np.array(atoms, dtype=np.int64) for name, atoms in groups.items()}
+
+def read_gro_box(line):
+    # box vectors (rows, measured in nm) from the last line of a .gro frame:
+    # v1(x) v2(y) v3(z) [v1(y) v1(z) v2(x) v2(z) v3(x) v3(y)]
+    values = [float(value) for value in line.split()] + [0.0]*6
+    return np.array([[values[0], values[3], values[4]],
+                     [values[5], values[1], values[6]],
+                     [values[7], values[8], values[2]]])
+
+def iter_gro_file(file, chunk_size=256, atoms=None, offset=0):
+    """
+        Reads the frames of a (multi-frame) .gro file in chunks, e.g. a trajectory written by
+        `trjconv`. The time of a frame is read from its title (`t= ...`), or is the number of the
+        frame (counted from the offset) if the title has no time. A last frame that is not complete is left for a later read.
+
+        Parameters:
+            file       (str)           : path to .gro file
+            chunk_size (int)           : maximum number of frames per chunk
+            atoms      (numpy.ndarray) : indices (starting at 0) of the atoms to keep (None for all
+                                         atoms)
+            offset     (int)           : byte position of the first frame to read
+
+        Yields:
+            time       (numpy.ndarray) : time (measured in ps) of each frame
+            box        (numpy.ndarray) : box vectors (measured in nm), shape (frames, 3, 3)
+            coords     (numpy.ndarray) : coordinates (measured in nm), shape (frames, atoms, 3)
+            offset     (int)           : byte position after the chunk
+    """
+
+    time   = []
+    box    = []
+    coords = []
+    with open(file, "rb") as f:
+        f.seek(offset)
+        n_frames = 0 # frames read
+        while True:
+            title = f.readline()
+            count = f.readline()
+            if not count.endswith(b"\n"):
+                break
+            n_atoms = int(count)
+            lines   = [f.readline() for atom in range(n_atoms+1)]
+            if not lines[-1].endswith(b"\n"): # frame not complete
+                break
+            offset = f.tell()
+
+            rows  = lines[:n_atoms] if atoms is None else [lines[atom] for atom in atoms]
+            match = re.search(rb"t=\s*(\S+)", title)
+            time.append(float(match.group(1)) if match else float(n_frames))
+            box.append(read_gro_box(lines[n_atoms].decode()))
+            coords.append(gro_file.parse_gro_atom_lines(rows)["xyz"])
+            n_frames += 1
+
+            if len(time) == chunk_size:
+                yield np.array(time), np.stack(box), np.stack(coords), offset
+                time, box, coords = [], [], []
+        if time:
+            yield np.array(time), np.stack(box), np.stack(coords), offset
+
+def iter_trajectory(file, chunk_size=256, atoms=None, offset=0):
+    """
+        Reads the frames of a .xtc file (see iter_xtc_file) or of a .gro file (see iter_gro_file) in
+        chunks.
+
+        Yields:
+            time       (numpy.ndarray) : time (measured in ps) of each frame
+            box        (numpy.ndarray) : box vectors (measured in nm), shape (frames, 3, 3)
+            coords     (numpy.ndarray) : coordinates (measured in nm), shape (frames, atoms, 3)
+            offset     (int)           : byte position after the chunk
+    """
+
+    if file.endswith(".xtc"):
+        for step, time, box, coords, offset in xtc_file.iter_xtc_file(file, chunk_size, atoms, offset):
+            yield time, box, coords, offset
+    elif file.endswith(".gro"):
+        yield from iter_gro_file(file, chunk_size, atoms, offset)
+    else:
+        sys.exit("Error: unknown trajectory format: " + file + " (.xtc or .gro)")
+
+def get_nucleobase_coord_sources(path, n_residues, com_dir, vec_dir, xtc_inputs=None):
+    """
+        Describes the files a nucleobase coordinate store is made from, so that an outdated store
+        (e.g. different files or files that were modified afterwards) can be detected without
+        opening the files.
+
+        Parameters:
+            xtc_inputs (dict) : names of the .xtc, .gro, and index files (keys "xtc", "gro", "com_ndx",
+                                and "vec_ndx") inside the scenario directory if the coordinates are
+                                computed from a trajectory; None if they are read from the .xvg files
+                                outputted by `traj`
+
+        Returns:
+            sources (dict) : names of the input files or directories, number of residues, and the total
+                             size and latest modification time of the input files
+    """
+
+    if xtc_inputs is None:
+        com_files, vec_files = get_nucleobase_coord_files(path, n_residues, com_dir, vec_dir)
+        sources = {"com_dir": com_dir, "vec_dir": vec_dir}
+        stats   = [os.stat(file) for file in com_files + vec_files]
+    else:
+        sources = dict(xtc_inputs)
+        stats   = [os.stat(os.path.join(path, xtc_inputs[key])) for key in ["xtc", "gro", "com_ndx", "vec_ndx"]]
+
+    sources.update({"n_residues" : n_residues,
+                    "size"       : sum(stat.st_size for stat in stats),
+                    "mtime_ns"   : max(stat.st_mtime_ns for stat in stats)})
+
+    return sources
+
+def get_nucleobase_coord_store(sources, path):
+    # directory of the nucleobase coordinate store of a scenario (None if the stores are disabled), named
+    # by a hash of the absolute path of the scenario directory and of the names of the input files (see
+    # get_nucleobase_coord_sources), so that the stores made from the .xvg files and from a trajectory
+    # are kept side by side
+    if not NUCLEOBASE_COORD_STORE_DIR:
+        return None
+    inputs = {key: value for key, value in sources.items() if key not in ["size", "mtime_ns"]}
+    inputs["path"] = os.path.abspath(path)
+    return os.path.join(NUCLEOBASE_COORD_STORE_DIR, hashlib.sha1(json.dumps(inputs, sort_keys=True).encode()).hexdigest())
+
+def new_nucleobase_coord_array(store, name, shape):
+    # array of a nucleobase coordinate store: a memory-mapped .npy file in the directory of the store,
+    # or an array in memory if store is None
+    if store is None:
+        return np.empty(shape)
+    return np.lib.format.open_memmap(os.path.join(store, name + ".npy"), mode="w+", shape=shape)
+
+def write_nucleobase_coords_from_xvg(store, path, n_residues, com_dir, vec_dir):
+    # writes the arrays of a nucleobase coordinate store (see make_nucleobase_coord_store) from the
+    # per-residue .xvg files outputted by `traj`
+    com_files, vec_files = get_nucleobase_coord_files(path, n_residues, com_dir, vec_dir)
+
+    time       = None
+    COM_coords = None
+    vec_coords = None
+    for resi in range(n_residues):
+        data, metadata = read_xvg_file(com_files[resi])
+        if resi == 0:
+            n_frames   = data.shape[0]
+            time       = new_nucleobase_coord_array(store, "time", (n_frames,))
+            COM_coords = new_nucleobase_coord_array(store, "COM_coords", (n_frames, n_residues, 3))
+            vec_coords = new_nucleobase_coord_array(store, "vec_coords", (n_frames, n_residues, 2, 3))
+            time[:]    = data[:, 0]/1000 # convert ps -> ns
+        COM_coords[:, resi, :] = data[:n_frames, 1:4]
+
+        # data is written like: time, a1x, a1y, a1z, a2x, a2y, a2z
+        data, metadata = read_xvg_file(vec_files[resi])
+        vec_coords[:, resi, :, :] = data[:n_frames, 1:7].reshape(-1, 2, 3)
+
+    return time, COM_coords, vec_coords
+
+def write_nucleobase_coords_from_xtc(store, n_residues, xtc, gro, com_ndx, vec_ndx, chunk_size=256):
+    """
+        Writes the arrays of a nucleobase coordinate store (see make_nucleobase_coord_store) directly
+        from a trajectory, in chunks of frames, instead of from the .xvg files outputted by `traj`.
+        The centers of mass are weighted by the masses of the elements of the atoms (the first letter
+        of the atom names of the .gro file).
+
+        Parameters:
+            store      (str) : path to the directory of the store (None to keep the arrays in memory)
+            n_residues (int) : total number of nucleotides
+            xtc        (str) : path to .xtc file; its atoms must be numbered as in the .gro and index
+                               files (e.g. the whole system, or a group holding all the atoms of the
+                               index files, written with the same numbering)
+            gro        (str) : path to .gro file (e.g. outputted by the energy minimization)
+            com_ndx    (str) : path to index file `nucleobase_COM_atoms.ndx`
+            vec_ndx    (str) : path to index file `nucleobase_vec_atoms.ndx`
+            chunk_size (int) : number of frames read at a time
+
+        Returns:
+            time, COM_coords, vec_coords : arrays of the store (see make_nucleobase_coord_store)
+    """
+
+    com_groups = list(read_ndx_file(com_ndx).values())
+    vec_groups = list(read_ndx_file(vec_ndx).values())
+    if len(com_groups) < n_residues or len(vec_groups) < n_residues:
+        sys.exit("Error: " + com_ndx + " and " + vec_ndx + " must have a group for each of the " + str(n_residues) + " nucleotides")
+    com_groups = com_groups[:n_residues]
+    vec_groups = vec_groups[:n_residues]
+    if any(len(group) != 2 for group in vec_groups):
+        sys.exit("Error: each group of " + vec_ndx + " must have the 2 atoms that define the vectors a and b")
+
+    # only the atoms of the groups are kept (atom numbers start at 1)
+    atoms = np.unique(np.concatenate(com_groups + vec_groups)) - 1
+
+    # weight of each kept atom in the center of mass of each residue
+    atom_names = gro_file.read_gro_atom_table(gro)[0]["atomname"]
+    weights    = np.zeros((n_residues, len(atoms)))
+    for resi in range(n_residues):
+        columns = np.searchsorted(atoms, com_groups[resi]-1)
+        masses  = [ATOMIC_MASSES[atom_names[atom-1][0]] for atom in com_groups[resi]]
+        weights[resi, columns] = np.array(masses)/np.sum(masses)
+    vec_columns = np.searchsorted(atoms, np.stack(vec_groups)-1) # shape (residues, 2)
+
+    n_frames   = xtc_file.count_xtc_frames(xtc)
+    time       = new_nucleobase_coord_array(store, "time", (n_frames,))
+    COM_coords = new_nucleobase_coord_array(store, "COM_coords", (n_frames, n_residues, 3))
+    vec_coords = new_nucleobase_coord_array(store, "vec_coords", (n_frames, n_residues, 2, 3))
+
+    start = 0
+    for step, chunk_time, box, coords, offset in xtc_file.iter_xtc_file(xtc, chunk_size, atoms):
+        end = start + len(chunk_time)
+        time[start:end]       = chunk_time/1000 # convert ps -> ns
+        COM_coords[start:end] = np.einsum("ra,fax->frx", weights, coords)
+        vec_coords[start:end] = coords[:, vec_columns, :]
+        start = end
+
+    return time, COM_coords, vec_coords
+
+def make_nucleobase_coord_store(store, path, n_residues, com_dir, vec_dir, xtc_inputs=None):
+    """
+        Packs the per-residue .xvg files of the nucleobase centers of mass and vector atoms of a
+        scenario into three .npy arrays (one-time import step). The arrays are written residue by
+        residue, so only one .xvg file is held in memory at a time. If xtc_inputs is given, the
+        arrays are computed from the trajectory instead (see write_nucleobase_coords_from_xtc).
+
+        The store is a directory inside NUCLEOBASE_COORD_STORE_DIR (see get_nucleobase_coord_store)
+        with:
+            time.npy       : time (measured in ns), shape (frames,)
+            COM_coords.npy : center of mass of each nucleobase, shape (frames, residues, 3)
+            vec_coords.npy : x, y, z position of the two atoms that define the vectors a and b of
+                             each nucleobase, shape (frames, residues, 2, 3)
+            sources.json   : description of the input files (see get_nucleobase_coord_sources)
+
+        Parameters:
+            store      (str)  : path to the directory of the store (None to only compute the arrays
+                                in memory)
+            path       (str)  : path to scenario directory
+            n_residues (int)  : total number of nucleotides
+            com_dir    (str)  : name of directory holding the .xvg files containing the COM of each
+                                nucleobase
+            vec_dir    (str)  : name of directory holding the .xvg files containing the x, y, z
+                                position of the atoms that define the vectors in each nucleobase
+            xtc_inputs (dict) : names of the .xtc, .gro, and index files inside the scenario directory
+                                (see get_nucleobase_coord_sources); None to read the .xvg files
+
+        Returns:
+            time, COM_coords, vec_coords : arrays of the store (see open_nucleobase_coord_store)
+    """
+
+    temp = None
+    if store is not None:
+        temp = store + "." + str(os.getpid()) + ".tmp" # build the store in a temporary directory, so that a partial store is never opened
+        os.makedirs(temp, exist_ok=True)
+
+    sources = get_nucleobase_coord_sources(path, n_residues, com_dir, vec_dir, xtc_inputs)
+
+    if xtc_inputs is None:
+        arrays = write_nucleobase_coords_from_xvg(temp, path, n_residues, com_dir, vec_dir)
+    else:
+        arrays = write_nucleobase_coords_from_xtc(temp, n_residues, *[os.path.join(path, xtc_inputs[key]) for key in ["xtc", "gro", "com_ndx", "vec_ndx"]])
+
+    if store is None:
+        return arrays
+
+    for array in arrays:
+        array.flush()
+    with open(os.path.join(temp, "sources.json"), "w") as f:
+        json.dump(sources, f)
+
+    # replace the previous store
+    shutil.rmtree(store, ignore_errors=True)
+    os.replace(temp, store)
+
+    return arrays
+
+def open_nucleobase_coord_store(path, n_residues, com_dir, vec_dir, xtc_inputs=None):
+    """
+        Opens the packed nucleobase coordinates of a scenario as memory-mapped (read-only) arrays,
+        so no data is read or copied until it is used. The store is (re)built from the .xvg files
+        (or from the trajectory, if xtc_inputs is given) if it does not exist yet or if it is
+        outdated. If the stores are disabled or the store cannot be written (e.g. read-only file
+        system), the arrays are computed in memory instead.
+
+        Parameters:
+            path       (str)           : path to scenario directory
+            n_residues (int)           : total number of nucleotides
+            com_dir    (str)           : name of directory holding the .xvg files containing the COM
+                                         of each nucleobase
+            vec_dir    (str)           : name of directory holding the .xvg files containing the x,
+                                         y, z position of the atoms that define the vectors in each
+                                         nucleobase
+            xtc_inputs (dict)          : names of the .xtc, .gro, and index files inside the scenario
+                                         directory (see get_nucleobase_coord_sources); None to read
+                                         the .xvg files
+
+        Returns:
+            time       (numpy.ndarray) : time (measured in ns), shape (frames,)
+            COM_coords (numpy.memmap)  : center of mass of each nucleobase, shape (frames, residues, 3)
+            vec_coords (numpy.memmap)  : position of the atoms that define the vectors a and b of each
+                                         nucleobase, shape (frames, residues, 2, 3)
+    """
+
+    sources = get_nucleobase_coord_sources(path, n_residues, com_dir, vec_dir, xtc_inputs)
+    store   = get_nucleobase_coord_store(sources, path)
+    if store is None:
+        return make_nucleobase_coord_store(None, path, n_residues, com_dir, vec_dir, xtc_inputs)
+
+    try:
+        with open(os.path.join(store, "sources.json"), "r") as f:
+            up_to_date = json.load(f) == sources
+    except (OSError, ValueError):
+        up_to_date = False
+
+    if not up_to_date:
+        try:
+            make_nucleobase_coord_store(store, path, n_residues, com_dir, vec_dir, xtc_inputs)
+        except OSError: # e.g. read-only file system; the store is only an optimization
+            shutil.rmtree(store + "." + str(os.getpid()) + ".tmp", ignore_errors=True)
+            return make_nucleobase_coord_store(None, path, n_residues, com_dir, vec_dir, xtc_inputs)
+
+    time       = np.load(os.path.join(store, "time.npy"))
+    COM_coords = np.load(os.path.join(store, "COM_coords.npy"), mmap_mode="r")
+    vec_coords = np.load(os.path.join(store, "vec_coords.npy"), mmap_mode="r")
+
+    return time, COM_coords, vec_coords
+
+# store of the per-frame series computed by earlier runs (see save_analysis_state), so that only the
+# frames appended since then are analysed when a trajectory is extended, configured with an environment
+# variable:
+#     ANALYSIS_STORE_DIR : directory holding the entries, with one subdirectory per directory of analysed
+#                          files (set to an empty string to disable the store)
+ANALYSIS_STORE_DIR = os.environ.get("ANALYSIS_STORE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "alkyl_paper_scripts", "analysis"))
+
+def get_xvg_watermark(file, offset, n_frames):
+    """
+        Records how far a .xvg file has been read. The hash of the bytes just before the offset
+        is used to check that a later version of the file only has lines appended to it (e.g. the
+        trajectory was extended and the GROMACS utility was rerun), and was not rewritten.
+
+        Parameters:
+            file      (str)  : path to a MD simulation analysis output from GROMACS
+            offset    (int)  : number of bytes read, i.e. the position of the first unread line
+            n_frames  (int)  : number of data lines read (before striding)
+
+        Returns:
+            watermark (dict) : "offset", "n_frames", and "fingerprint" of the file
+    """
+
+    with open(file, "rb") as f:
+        f.seek(max(0, offset-4096))
+        fingerprint = hashlib.blake2b(f.read(offset-max(0, offset-4096)), digest_size=16).hexdigest()
+
+    return {"offset": offset, "n_frames": n_frames, "fingerprint": fingerprint}
+
+def is_valid_watermark(file, watermark):
+    # True if the file still holds the lines read up to the watermark
+    try:
+        if os.path.getsize(file) < watermark["offset"]:
+            return False
+        return get_xvg_watermark(file, watermark["offset"], watermark["n_frames"]) == watermark
+    except (OSError, KeyError, TypeError):
+        return False
+
+def get_analysis_store_entry(file, name):
+    # entry of the analysis store for the directory of `file` (None if the store is disabled); the
+    # subdirectory is named by a hash of the absolute path of the directory
+    if not ANALYSIS_STORE_DIR:
+        return None
+    directory = hashlib.sha1(os.path.dirname(os.path.abspath(file)).encode()).hexdigest()
+    return os.path.join(ANALYSIS_STORE_DIR, directory, name + ".npz")
+
+def load_analysis_state(entry, settings):
+    """
+        Loads the per-frame series and the watermarks saved by an earlier run (see
+        save_analysis_state).
+
+        Parameters:
+            entry    (str)  : path to the .npz entry of the analysis store (see
+                              get_analysis_store_entry; None if the store is disabled)
+            settings (dict) : options the saved series depend on (e.g. the stride); the entry is not
+                              used if they differ from the options of the earlier run
+
+        Returns:
+            info     (dict) : watermarks and other JSON-serializable values (None if there is no
+                              usable entry)
+            arrays   (dict) : saved arrays by name (None if there is no usable entry)
+    """
+
+    if entry is None:
+        return None, None
+
+    try:
+        with np.load(entry) as stored:
+            info   = json.loads(str(stored["info"]))
+            arrays = {name: stored[name] for name in stored.files if name != "info"}
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile): # missing or unreadable entry
+        return None, None
+
+    if info.get("settings") != json.loads(json.dumps(settings)):
+        return None, None
+
+    return info, arrays
+
+def save_analysis_state(entry, settings, info, arrays):
+    """
+        Saves the per-frame series and the watermarks of a run, so that the next run only has to
+        analyse the frames appended in the meantime (see load_analysis_state).
+
+        Parameters:
+            entry    (str)  : path to the .npz entry of the analysis store (nothing is saved if None)
+            settings (dict) : options the saved series depend on
+            info     (dict) : watermarks and other JSON-serializable values
+            arrays   (dict) : arrays to save by name
+    """
+
+    if entry is None:
+        return
+
+    info = dict(info, settings=settings)
+    try:
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        temp = entry + "." + str(os.getpid()) + ".tmp" # write to a temporary file, so that other processes never read a partial entry
+        with open(temp, "wb") as f:
+            np.savez(f, info=np.array(json.dumps(info)), **arrays)
+        os.replace(temp, entry)
+    except OSError: # e.g. read-only file system; the next run then analyses every frame again
+        pass
+
+def moving_average(data, max_window_size, start=0):
     """
         The moving average is calculated with a varying window size to:
             (i)  force the initial data point to be plotted (the initial configuration of all DNA
@@ -77,19 +1208,31 @@ def moving_average(data, max_window_size):
         longer equal max_window_size, we decrease the window size by one (i.e. decrease the number of
         elements we take from the right by one) each iteration.
 
+        Each window average is computed from the difference of two cumulative sums, so the cost
+        does not depend on the window size.
+
         Parameters:
-            data            (list[int or float]) : data points to compute moving average from
-            max_window_size (int)                : the maximum size of the window, i.e., the 
-                                                   maximum number of data points used to calculate
-                                                   the moving average
+            data            (list[int or float] or numpy.ndarray) : data points to compute moving
+                                                                    average from; a 2D array is
+                                                                    treated as one series per row
+            max_window_size (int)                                 : the maximum size of the window,
+                                                                    i.e., the maximum number of data
+                                                                    points used to calculate the
+                                                                    moving average
+            start           (int)                                 : only compute the averages of the
+                                                                    elements from start on (see
+                                                                    smooth_data)
 
         Returns:
-            moving_averages (list[float])        : series of averages of data (same size as the input
-                                                   series)
+            moving_averages (numpy.ndarray)                       : series of averages of data (same
+                                                                    shape as the input series, minus
+                                                                    the first start elements)
     """
 
-    moving_averages = []
-    
+    data     = np.asarray(data, dtype=np.float64)
+    n_points = data.shape[-1]
+    i        = np.arange(start, n_points)
+
     # number of data points needed to the LEFT of the i-th element to have a window size of
     # max_window_size
     n_data_left = max_window_size//2
@@ -97,69 +1240,375 @@ def moving_average(data, max_window_size):
     # number of data points needed to the RIGHT of the i-th element to have a window size of
     # max_window_size
     n_data_right = max_window_size-1-max_window_size//2
-    
-    # list of the number of data points to the LEFT that you put into the window when there
-    # aren't enough to make a window of size max_window_size
-    varying_n_data_left = list(range(n_data_left+1))
-    
-    # list of the number of data points to the RIGHT that you put into the window when there
-    # aren't enough to make a window of size max_window_size
-    varying_n_data_right = list(reversed(range(n_data_right+1)))
-    
-    # allows us to iterate varying_n_data_right
-    offset = None
-
-    for i in range(len(data)):
-        if i < n_data_left: 
-            # if we are near the leftmost boundary and there aren't enough data points to the left and right
-            # of the i-th element to make the window size = max_window_size, use a window size < max_window_size
-            
-            # get window: the number of data points we take from both the left and right of the i-th element vary
-            window = data[i-varying_n_data_left[i] : i+varying_n_data_right[-1-i]+1]
-            
-            # compute window average
-            window_avg = sum(window) / len(window)
-
-            moving_averages.append(window_avg)
-        elif i >= (len(data)-n_data_right):
-            # if we are near the rightmost boundary and there aren't enough data points to the left and right
-            # of the i-th element to make the window size = max_window_size, use a window size < max_window_size
-
-            if offset == None:
-                offset = i
-            index = i-offset    # allows us to iterate varying_n_data_right
-
-            # get window: only the number of data points we take from the right of the i-th element varies
-            window = data[i-n_data_left : i+varying_n_data_right[index]+1]
-            
-            # compute window average
-            window_avg = sum(window) / len(window)
-
-            moving_averages.append(window_avg)
-        else:
-            # else we have enough data points to create a window of size max_window_size
 
-            # get window: the window size = max_window_size and the number of data points we take from both
-            # the left and right of the i-th element does NOT vary
-            window = data[i-n_data_left : i+n_data_right+1]
+    # first (inclusive) and last (exclusive) index of the window of the i-th element:
+    #     near the leftmost boundary, the window grows by two each iteration: data[0 : 2i+1]
+    #     in the middle, the window size = max_window_size: data[i-n_data_left : i+n_data_right+1]
+    #     near the rightmost boundary, only the number of data points we take from the right
+    #     decreases: data[i-n_data_left : len(data)]
+    window_start = np.where(i < n_data_left, 0, i-n_data_left)
+    window_end   = np.minimum(np.where(i < n_data_left, 2*i+1, i+n_data_right+1), n_points)
 
-            # compute window average
-            window_avg = sum(window) / len(window)
+    # window sums from cumulative sums (computed relative to the mean of each series to limit
+    # round-off errors); the data before the first window is not needed
+    first        = window_start[0] if i.size else n_points
+    data         = data[..., first:]
+    offset       = data.mean(axis=-1, keepdims=True) if data.shape[-1] else 0
+    cumulative   = np.zeros(data.shape[:-1] + (data.shape[-1]+1,))
+    np.cumsum(data-offset, axis=-1, out=cumulative[..., 1:])
+    window_sums  = cumulative[..., window_end-first] - cumulative[..., window_start-first]
 
-            moving_averages.append(window_avg)
+    moving_averages = offset + window_sums/(window_end-window_start)
 
     return moving_averages
-    
-def plot_data(x, y, x_label, y_label, title, legend, file_name, fig_width, fig_height):
+
+# window sizes of the moving averages applied in turn to smooth the plotted series
+SMOOTHING_WINDOWS = [500, 100]
+
+def smooth_data(data, passes=None):
+    """
+        Smooths a series by applying moving_average with each window size of SMOOTHING_WINDOWS in
+        turn. When the series was extended since an earlier call, only the averages whose windows
+        reach the new points are recomputed.
+
+        Parameters:
+            data   (numpy.ndarray)       : series to smooth; a 2D array is treated as one series per
+                                           row
+            passes (list[numpy.ndarray]) : output of an earlier call for the first points of data (None
+                                           to smooth the whole series)
+
+        Returns:
+            passes (list[numpy.ndarray]) : series after each moving average; the last one is the
+                                           smoothed series
+    """
+
+    series  = np.asarray(data, dtype=np.float64)
+    changed = 0 if passes is None else passes[0].shape[-1] # first point of the series that is new
+    smoothed = []
+    for itr, max_window_size in enumerate(SMOOTHING_WINDOWS):
+        # first average whose window reaches a changed point (windows never end before the window of
+        # a previous point ends)
+        start = 0
+        if changed > 0:
+            n_data_left  = max_window_size//2
+            n_data_right = max_window_size-1-max_window_size//2
+            i            = np.arange(changed)
+            window_end   = np.where(i < n_data_left, 2*i+1, i+n_data_right+1)
+            start        = int(np.searchsorted(window_end, changed, side="right"))
+
+        averages = moving_average(series, max_window_size, start)
+        if start > 0:
+            averages = np.concatenate((passes[itr][..., :start], averages), axis=-1)
+
+        smoothed.append(averages)
+        series  = averages
+        changed = start
+
+    return smoothed
+
+def update_window_stats(window_stats, time, values, windows):
+    """
+        Accumulates the summary statistics of several time windows of a series in one pass. The
+        series is passed chunk by chunk (e.g. the frames read from a .xvg file, or the frames
+        appended since the last run), and each window keeps only its number of points, mean, and sum
+        of squared deviations from the mean, as in Welford's algorithm. The statistics of the points
+        of a chunk inside each window are merged into those of the window with the pairwise update of
+        Chan, Golub, and LeVeque.
+
+        The first and last point of each window are located by binary search on the time axis, so the
+        windows do not depend on the output interval of the simulation (e.g. `--stride`).
+
+        Parameters:
+            window_stats (dict)          : number of points, mean, and sum of squared deviations of each
+                                           window, keyed by window name (empty dict before the first
+                                           chunk)
+            time         (numpy.ndarray) : time (measured in ns) of the points of the chunk, in
+                                           increasing order
+            values       (numpy.ndarray) : values of the points of the chunk
+            windows      (dict)          : [first, last] time (measured in ns) of each window, keyed by
+                                           window name; a point is inside the window if
+                                           first <= time < last (None for an open end)
+
+        Returns:
+            window_stats (dict)          : statistics of each window, including the chunk
+    """
+
+    time   = np.asarray(time, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    names  = list(windows)
+
+    # points of the chunk inside each window
+    first = np.searchsorted(time, [-np.inf if windows[name][0] is None else windows[name][0] for name in names])
+    last  = np.searchsorted(time, [np.inf if windows[name][1] is None else windows[name][1] for name in names])
+    last  = np.maximum(first, last)
+
+    # sums over the points of each window from cumulative sums (computed relative to the mean of the
+    # chunk to limit round-off errors)
+    shift    = values.mean() if values.size else 0.0
+    sums     = np.zeros(values.size+1)
+    squares  = np.zeros(values.size+1)
+    np.cumsum(values-shift, out=sums[1:])
+    np.cumsum((values-shift)**2, out=squares[1:])
+    n_b      = (last-first).astype(np.float64)
+    sum_b    = sums[last] - sums[first]
+    square_b = squares[last] - squares[first]
+
+    # merge with the statistics of the earlier chunks
+    n_a, mean_a, M2_a = np.array([window_stats.get(name, [0, 0.0, 0.0]) for name in names], dtype=np.float64).reshape(-1, 3).T
+    n = n_a + n_b
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_b = shift + sum_b/n_b
+        M2_b   = np.maximum(square_b - sum_b*sum_b/n_b, 0)
+        delta  = mean_b - mean_a
+        mean   = np.where(n_b > 0, mean_a + delta*n_b/n, mean_a)
+        M2     = np.where(n_b > 0, M2_a + M2_b + delta*delta*n_a*n_b/n, M2_a)
+
+    window_stats = dict(window_stats)
+    for itr, name in enumerate(names):
+        window_stats[name] = [int(n[itr]), float(mean[itr]), float(M2[itr])]
+
+    return window_stats
+
+def get_mean_and_stdev(stats):
+    # sample mean and standard deviation of a window (see update_window_stats); nan for a window
+    # without enough points
+    n, mean, M2 = stats
+    return mean if n > 0 else float("nan"), float(np.sqrt(M2/(n-1))) if n > 1 else float("nan")
+
+def get_window(time, values, window):
+    # points of a series inside a time window [first, last) (measured in ns; None for an open end), see update_window_stats
+    first = 0 if window[0] is None else np.searchsorted(time, window[0])
+    last  = len(time) if window[1] is None else np.searchsorted(time, window[1])
+    return values[first:max(first, last)]
+
+def get_autocorrelation(data, max_lag=None):
+    """
+        Normalized autocorrelation function of one or several series, computed with FFTs
+        (O(n log n) instead of O(n^2)) for all the series at once. The autocovariance at lag t is
+        averaged over the n-t pairs of points t frames apart.
+
+        Parameters:
+            data     (numpy.ndarray) : series along the first axis, shape (frames,) or (frames, series)
+            max_lag  (int)           : number of lags returned (default: all, i.e. frames)
+
+        Returns:
+            acf      (numpy.ndarray) : autocorrelation at lags 0, 1, ..., max_lag-1, shape (lags,) or
+                                       (lags, series); a constant series has no correlation (1 at
+                                       lag 0, 0 at the other lags)
+    """
+
+    data     = np.asarray(data, dtype=np.float64)
+    n_frames = data.shape[0]
+    max_lag  = n_frames if max_lag is None else min(max_lag, n_frames)
+
+    # one series per row (the FFTs are faster along contiguous rows), zero-padded to a power of two
+    # >= 2n so that the circular correlation of the FFT does not wrap around
+    series   = np.ascontiguousarray(data.reshape(n_frames, -1).T)
+    size     = 1 << max(2*n_frames-1, 1).bit_length()
+    spectrum = np.fft.rfft(series - series.mean(axis=1, keepdims=True), n=size, axis=1)
+    acov     = np.fft.irfft(spectrum.real**2 + spectrum.imag**2, n=size, axis=1)[:, :max_lag]
+    acov    /= n_frames - np.arange(max_lag)
+
+    constant = acov[:, 0] <= 0
+    acf      = acov/np.where(constant, 1, acov[:, 0])[:, None]
+    acf[constant]    = 0
+    acf[constant, 0] = 1
+
+    return acf.T.reshape((max_lag,) + data.shape[1:])
+
+def get_statistical_inefficiency(data):
+    """
+        Statistical inefficiency, g, of one or several series: the number of frames between
+        uncorrelated samples, so that a series of n frames has n/g effective samples and its mean a
+        standard error of stdev*sqrt(g/n). g = 1 + 2 sum_t (1-t/n) C(t), where C is the
+        autocorrelation (see get_autocorrelation), summed up to the first lag at which C is no
+        longer positive (Chodera et al., J. Chem. Theory Comput. 3, 26 (2007)).
+
+        Parameters:
+            data (numpy.ndarray) : series along the first axis, shape (frames,) or (frames, series)
+
+        Returns:
+            g    (numpy.ndarray) : statistical inefficiency (>= 1) of each series, shape () or (series,)
+    """
+
+    data     = np.asarray(data, dtype=np.float64)
+    n_frames = data.shape[0]
+    series   = data.reshape(n_frames, -1)
+    g        = np.ones(series.shape[1])
+    if n_frames < 2:
+        return g.reshape(data.shape[1:])[()]
+
+    # weight of each lag
+    weights = (1 - np.arange(1, n_frames)/n_frames)[:, None]
+
+    # the series are taken a few at a time, so that the FFTs of many long series fit in memory
+    chunk_size = max(1, (1 << 22)//n_frames)
+    for start in range(0, series.shape[1], chunk_size):
+        acf = get_autocorrelation(series[:, start:start+chunk_size])[1:]
+
+        # only the lags before the first non-positive autocorrelation of each series count
+        positive = np.logical_and.accumulate(acf > 0, axis=0)
+        g[start:start+chunk_size] += 2*np.sum(np.where(positive, acf*weights, 0), axis=0)
+
+    return np.maximum(g, 1).reshape(data.shape[1:])[()]
+
+def get_block_averages(data, min_blocks=4):
+    """
+        Block averaging of one or several series: the series are cut into blocks of consecutive
+        frames (1, 2, 4, ... frames long), and the standard error of the mean is estimated from the
+        spread of the block means. It grows with the block size until the blocks are longer than the
+        correlation time, and then levels off at the standard error of the mean (Flyvbjerg and
+        Petersen, J. Chem. Phys. 91, 461 (1989)).
+
+        Parameters:
+            data        (numpy.ndarray) : series along the first axis, shape (frames,) or (frames, series)
+            min_blocks  (int)           : smallest number of blocks of the largest block size
+
+        Returns:
+            block_sizes (numpy.ndarray) : number of frames per block
+            sem         (numpy.ndarray) : standard error of the mean estimated with each block size,
+                                          shape (block sizes,) or (block sizes, series)
+    """
+
+    data     = np.asarray(data, dtype=np.float64)
+    n_frames = data.shape[0]
+    series   = data.reshape(n_frames, -1)
+
+    # the block sums of every block size are differences of the same cumulative sum
+    sums = np.zeros((n_frames+1, series.shape[1]))
+    np.cumsum(series - series.mean(axis=0), axis=0, out=sums[1:])
+
+    block_sizes = 1 << np.arange(int(np.log2(max(n_frames//min_blocks, 1))) + 1)
+    sem         = np.empty((len(block_sizes), series.shape[1]))
+    for itr, block_size in enumerate(block_sizes):
+        n_blocks = n_frames//block_size
+        means    = np.diff(sums[:n_blocks*block_size+1:block_size], axis=0)/block_size
+        sem[itr] = np.std(means, axis=0, ddof=1)/np.sqrt(n_blocks)
+
+    return block_sizes, sem.reshape((len(block_sizes),) + data.shape[1:])
+
+# smallest number of blocks of the block sizes whose estimates are reported by get_error_estimate
+MIN_REPORTED_BLOCKS = 16
+
+def get_error_estimate(data):
+    """
+        Mean of one or several correlated series with its uncertainty, estimated both from the
+        autocorrelation (see get_statistical_inefficiency) and by block averaging (see
+        get_block_averages).
+
+        Parameters:
+            data     (numpy.ndarray) : series along the first axis, shape (frames,) or (frames, series)
+
+        Returns:
+            estimate (dict)          : for each series (scalars for a single series):
+                                           mean                     : mean
+                                           stdev                    : sample standard deviation
+                                           statistical_inefficiency : g (measured in frames)
+                                           effective_samples        : number of uncorrelated samples, n/g
+                                           sem                      : standard error of the mean, stdev*sqrt(g/n)
+                                           block_sem                : largest standard error of the mean of
+                                                                      the block sizes with at least
+                                                                      MIN_REPORTED_BLOCKS blocks (the plateau
+                                                                      of the block averaging curve)
+                                       and the block averaging curves (block_sizes, block_curve)
+    """
+
+    data     = np.asarray(data, dtype=np.float64)
+    n_frames = data.shape[0]
+    if n_frames < 2:
+        nan = np.full(data.shape[1:], np.nan)
+        return {"mean": nan, "stdev": nan, "statistical_inefficiency": nan, "effective_samples": nan, "sem": nan,
+                "block_sem": nan, "block_sizes": np.zeros(0, dtype=int), "block_curve": np.zeros((0,) + data.shape[1:])}
+
+    stdev                    = np.std(data, axis=0, ddof=1)
+    g                        = get_statistical_inefficiency(data)
+    block_sizes, block_curve = get_block_averages(data)
+    reported                 = block_curve[n_frames//block_sizes >= MIN_REPORTED_BLOCKS]
+
+    return {"mean"                     : np.mean(data, axis=0),
+            "stdev"                    : stdev,
+            "statistical_inefficiency" : g,
+            "effective_samples"        : n_frames/g,
+            "sem"                      : stdev*np.sqrt(g/n_frames),
+            "block_sem"                : np.max(reported, axis=0) if len(reported) else np.full(data.shape[1:], np.nan),
+            "block_sizes"              : block_sizes,
+            "block_curve"              : block_curve}
+
+def format_error_estimate(time, values, window):
+    # standard error of the mean (2 significant digits) of a series in a time window (see get_error_estimate), as printed by the scripts with --errors
+    estimate = get_error_estimate(get_window(time, values, window))
+    return ("; standard error of the mean: %.2g (block averaging: %.2g), statistical inefficiency: %.1f frames, effective samples: %.0f"
+            % (estimate["sem"], estimate["block_sem"], estimate["statistical_inefficiency"], estimate["effective_samples"]))
+
+def downsample_lttb(x, y, n_points):
+    """
+        Reduces a line to n_points vertices with the largest-triangle-three-buckets algorithm
+        (Steinarsson, 2013): the first and last points are kept, the points in between are split into
+        n_points-2 buckets of consecutive points, and from each bucket the point forming the largest
+        triangle with the point kept from the previous bucket and the average of the next bucket is
+        kept. Peaks and dips are kept, so a smoothed series of tens of thousands of frames looks the
+        same with a few thousand vertices.
+
+        Parameters:
+            x        (numpy.ndarray) : x values (e.g. time), in increasing order
+            y        (numpy.ndarray) : y values
+            n_points (int)           : number of vertices kept (the line is returned unchanged if it has
+                                       at most n_points points, or if n_points is less than 3)
+
+        Returns:
+            x        (numpy.ndarray) : x values of the kept vertices
+            y        (numpy.ndarray) : y values of the kept vertices
+    """
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if (n_points < 3) or (len(x) <= n_points):
+        return x, y
+
+    # bucket b holds the points edges[b] to edges[b+1]-1 (at least one point each)
+    edges = np.linspace(1, len(x)-1, n_points-1).astype(np.int64)
+
+    # average of each bucket, followed by the last point (the "next bucket" of the last bucket)
+    cumsum_x = np.concatenate(([0], np.cumsum(x)))
+    cumsum_y = np.concatenate(([0], np.cumsum(y)))
+    counts   = np.diff(edges)
+    avg_x    = np.append((cumsum_x[edges[1:]]-cumsum_x[edges[:-1]])/counts, x[-1])
+    avg_y    = np.append((cumsum_y[edges[1:]]-cumsum_y[edges[:-1]])/counts, y[-1])
+
+    kept     = np.empty(n_points, dtype=np.int64)
+    kept[0]  = 0
+    kept[-1] = len(x)-1
+    for b in range(n_points-2):
+        first, last = edges[b], edges[b+1]
+        a           = kept[b]
+
+        # twice the area of the triangles (point kept before, candidate point, average of next bucket)
+        areas       = np.abs((x[a]-avg_x[b+1])*(y[first:last]-y[a]) - (x[a]-x[first:last])*(avg_y[b+1]-y[a]))
+        kept[b+1]   = first + np.argmax(areas)
+
+    return x[kept], y[kept]
+
+def plot_data(x, y, x_label, y_label, title, legend, file_name, fig_width, fig_height, max_points=0):
+    """
+        Plots the smoothed series (see moving_average) of each scenario as a function of x.
+
+        Parameters:
+            max_points (int) : if not 0, each smoothed series is reduced to max_points vertices before
+                               plotting (see downsample_lttb)
+    """
+
     # set rcParams
     font_leg = set_rcParameters()
 
     # set figure dimensions
     fig, ax = plt.subplots(1, figsize=(fig_width, fig_height))
 
+    # smooth all series at once (see SMOOTHING_WINDOWS)
+    y_smoothed = smooth_data(y)[-1]
+
     # plot data
     for i in range(len(y)):
-        plt.plot(x, moving_average(moving_average(y[i], 500), 100), label=legend[i])
+        plt.plot(*downsample_lttb(x, y_smoothed[i], max_points), label=legend[i])
 
     # position legend to the left
     plt.legend(loc='center left', bbox_to_anchor=(1, 0.5), prop=font_leg) 
@@ -180,4 +1629,5 @@ def plot_data(x, y, x_label, y_label, title, legend, file_name, fig_width, fig_h
     plt.tight_layout()
 
     # save figure
-    plt.savefig(file_name, bbox_inches="tight", dpi=600)
\ No newline at end of file
+    with trace_stage("savefig " + file_name):
+        plt.savefig(file_name, bbox_inches="tight", dpi=600)
\ No newline at end of file
@@ -0,0 +1,265 @@
+"""
+    Author: Rachel Bricker
+    Year:   2025
+"""
+
+"""
+    Writes synthetic inputs for the plotting scripts, with any number of frames, base pairs, and scenarios, so
+    that the scripts can be timed on trajectories of any length (see benchmark_plots.py).
+
+    Each scenario directory holds what the GROMACS and do_x3dna analyses of a double-stranded DNA run would
+    produce:
+        * hbond.xvg and hbond_angle.xvg   (`distance` and `angle` of the N1-N3 hydrogen bond of each base pair)
+        * gyrate.xvg                      (`gyrate`)
+        * com_files/ and vec_files/       (`traj`: center of mass and vector atoms of each nucleobase)
+        * x3DNA/L-BPS_<i>.dat             (do_x3dna base-pair step parameters, 30 ns per file)
+        * em.gro                          (nucleobase atoms of an ideal B-DNA duplex, optionally with water)
+
+    The duplex is an ideal helix (rise 0.338 nm, twist 36 degrees) with thermal noise. Base pairs open in
+    episodes of consecutive frames, more often at the ends of the duplex than in the middle; an open base pair
+    has a long and bent hydrogen bond and its nucleobases leave the stack, so the hydrogen bond and stacking
+    analyses see the same events.
+"""
+
+"""
+   usage: python3 make_synthetic_data.py
+      1. output directory (the scenario directories scenario_1/, scenario_2/, ... are written in it)
+
+   optional arguments:
+      --frames=N      number of frames of each scenario (default: 20000, i.e. 1 us at 50 ps per frame)
+      --base-pairs=N  number of base pairs of the duplex (default: 21)
+      --scenarios=N   number of scenarios (default: 3)
+      --waters=N      number of water molecules added to em.gro (default: 0)
+      --seed=N        seed of the random number generator (default: 0)
+
+   example: python3 make_synthetic_data.py /tmp/synthetic --frames=50000 --scenarios=4
+"""
+
+import os
+import sys
+import json
+import numpy as np
+from functions_for_plots import split_command_line
+
+# time between frames (measured in ps) and frames per x3DNA .dat file (30 ns)
+TIME_STEP        = 50.0
+FRAMES_PER_CHUNK = int(30000/TIME_STEP)
+
+# rise (nm) and twist (radians) of the ideal B-DNA duplex
+RISE  = 0.338
+TWIST = np.radians(36)
+
+# in-plane coordinates (nm) of the nucleobase atoms, with the purine N1 atom at the origin, the
+# pyrimidine N3 atom at (0.29, 0), and the partner nucleobase towards positive x
+NUCLEOBASE_ATOMS = {"G": {"N9": (-0.40,  0.00), "C8": (-0.42, -0.12), "N7": (-0.31, -0.19), "C5": (-0.21, -0.10),
+                          "C6": (-0.07, -0.13), "O6": ( 0.00, -0.25), "N1": ( 0.00,  0.00), "H1": ( 0.10,  0.00),
+                          "C2": (-0.07,  0.12), "N2": ( 0.00,  0.24), "H21": (0.10,  0.24), "H22": (-0.05, 0.32),
+                          "N3": (-0.20,  0.13), "C4": (-0.27,  0.02)},
+                    "A": {"N9": (-0.40,  0.00), "C8": (-0.42, -0.12), "N7": (-0.31, -0.19), "C5": (-0.21, -0.10),
+                          "C6": (-0.07, -0.13), "N6": ( 0.00, -0.25), "H61": (0.10, -0.25), "H62": (-0.05, -0.33),
+                          "N1": ( 0.00,  0.00), "C2": (-0.07,  0.12), "N3": (-0.20,  0.13), "C4": (-0.27,  0.02)},
+                    "C": {"N1": ( 0.50,  0.12), "C2": ( 0.36,  0.12), "O2": ( 0.29,  0.24), "N3": ( 0.29,  0.00),
+                          "C4": ( 0.36, -0.12), "N4": ( 0.29, -0.25), "H41": (0.19, -0.25), "H42": ( 0.34, -0.34),
+                          "C5": ( 0.50, -0.12), "C6": ( 0.57,  0.00)},
+                    "T": {"N1": ( 0.50,  0.12), "C2": ( 0.36,  0.12), "O2": ( 0.29,  0.24), "N3": ( 0.29,  0.00),
+                          "H3": ( 0.19,  0.00), "C4": ( 0.36, -0.12), "O4": ( 0.29, -0.24), "C5": ( 0.50, -0.12),
+                          "C7": ( 0.57, -0.25), "C6": ( 0.57,  0.00)}}
+
+# atoms that define the vectors a and b of each nucleobase (see plot_stacking.py)
+VECTOR_ATOMS = {"G": ["O6", "C8"], "A": ["N6", "C8"], "C": ["O2", "N4"], "T": ["O2", "O4"]}
+
+COMPLEMENTARY = {"G": "C", "C": "G", "A": "T", "T": "A"}
+
+################################################################################################
+#
+# FUNCTIONS
+#
+################################################################################################
+
+def write_xvg_file(file, time, columns, title, y_label, fmt="%12.7f"):
+    # writes a .xvg file as GROMACS utilities do: comment and '@' lines, then time and columns
+    legends = "".join('@ s' + str(i) + ' legend "' + str(i+1) + '"\n' for i in range(columns.shape[1]))
+    header  = ('# This file was created by make_synthetic_data.py\n'
+               '@    title "' + title + '"\n@    xaxis  label "Time (ps)"\n@    yaxis  label "' + y_label + '"\n@TYPE xy\n' + legends)
+    # np.savetxt ends the header with a newline itself, so the data follows the last '@' line directly
+    np.savetxt(file, np.column_stack((time, columns)), fmt=["%12.3f"] + [fmt]*columns.shape[1], header=header.rstrip("\n"), comments="")
+
+def get_nucleobase_atoms(sequence):
+    """
+        Places the nucleobase atoms of an ideal B-DNA duplex.
+
+        Parameters:
+            sequence   (str)                 : nucleobases of the first strand, 5' to 3'
+
+        Returns:
+            residues   (list[tuple])         : base pair index, nucleobase, and residue name of each
+                                               residue (first strand 5' to 3', then second strand 5'
+                                               to 3')
+            atoms      (list[dict])          : coordinates (measured in nm) of each atom of each
+                                               residue by atom name; the axis of the duplex is the z
+                                               axis
+    """
+
+    n_base_pairs = len(sequence)
+    bases        = [(k, sequence[k], True) for k in range(n_base_pairs)] + [(k, COMPLEMENTARY[sequence[k]], False) for k in reversed(range(n_base_pairs))]
+
+    residues = []
+    atoms    = []
+    for position, (k, base, first_strand) in enumerate(bases):
+        # the nucleobase of the first strand is on the negative x side (the templates have the purine there)
+        mirror       = sequence[k] not in "GA"
+        rotation     = np.array([[np.cos(TWIST*k), -np.sin(TWIST*k)], [np.sin(TWIST*k), np.cos(TWIST*k)]])
+
+        residue_atoms = {}
+        for name, (x, y) in NUCLEOBASE_ATOMS[base].items():
+            x = 0.29-x if mirror else x
+            residue_atoms[name] = np.append(rotation @ np.array([x-0.145, y]), RISE*k)
+
+        # 5' and 3' terminal residues are named as in AMBER force fields
+        terminal = "5" if position in [0, n_base_pairs] else ("3" if position in [n_base_pairs-1, 2*n_base_pairs-1] else "")
+        residues.append((k, base, "D" + base + terminal))
+        atoms.append(residue_atoms)
+
+    return residues, atoms
+
+def get_opening_episodes(n_frames, n_base_pairs, rng):
+    # True where a base pair is open: time-correlated noise above a threshold, which is lower for the base
+    # pairs near the ends of the duplex (fraying)
+    window     = 25
+    noise      = np.cumsum(rng.normal(size=(n_frames+window, n_base_pairs)), axis=0)
+    noise      = (noise[window:]-noise[:-window])/np.sqrt(window)
+    from_end   = np.minimum(np.arange(n_base_pairs), np.arange(n_base_pairs)[::-1])
+    open_ratio = 0.02 + 0.3*np.exp(-from_end/1.5)
+    thresholds = [np.quantile(noise[:, k], 1-open_ratio[k]) for k in range(n_base_pairs)]
+    return noise > thresholds
+
+def write_em_gro_file(file, residues, atoms, n_waters, rng):
+    # nucleobase atoms of the duplex in the middle of a cubic box, followed by the water molecules
+    n_base_pairs = len(residues)//2
+    box          = float(np.ceil(RISE*n_base_pairs + 3))
+    middle       = np.array([box/2, box/2, (box-RISE*(n_base_pairs-1))/2])
+
+    lines   = []
+    atom_id = 0
+    for residue_id, ((k, base, residue_name), residue_atoms) in enumerate(zip(residues, atoms), 1):
+        for name, xyz in residue_atoms.items():
+            atom_id += 1
+            lines.append("%5d%-5s%5s%5d%8.3f%8.3f%8.3f" % (residue_id % 100000, residue_name, name, atom_id % 100000, *(xyz+middle)))
+
+    for water in range(n_waters):
+        oxygen     = rng.uniform(0, box, 3)
+        residue_id = len(residues)+water+1
+        for name, offset in [("OW", (0, 0, 0)), ("HW1", (0.0957, 0, 0)), ("HW2", (-0.024, 0.0927, 0))]:
+            atom_id += 1
+            lines.append("%5d%-5s%5s%5d%8.3f%8.3f%8.3f" % (residue_id % 100000, "SOL", name, atom_id % 100000, *(oxygen+offset)))
+
+    with open(file, "w") as f:
+        f.write("Synthetic B-DNA duplex\n" + str(atom_id) + "\n" + "\n".join(lines) + "\n" + ("%10.5f" % box)*3 + "\n")
+
+def write_x3DNA_files(directory, n_frames, n_base_pairs, rng):
+    # base-pair step parameters in .dat files of FRAMES_PER_CHUNK frames; the first frame of every file but
+    # the first one repeats the last frame of the previous file, as in the files of do_x3dna
+    mean  = np.array([0, 0, 3.32, 0, 0, 34.5])
+    stdev = np.array([0.5, 0.5, 0.2, 3, 5, 4])
+    steps = n_base_pairs-1
+
+    frame_format = "%9.3f"*6 + "\n"
+
+    chunk = 1
+    for first in range(0, max(n_frames-1, 1), FRAMES_PER_CHUNK):
+        frames = np.arange(first, min(first+FRAMES_PER_CHUNK, n_frames-1)+1)
+        values = rng.normal(mean, stdev, (len(frames), steps, 6))
+        with open(os.path.join(directory, "L-BPS_" + str(chunk) + ".dat"), "w") as f:
+            f.write("#Shift     Slide      Rise      Tilt      Roll     Twist\n")
+            for i, frame in enumerate(frames):
+                f.write("# Time = %.3f\n" % (frame*TIME_STEP))
+                f.write("".join(frame_format % tuple(row) for row in values[i]) + "\n")
+        chunk += 1
+
+def make_synthetic_scenario(path, n_frames, n_base_pairs, n_waters, rng):
+    """
+        Writes the inputs of one scenario (see the description above).
+
+        Parameters:
+            path         (str)                   : scenario directory (created if necessary)
+            n_frames     (int)                   : number of frames
+            n_base_pairs (int)                   : number of base pairs
+            n_waters     (int)                   : number of water molecules in em.gro
+            rng          (numpy.random.Generator): random number generator
+    """
+
+    for directory in ["com_files", "vec_files", "x3DNA"]:
+        os.makedirs(os.path.join(path, directory), exist_ok=True)
+
+    time            = np.arange(n_frames)*TIME_STEP
+    sequence        = "".join(rng.choice(list("GCAT"), n_base_pairs))
+    residues, atoms = get_nucleobase_atoms(sequence)
+    is_open         = get_opening_episodes(n_frames, n_base_pairs, rng)
+
+    # N1-N3 distance (nm) and hydrogen bond angle (degrees) of each base pair
+    distances = np.where(is_open, 0.35 + np.abs(rng.normal(0.25, 0.15, is_open.shape)), rng.normal(0.292, 0.012, is_open.shape))
+    angles    = np.where(is_open, rng.uniform(20, 120, is_open.shape), np.abs(rng.normal(0, 12, is_open.shape)))
+    write_xvg_file(os.path.join(path, "hbond.xvg"), time, distances, "Distance", "Distance (nm)")
+    write_xvg_file(os.path.join(path, "hbond_angle.xvg"), time, angles, "Angle", "Angle (degrees)")
+
+    # radius of gyration (nm) and its components, with a slow drift
+    drift  = np.cumsum(rng.normal(0, 0.002, n_frames))
+    gyrate = 0.35*np.sqrt(n_base_pairs) + (drift-drift.mean()) + rng.normal(0, 0.02, (4, n_frames))
+    gyrate[1:] *= [[0.6], [0.6], [0.9]]
+    write_xvg_file(os.path.join(path, "gyrate.xvg"), time, gyrate.T, "Radius of gyration (total and around axes)", "Rg (nm)")
+
+    # nucleobase COM and vector atoms: ideal positions with thermal noise; the nucleobases of an open base
+    # pair move out of the duplex, away from its axis
+    for residue_id, ((k, base, residue_name), residue_atoms) in enumerate(zip(residues, atoms), 1):
+        heavy   = np.array([xyz for name, xyz in residue_atoms.items() if not name.startswith("H")])
+        com     = heavy.mean(axis=0)
+        outward = np.append(com[:2]/np.linalg.norm(com[:2]), 0)
+        shift   = is_open[:, k, None]*0.4*outward + rng.normal(0, 0.03, (n_frames, 3))
+
+        write_xvg_file(os.path.join(path, "com_files", "nucleobase_COM_coord_" + str(residue_id) + ".xvg"), time,
+                       com + shift, "Center of mass", "Coordinate (nm)", fmt="%9.5f")
+        vectors = np.hstack([residue_atoms[name] + shift + rng.normal(0, 0.01, (n_frames, 3)) for name in VECTOR_ATOMS[base]])
+        write_xvg_file(os.path.join(path, "vec_files", "nucleobase_vec_coord_" + str(residue_id) + ".xvg"), time,
+                       vectors, "Coordinates", "Coordinate (nm)", fmt="%9.5f")
+
+    write_x3DNA_files(os.path.join(path, "x3DNA"), n_frames, n_base_pairs, rng)
+    write_em_gro_file(os.path.join(path, "em.gro"), residues, atoms, n_waters, rng)
+
+def make_synthetic_data(output_dir, n_frames=20000, n_base_pairs=21, n_scenarios=3, n_waters=0, seed=0):
+    """
+        Writes the scenario directories scenario_1/, scenario_2/, ... and a file `synthetic_data.json`
+        recording the parameters, so that existing data can be reused (see benchmark_plots.py).
+
+        Returns:
+            paths (list[str]) : scenario directories
+    """
+
+    parameters = {"frames": n_frames, "base_pairs": n_base_pairs, "scenarios": n_scenarios, "waters": n_waters, "seed": seed}
+    rng        = np.random.default_rng(seed)
+
+    paths = []
+    for scenario in range(n_scenarios):
+        paths.append(os.path.join(output_dir, "scenario_" + str(scenario+1)))
+        make_synthetic_scenario(paths[-1], n_frames, n_base_pairs, n_waters, rng)
+
+    with open(os.path.join(output_dir, "synthetic_data.json"), "w") as f:
+        json.dump(parameters, f, indent=4)
+
+    return paths
+
+################################################################################################
+#
+# MAIN PROGRAM
+#
+################################################################################################
+
+def main():
+    # command line input
+    argv, options = split_command_line(sys.argv[1:], {"frames": 20000, "base_pairs": 21, "scenarios": 3, "waters": 0, "seed": 0})
+    output_dir    = str(argv[0])
+
+    paths = make_synthetic_data(output_dir, options["frames"], options["base_pairs"], options["scenarios"], options["waters"], options["seed"])
+    print("Wrote " + str(len(paths)) + " scenarios of " + str(options["frames"]) + " frames to " + output_dir)
+
+if __name__ == "__main__":
+    main()
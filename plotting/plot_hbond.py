@@ -17,6 +17,41 @@
       6. figure height
       7. horizontal color bar (1 for yes, 0 for no)
       i. path to directories that contain arguments (2.) and (3.) that you want to plot
+
+   optional arguments (can be given anywhere on the command line):
+      --chunk-size=N  read the .xvg files N frames at a time, so that memory does not grow with the
+                      length of the trajectory (default: 0, i.e. read each file at once)
+      --stride=N      only read every N-th frame (default: 1)
+      --base-pairs=L  only analyze the base pairs in L, e.g. "1-6,16-21" (default: all base pairs)
+      --traj=FILE     compute the distances and angles from the trajectory FILE (.xtc, or .gro with
+                      one or more frames) inside each directory (i.) instead of reading the .xvg files
+                      of `distance` and `angle` (arguments (2.) and (3.) are then ignored); the atoms
+                      of the trajectory must be numbered as in the .gro and index files
+      --gro=FILE      .gro file inside each directory (i.), used for the residue and atom names
+                      (default: em.gro)
+      --dist-ndx=FILE index file made by make_hbond_index_files.py inside each directory (i.), used
+                      for the base pairs (default: hbond_dist.ndx)
+      --hbonds=MODE   with --traj, "n1n3" to only use the hydrogen bond between N1 and N3 of each
+                      base pair, as the .xvg files (default), or "all" to use every Watson-Crick
+                      hydrogen bond (three for G-C and two for A-T); a base pair is then broken if
+                      any of its hydrogen bonds is broken
+      --stats-only    only print the statistics, without plotting (matplotlib is then not imported)
+      --errors        also print the standard error of each mean, which accounts for the correlation
+                      between frames, and the statistical inefficiency of the hydrogen bond state of
+                      each base pair (see get_error_estimate in functions_for_plots.py)
+      --lifetimes     also print the mean lifetime of the open (broken) and closed (intact) states of
+                      each base pair, and plot the survival function of the open state of each base
+                      pair (hbond_open_survival.svg; see get_lifetimes)
+      --open-distance=X, --open-angle=X
+                      with --lifetimes, hysteresis: an intact hydrogen bond only breaks once its
+                      distance exceeds X nm (at least 0.35) or its angle exceeds X degrees (at least
+                      30), and forms again within 0.35 nm and 30 degrees (default: 0, i.e. no
+                      hysteresis); the distances and angles are then read again
+
+   The hydrogen bond existence matrices and the statistics of each directory (i.) are saved in the analysis
+   store (ANALYSIS_STORE_DIR, see README.md). When a trajectory is extended and the .xvg files are regenerated with the new frames
+   appended, only the new frames are read and analysed on the next run (with --traj, when frames are
+   appended to the trajectory).
    
    examples: python3 plot_hbond.py \
              "(a),(b),(d),(a),(b),(d)" \
@@ -62,19 +97,56 @@
 import sys
 import numpy as np 
 from functions_for_plots import *
-import matplotlib as mpl
-from matplotlib.ticker import FixedLocator
+
+mpl = LazyModule("matplotlib") # only imported when a figure is drawn (see LazyModule)
 
 # command line input
-input_list      = sys.argv[1].replace("\\n", "\n").replace("\\t", "\t").replace("\\(", "(").replace("\\)", ")")
+argv, options   = split_command_line(sys.argv[1:], {"chunk_size": 0, "stride": 1, "base_pairs": "", "traj": None,
+                                                    "gro": "em.gro", "dist_ndx": "hbond_dist.ndx", "hbonds": "n1n3", "stats_only": False,
+                                                    "errors": False, "lifetimes": False, "open_distance": 0.0, "open_angle": 0.0})
+input_list      = argv[0].replace("\\n", "\n").replace("\\t", "\t").replace("\\(", "(").replace("\\)", ")")
 legend          = input_list.split(',')
-dist_xvg        = str(sys.argv[2])
-ang_xvg         = str(sys.argv[3])
-annealing       = bool(int(sys.argv[4]))
-fig_width       = float(sys.argv[5])
-fig_height      = float(sys.argv[6])
-cbar_horizontal = bool(int(sys.argv[7]))
-paths           = list(sys.argv[8:])
+dist_xvg        = str(argv[1])
+ang_xvg         = str(argv[2])
+annealing       = bool(int(argv[3]))
+fig_width       = float(argv[4])
+fig_height      = float(argv[5])
+cbar_horizontal = bool(int(argv[6]))
+paths           = list(argv[7:])
+chunk_size      = options["chunk_size"]
+stride          = options["stride"]
+stats_only      = options["stats_only"]
+errors          = options["errors"]
+lifetimes       = options["lifetimes"]
+
+# windows (measured in ns) of the statistics: all frames, excluding first 200 ns, and after 1000 ns
+STATS_WINDOWS = {"all": [None, None], "after_200ns": [200, None], "after_1000ns": [1000, None]}
+
+# a hydrogen bond exists if the distance and the angle are within these cutoffs
+HBOND_DISTANCE_CUTOFF = 0.35    # nm
+HBOND_ANGLE_CUTOFF    = 30      # degrees
+
+# cutoffs above which an intact hydrogen bond breaks, if the base pair lifetimes are computed with hysteresis
+hysteresis    = bool(options["open_distance"] or options["open_angle"])
+open_distance = options["open_distance"] or HBOND_DISTANCE_CUTOFF
+open_angle    = options["open_angle"] or HBOND_ANGLE_CUTOFF
+if open_distance < HBOND_DISTANCE_CUTOFF or open_angle < HBOND_ANGLE_CUTOFF:
+    sys.exit("Error: --open-distance must be at least " + str(HBOND_DISTANCE_CUTOFF) + " nm and --open-angle at least " + str(HBOND_ANGLE_CUTOFF) + " degrees")
+
+# base pairs to analyze (None for all base pairs)
+base_pairs = None
+if options["base_pairs"]:
+    base_pairs = []
+    for bp_range in options["base_pairs"].split(","):
+        first, _, last = bp_range.partition("-")
+        base_pairs += list(range(int(first), int(last or first)+1))
+
+# files (inside each directory i.) the distances and angles are computed from when reading a trajectory
+traj_inputs = None
+if options["traj"] is not None:
+    if options["hbonds"] not in ["n1n3", "all"]:
+        sys.exit("Error: --hbonds must be n1n3 or all")
+    traj_inputs = {key: options[key] for key in ["traj", "gro", "dist_ndx", "hbonds"]}
 
 # add trailing forward slash to directory path if necessary
 for path in range(len(paths)):
@@ -89,128 +161,608 @@ for path in range(len(paths)):
 ################################################################################################
 
 def get_dist(paths, dist_xvg):
-    time      = []
-    distances = [ [] for scenario in range(len(paths)) ]
+    time      = None
+    distances = []
     
     # loop over scenarios
     for scenario in range(len(paths)):
-        file = paths[scenario] + dist_xvg
-        with open(file, "r") as f:
-            data = read_xvg_file(f) # read data file
-
-            # loop over configurations
-            for conf in range(len(data)):
-                time_step = data[conf].pop(0)
-                
-                if scenario == 0:
-                    time.append(time_step) # get time (measured in ps)
-
-                # record distances
-                distances[scenario].append(data[conf])
-    
-    time = [t/1000 for t in time] # convert ps -> ns
+        data, metadata = read_shared_input(read_xvg_file_cached, paths[scenario] + dist_xvg) # read data file
+
+        if scenario == 0:
+            time = data[:, 0]/1000 # get time and convert ps -> ns
+
+        # record distances (rows are configurations, columns are base pairs)
+        distances.append(data[:, 1:])
     
     return time, distances
 
 def get_angle(paths, ang_xvg):
-    angles = [ [] for scenario in range(len(paths)) ]
+    angles = []
     
     # loop over scenarios
     for scenario in range(len(paths)):
-        file = paths[scenario] + ang_xvg
-        with open(file, "r") as f:
-            data = read_xvg_file(f) # read data file
+        data, metadata = read_shared_input(read_xvg_file_cached, paths[scenario] + ang_xvg) # read data file
 
-            # loop over configurations
-            for conf in range(len(data)):
-                data[conf].pop(0)
-
-                # record distances
-                angles[scenario].append(data[conf])
+        # record angles (rows are configurations, columns are base pairs)
+        angles.append(data[:, 1:])
     
     return angles
 
-def get_hbond_existence(distances, angles):
+def iter_dist_and_angle(path, dist_xvg, ang_xvg, chunk_size=0, stride=1, base_pairs=None, watermarks=None):
+    """
+        Reads the distances and angles of a scenario in chunks of frames, starting where an earlier
+        read stopped (see iter_xvg_file).
+
+        Parameters:
+            path       (str)           : path to directory that contains dist_xvg and ang_xvg
+            dist_xvg   (str)           : name of .xvg file outputted by GROMACS utility `distance`
+            ang_xvg    (str)           : name of .xvg file outputted by GROMACS utility `angle`
+            chunk_size (int)           : maximum number of frames per chunk (0 for one chunk)
+            stride     (int)           : only read every stride-th frame
+            base_pairs (list[int])     : base pairs to read (None for all base pairs)
+            watermarks (list[dict])    : where the earlier read of dist_xvg and ang_xvg stopped (None to
+                                         read the whole files)
+
+        Yields:
+            time       (numpy.ndarray) : time (measured in ns) of the frames in the chunk
+            distances  (numpy.ndarray) : distances of the chunk (frames x base pairs)
+            angles     (numpy.ndarray) : angles of the chunk (frames x base pairs)
+            watermarks (list[dict])    : watermarks of dist_xvg and ang_xvg after the chunk
+    """
+
+    if watermarks is None:
+        watermarks = [None, None]
+
+    # column 0 is time and column i is base pair i
+    columns = None if base_pairs is None else [0] + list(base_pairs)
+
+    for (dist_chunk, dist_watermark), (ang_chunk, ang_watermark) in zip(iter_xvg_file(path + dist_xvg, chunk_size, columns, stride, watermark=watermarks[0]),
+                                                                        iter_xvg_file(path + ang_xvg, chunk_size, columns, stride, watermark=watermarks[1])):
+        if len(dist_chunk) != len(ang_chunk):
+            sys.exit(path + dist_xvg + " and " + path + ang_xvg + " do not have the same number of frames.")
+        yield dist_chunk[:, 0]/1000, dist_chunk[:, 1:], ang_chunk[:, 1:], [dist_watermark, ang_watermark] # convert ps -> ns
+
+# Watson-Crick hydrogen bonds donated by each base: donor, hydrogens bonded to the donor (for amino
+# groups, the hydrogen pointing to the partner base is the one with the smallest angle), and acceptor
+# in the partner base
+WATSON_CRICK_HBONDS = {"G": [("N1", ["H1"], "N3"), ("N2", ["H21", "H22"], "O2")],
+                       "C": [("N4", ["H41", "H42"], "O6")],
+                       "A": [("N6", ["H61", "H62"], "O4")],
+                       "T": [("N3", ["H3"], "N1")],
+                       "U": [("N3", ["H3"], "N1")]}
+
+def get_hbond_atoms(gro, dist_ndx, all_hbonds=False, base_pairs=None):
+    """
+        Finds the donor, hydrogen, and acceptor atoms of the Watson-Crick hydrogen bonds of each base
+        pair. The base pairs are the pairs of atoms of the index file made by make_hbond_index_files.py
+        (N1 of the purine and N3 of the pyrimidine); the other atoms are found by residue and name.
+
+        Parameters:
+            gro        (str)           : path to .gro file
+            dist_ndx   (str)           : path to index file `hbond_dist.ndx`
+            all_hbonds (bool)          : True for every Watson-Crick hydrogen bond, False for only the
+                                         hydrogen bond between N1 and N3
+            base_pairs (list[int])     : base pairs (starting at 1) to use (None for all base pairs)
+
+        Returns:
+            donors     (numpy.ndarray) : index (starting at 0) of the donor of each hydrogen bond
+            hydrogens  (numpy.ndarray) : index of the hydrogens bonded to each donor, shape (hydrogen
+                                         bonds, 2) (repeated if the donor has one hydrogen)
+            acceptors  (numpy.ndarray) : index of the acceptor of each hydrogen bond
+            groups     (numpy.ndarray) : first hydrogen bond of each base pair (hydrogen bonds are
+                                         ordered by base pair)
+    """
+
+    atoms, box = gro_file.read_gro_atom_table(gro)
+    atom_index = gro_file.get_atom_lookup(atoms)
+    resids     = atoms["resid"].tolist()
+    resnames   = atoms["resname"].tolist()
+
+    pairs = list(read_ndx_file(dist_ndx).values())[0].reshape(-1, 2) - 1
+    if base_pairs is not None:
+        pairs = pairs[np.array(base_pairs)-1]
+
+    donors    = []
+    hydrogens = []
+    acceptors = []
+    groups    = []
+    for bp in range(len(pairs)):
+        groups.append(len(donors))
+        residues = [resids[pairs[bp][0]], resids[pairs[bp][1]]]
+        bases    = [gro_file.get_nucleobase(resnames[pairs[bp][0]]), gro_file.get_nucleobase(resnames[pairs[bp][1]])]
+
+        # hydrogen bonds donated by the first base, then by the second base
+        for donor_resi, acceptor_resi, base in [(residues[0], residues[1], bases[0]), (residues[1], residues[0], bases[1])]:
+            for donor, donor_hydrogens, acceptor in WATSON_CRICK_HBONDS.get(base, []):
+                if not all_hbonds and sorted([donor, acceptor]) != ["N1", "N3"]:
+                    continue
+                atoms = [atom_index.get((donor_resi, donor)), atom_index.get((acceptor_resi, acceptor))]
+                atoms += [atom_index.get((donor_resi, name)) for name in donor_hydrogens]
+                if None in atoms: # e.g. mismatch
+                    continue
+                donors.append(atoms[0])
+                acceptors.append(atoms[1])
+                hydrogens.append([atoms[2], atoms[-1]])
+
+        if len(donors) == groups[-1]:
+            sys.exit("Error: no Watson-Crick hydrogen bond found for base pair " + str(bp+1) + " (residues " + str(residues[0]) + " and " + str(residues[1]) + ") of " + gro)
+
+    return np.array(donors), np.array(hydrogens), np.array(acceptors), np.array(groups)
+
+def apply_minimum_image(vectors, box):
+    # shortest periodic image of vectors (frames, ..., 3) in a (triclinic) box (frames, 3, 3) whose rows
+    # are the box vectors, as GROMACS (no change if the box is not set)
+    for dim in [2, 1, 0]:
+        length = box[:, dim, dim].reshape((-1,) + (1,)*(vectors.ndim-2))
+        shift  = np.round(np.divide(vectors[..., dim], length, out=np.zeros(vectors.shape[:-1]), where=length > 0))
+        vectors = vectors - shift[..., None]*box[:, dim].reshape((-1,) + (1,)*(vectors.ndim-2) + (3,))
+    return vectors
+
+def get_hbond_geometry(coords, box, donors, hydrogens, acceptors):
+    """
+        Computes the donor-acceptor distance and the hydrogen-donor-acceptor angle of hydrogen bonds
+        (same as GROMACS utilities `distance` and `angle`).
+
+        Parameters:
+            coords    (numpy.ndarray) : coordinates (measured in nm), shape (frames, atoms, 3)
+            box       (numpy.ndarray) : box vectors (measured in nm), shape (frames, 3, 3)
+            donors    (numpy.ndarray) : index (into the atoms of coords) of the donors
+            hydrogens (numpy.ndarray) : index of the hydrogens bonded to each donor, shape (hydrogen
+                                        bonds, 2); the smallest angle is used
+            acceptors (numpy.ndarray) : index of the acceptors
+
+        Returns:
+            distances (numpy.ndarray) : distances (measured in nm), shape (frames, hydrogen bonds)
+            angles    (numpy.ndarray) : angles (measured in degrees), shape (frames, hydrogen bonds)
+    """
+
+    donor_acceptor = apply_minimum_image(coords[:, acceptors] - coords[:, donors], box)
+    donor_hydrogen = apply_minimum_image(coords[:, hydrogens] - coords[:, donors, None], box)
+
+    distances = np.linalg.norm(donor_acceptor, axis=-1)
+    cos_angle = (np.einsum("fbx,fbhx->fbh", donor_acceptor, donor_hydrogen)
+                 / (distances[..., None]*np.linalg.norm(donor_hydrogen, axis=-1)))
+    angles    = np.degrees(np.arccos(np.clip(cos_angle, -1, 1))).min(axis=-1)
+
+    return distances, angles
+
+def iter_hbond_geometry(path, traj, hbond_atoms, chunk_size=0, stride=1, watermarks=None):
+    """
+        Computes the distances and angles of the hydrogen bonds of a scenario from a trajectory, in
+        chunks of frames, starting where an earlier read stopped (same as iter_dist_and_angle).
+
+        Parameters:
+            path        (str)           : path to directory that contains traj
+            traj        (str)           : name of .xtc or .gro file
+            hbond_atoms (tuple)         : donors, hydrogens, acceptors, and groups (see get_hbond_atoms)
+            chunk_size  (int)           : maximum number of frames per chunk (0 for one chunk)
+            stride      (int)           : only use every stride-th frame
+            watermarks  (list[dict])    : where the earlier read of traj stopped (None to read the whole
+                                          file)
+
+        Yields:
+            time        (numpy.ndarray) : time (measured in ns) of the frames in the chunk
+            distances   (numpy.ndarray) : distances of the chunk (frames x hydrogen bonds)
+            angles      (numpy.ndarray) : angles of the chunk (frames x hydrogen bonds)
+            watermarks  (list[dict])    : watermark of traj after the chunk
+    """
+
+    donors, hydrogens, acceptors, groups = hbond_atoms
+
+    # only the atoms of the hydrogen bonds are kept
+    atoms     = np.unique(np.concatenate((donors, hydrogens.ravel(), acceptors)))
+    donors    = np.searchsorted(atoms, donors)
+    hydrogens = np.searchsorted(atoms, hydrogens)
+    acceptors = np.searchsorted(atoms, acceptors)
+
+    offset   = 0 if watermarks is None else watermarks[0]["offset"]
+    n_frames = 0 if watermarks is None else watermarks[0]["n_frames"]
+
+    for time, box, coords, offset in iter_trajectory(path + traj, chunk_size, atoms, offset):
+        keep      = (n_frames + np.arange(len(time))) % stride == 0
+        n_frames += len(time)
+        distances, angles = get_hbond_geometry(coords[keep], box[keep], donors, hydrogens, acceptors)
+        yield time[keep]/1000, distances, angles, [get_xvg_watermark(path + traj, offset, n_frames)] # convert ps -> ns
+
+def update_hbond_analysis(path, dist_xvg, ang_xvg, chunk_size=0, stride=1, base_pairs=None, traj_inputs=None):
+    """
+        Computes the hydrogen bond existence matrix of a scenario chunk by chunk, so that the
+        distances and angles of only one chunk are held in memory at a time. The matrix, the number of
+        broken hydrogen bonds, and its statistics are saved in the analysis store of the scenario (see
+        save_analysis_state), so that only the frames appended since the last run are read when the
+        trajectory is extended. If traj_inputs is given (names of the "traj", "gro", and "dist_ndx"
+        files, and "hbonds"), the distances and angles are computed from the trajectory instead of
+        read from the .xvg files (see iter_hbond_geometry).
+
+        Returns:
+            time              (numpy.ndarray) : time (measured in ns)
+            hbond_bool_matrix (numpy.ndarray) : see get_hbond_existence
+            n_base_pairs      (int)           : number of base pairs (columns before packing)
+            n_broken_hbond    (numpy.ndarray) : number of broken hydrogen bonds per configuration
+            window_stats      (dict)          : statistics of n_broken_hbond (see update_window_stats)
+    """
+
+    windows = STATS_WINDOWS
+
+    if traj_inputs is None:
+        files        = [path + dist_xvg, path + ang_xvg]
+        entry        = get_analysis_store_entry(path + dist_xvg, "hbond")
+        settings     = {"dist_xvg": dist_xvg, "ang_xvg": ang_xvg, "stride": stride, "base_pairs": base_pairs, "windows": windows}
+        hbond_groups = None
+    else:
+        files        = [path + traj_inputs["traj"]]
+        entry        = get_analysis_store_entry(path + traj_inputs["traj"], "hbond_" + traj_inputs["traj"].replace(".", "_"))
+        settings     = dict(traj_inputs, stride=stride, base_pairs=base_pairs, windows=windows)
+        hbond_atoms  = get_hbond_atoms(path + traj_inputs["gro"], path + traj_inputs["dist_ndx"], traj_inputs["hbonds"] == "all", base_pairs)
+        hbond_groups = hbond_atoms[3]
+
+    info, saved = load_analysis_state(entry, settings)
+    if info is None or not all(is_valid_watermark(file, watermark) for file, watermark in zip(files, info["watermarks"])):
+        # first run, or the files were rewritten
+        info  = {"watermarks": None, "n_base_pairs": 0, "stats": {}}
+        saved = {"time": np.zeros(0), "hbond_bool_matrix": None, "n_broken_hbond": np.zeros(0, dtype=np.int64)}
+
+    time_chunks  = [saved["time"]]
+    Z_chunks     = [] if saved["hbond_bool_matrix"] is None else [saved["hbond_bool_matrix"]]
+    n_base_pairs = info["n_base_pairs"]
+    watermarks   = info["watermarks"]
+
+    if traj_inputs is None:
+        chunks = iter_dist_and_angle(path, dist_xvg, ang_xvg, chunk_size, stride, base_pairs, watermarks)
+    else:
+        chunks = iter_hbond_geometry(path, traj_inputs["traj"], hbond_atoms, chunk_size, stride, watermarks)
+
+    # loop over chunks of new configurations
+    for time_chunk, dist_chunk, ang_chunk, watermarks in chunks:
+        time_chunks.append(time_chunk)
+        Z_chunks.append(get_hbond_existence([dist_chunk], [ang_chunk], hbond_groups)[0])
+        n_base_pairs = dist_chunk.shape[1] if hbond_groups is None else len(hbond_groups)
+
+    if not Z_chunks: # no complete frame yet (e.g. only the header of the .xvg files was written)
+        sys.exit("Error: no complete frame in " + " and ".join(files) + ".")
+
+    n_old             = len(saved["time"])
+    time              = np.concatenate(time_chunks)
+    hbond_bool_matrix = np.concatenate(Z_chunks)
+    if n_old and len(time) == n_old: # nothing appended
+        return time, hbond_bool_matrix, n_base_pairs, saved["n_broken_hbond"], info["stats"]
+
+    # running totals of the new configurations
+    n_broken_hbond = np.concatenate((saved["n_broken_hbond"], get_n_broken_hbond([hbond_bool_matrix[n_old:]])[0]))
+    window_stats   = update_window_stats(info["stats"], time[n_old:], n_broken_hbond[n_old:], windows)
+
+    save_analysis_state(entry, settings, {"watermarks": watermarks, "n_base_pairs": n_base_pairs, "stats": window_stats},
+                        {"time": time, "hbond_bool_matrix": hbond_bool_matrix, "n_broken_hbond": n_broken_hbond})
+
+    return time, hbond_bool_matrix, n_base_pairs, n_broken_hbond, window_stats
+
+def get_hbond_existence_from_files(paths, dist_xvg, ang_xvg, chunk_size=0, stride=1, base_pairs=None, traj_inputs=None):
+    """
+        Gets the hydrogen bond existence matrix of each scenario (see update_hbond_analysis).
+
+        Returns:
+            time              (numpy.ndarray)       : time (measured in ns)
+            hbond_bool_matrix (list[numpy.ndarray]) : see get_hbond_existence
+            n_base_pairs      (int)                 : number of base pairs (columns before packing)
+            n_broken_hbond    (list[numpy.ndarray]) : number of broken hydrogen bonds per configuration
+            n_broken_stats    (list[dict])          : statistics of n_broken_hbond (see update_window_stats)
+    """
+
+    time              = None
+    hbond_bool_matrix = []
+    n_broken_hbond    = []
+    n_broken_stats    = []
+
+    # loop over scenarios
+    for scenario in range(len(paths)):
+        time_i, Z, n_base_pairs, n_broken, stats = update_hbond_analysis(paths[scenario], dist_xvg, ang_xvg, chunk_size, stride, base_pairs, traj_inputs)
+
+        if scenario == 0:
+            time = time_i
+        hbond_bool_matrix.append(Z)
+        n_broken_hbond.append(n_broken)
+        n_broken_stats.append(stats)
+
+    return time, hbond_bool_matrix, n_base_pairs, n_broken_hbond, n_broken_stats
+
+# number of set bits of every byte value
+POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+def get_hbond_existence(distances, angles, hbond_groups=None):
+    """
+        Builds the bit-packed hydrogen bond existence matrix of each scenario. Bit j of row i is 1 if
+        the hydrogen bond of base pair j is broken in configuration i, i.e. the i-th row of the
+        unpacked matrix is np.unpackbits(Z[i])[:n_base_pairs] (see unpack_hbond_matrix).
+
+        Parameters:
+            distances         (list[numpy.ndarray]) : distances of each scenario (configurations x base pairs)
+            angles            (list[numpy.ndarray]) : angles of each scenario (configurations x base pairs)
+            hbond_groups      (numpy.ndarray)       : if the columns are several hydrogen bonds per base
+                                                      pair, the first column of each base pair; a base
+                                                      pair is broken if any of its hydrogen bonds is
+                                                      broken (None for one column per base pair)
+
+        Returns:
+            hbond_bool_matrix (list[numpy.ndarray]) : uint8 matrix of each scenario, shape
+                                                      (configurations, ceil(base pairs/8))
+    """
+
     # hbond exists if:
-    #     distance <= 0.35 nm
-    #     angle    <= 30 degrees
+    #     distance <= 0.35 nm (HBOND_DISTANCE_CUTOFF)
+    #     angle    <= 30 degrees (HBOND_ANGLE_CUTOFF)
 
     # list of matrices
     hbond_bool_matrix = []
 
     for scenario in range(len(distances)):
-        # initialize data matrix
-        Z = []
+        broken = ~((np.asarray(distances[scenario]) <= HBOND_DISTANCE_CUTOFF) & (np.asarray(angles[scenario]) <= HBOND_ANGLE_CUTOFF))
+        if hbond_groups is not None:
+            broken = np.logical_or.reduceat(broken, hbond_groups, axis=1)
+        hbond_bool_matrix.append(np.packbits(broken, axis=1))
 
-        # number of configurations
-        n_configurations = len(distances[scenario])
+    return hbond_bool_matrix
 
-        # get number of base pairs
-        base_pairs   = list(range(1, len(distances[scenario][0])+1))
-        n_base_pairs = len(base_pairs)
-        del base_pairs
+def unpack_hbond_matrix(Z, n_base_pairs):
+    # 0/1 matrix (configurations x base pairs), 1 if the hydrogen bond is broken
+    return np.unpackbits(Z, axis=1, count=n_base_pairs)
 
-        # loop over configurations
-        for conf in range(n_configurations):
-            if not len(Z): # if data matrix is empty...
-                Z = np.zeros((n_configurations, n_base_pairs)) # ... then create matrix of zeros
+def get_n_broken_hbond(hbond_bool_matrix, stop_residue_id=None):
+    """
+        Counts the broken hydrogen bonds of each configuration from the set bits of the bit-packed
+        matrices (see get_hbond_existence).
 
-            # loop over base pairs
-            for base_pair in range(n_base_pairs):
-                dist  = distances[scenario][conf][base_pair]
-                angle = angles[scenario][conf][base_pair]
+        Parameters:
+            hbond_bool_matrix (list[numpy.ndarray]) : bit-packed matrix of each scenario
+            stop_residue_id   (int)                 : only count the first stop_residue_id base pairs
+                                                      (None for all base pairs)
 
-                if not (dist <= 0.35 and angle <= 30):
-                    Z[conf][base_pair]  = 1
-        
-        # append matrix
-        hbond_bool_matrix.append(Z)
+        Returns:
+            n_broken_hbond    (list[numpy.ndarray]) : number of broken hydrogen bonds per configuration
+    """
 
-    return hbond_bool_matrix
+    n_broken_hbond = []
 
-def get_n_broken_hbond(hbond_bool_matrix, stop_residue_id=None):
-    # hbond exists if:
-    #     distance <= 0.35 nm
-    #     angle    <= 30 degrees
-    
-    n_broken_hbond = [ [] for scenario in range(len(hbond_bool_matrix)) ]
-    
     # loop over scenarios
     for scenario in range(len(hbond_bool_matrix)):
+        Z = hbond_bool_matrix[scenario]
 
-        # loop over configurations
-        for conf in range(len(hbond_bool_matrix[scenario])):
-            broken_hbond_count = 0
-            
-            if stop_residue_id == None:
-                stop_residue_id = len(hbond_bool_matrix[scenario][conf])
+        # bits of the base pairs to count
+        if stop_residue_id is not None:
+            Z = Z & np.packbits(np.arange(Z.shape[1]*8) < stop_residue_id)
+
+        n_broken_hbond.append(POPCOUNT[Z].sum(axis=1, dtype=np.int64))
+
+    return n_broken_hbond
 
-            # loop over base pairs
-            for base_pair in range(stop_residue_id):
-                if hbond_bool_matrix[scenario][conf][base_pair] == 1:
-                    broken_hbond_count += 1
+def get_n_broken_per_base_pair(hbond_bool_matrix, n_base_pairs, chunk_size=4096):
+    """
+        Counts the configurations in which the hydrogen bond of each base pair is broken.
+
+        Parameters:
+            hbond_bool_matrix (list[numpy.ndarray]) : bit-packed matrix of each scenario
+            n_base_pairs      (int)                 : number of base pairs
+            chunk_size        (int)                 : number of configurations unpacked at once
+
+        Returns:
+            n_broken_hbond    (list[numpy.ndarray]) : number of configurations per base pair
+    """
 
-            n_broken_hbond[scenario].append(broken_hbond_count)
+    n_broken_hbond = []
+
+    # loop over scenarios
+    for scenario in range(len(hbond_bool_matrix)):
+        Z      = hbond_bool_matrix[scenario]
+        counts = np.zeros(n_base_pairs, dtype=np.int64)
+        for start in range(0, len(Z), chunk_size):
+            counts += unpack_hbond_matrix(Z[start:start+chunk_size], n_base_pairs).sum(axis=0, dtype=np.int64)
+        n_broken_hbond.append(counts)
 
     return n_broken_hbond
     
 def get_avg_dist_per_conf(distances, stop_residue_id=None):  
-    dist_avg = [ [] for scenario in range(len(distances)) ]
+    dist_avg = []
     
     # loop over scenarios
     for scenario in range(len(distances)):
-
-        # loop over configurations
-        for conf in range(len(distances[scenario])):
-            
-            if stop_residue_id == None:
-                stop_residue_id = len(distances[scenario][conf])
-
-            dist_avg[scenario].append(statistics.mean(distances[scenario][conf][:stop_residue_id]))
+        # average over base pairs of each configuration
+        dist_avg.append(np.mean(distances[scenario][:, :stop_residue_id], axis=1))
     
     return dist_avg
 
-def plot_color_map(time, hbond_bool_matrix, annealing, font_leg):
+def get_hysteresis_states(distances, angles, open_distance, open_angle, previous=None):
+    """
+        Hydrogen bond states with hysteresis: an intact hydrogen bond only breaks once its distance
+        exceeds open_distance or its angle exceeds open_angle, and a broken one only forms again once
+        its distance and angle are within HBOND_DISTANCE_CUTOFF and HBOND_ANGLE_CUTOFF. In between, a
+        hydrogen bond keeps its state, so that fluctuations around a single cutoff are not counted as
+        openings and closings.
+
+        Parameters:
+            distances     (numpy.ndarray) : distances (frames x hydrogen bonds)
+            angles        (numpy.ndarray) : angles (frames x hydrogen bonds)
+            open_distance (float)         : distance (measured in nm) above which a hydrogen bond breaks
+            open_angle    (float)         : angle (measured in degrees) above which a hydrogen bond breaks
+            previous      (numpy.ndarray) : state of each hydrogen bond before the first frame (True if
+                                            broken), e.g. the last frame of the previous chunk; None if
+                                            unknown (a hydrogen bond is then broken until it forms)
+
+        Returns:
+            broken        (numpy.ndarray) : True if the hydrogen bond is broken (frames x hydrogen bonds)
+    """
+
+    distances = np.asarray(distances)
+    angles    = np.asarray(angles)
+    formed    = (distances <= HBOND_DISTANCE_CUTOFF) & (angles <= HBOND_ANGLE_CUTOFF)
+    breaking  = (distances > open_distance) | (angles > open_angle)
+
+    # every frame takes the state of the last frame (up to and including it) whose state is decided
+    frames  = np.arange(len(distances))[:, None]
+    decided = np.maximum.accumulate(np.where(formed | breaking, frames, -1), axis=0)
+    broken  = breaking[np.maximum(decided, 0), np.arange(distances.shape[1])]
+
+    return np.where(decided < 0, True if previous is None else previous, broken)
+
+def get_hysteresis_states_from_files(path, dist_xvg, ang_xvg, open_distance, open_angle, chunk_size=0, stride=1, base_pairs=None, traj_inputs=None):
+    """
+        Reads the distances and angles of a scenario chunk by chunk (see iter_dist_and_angle and
+        iter_hbond_geometry) and finds the state of each base pair with hysteresis (see
+        get_hysteresis_states). With several hydrogen bonds per base pair (--hbonds=all), a base pair
+        is broken if any of its hydrogen bonds is broken.
+
+        Returns:
+            time   (numpy.ndarray) : time (measured in ns)
+            broken (numpy.ndarray) : True if the base pair is broken (frames x base pairs)
+    """
+
+    if traj_inputs is None:
+        groups = None
+        chunks = iter_dist_and_angle(path, dist_xvg, ang_xvg, chunk_size, stride, base_pairs)
+    else:
+        hbond_atoms = get_hbond_atoms(path + traj_inputs["gro"], path + traj_inputs["dist_ndx"], traj_inputs["hbonds"] == "all", base_pairs)
+        groups      = hbond_atoms[3]
+        chunks      = iter_hbond_geometry(path, traj_inputs["traj"], hbond_atoms, chunk_size, stride)
+
+    time_chunks   = []
+    broken_chunks = []
+    previous      = None
+    for time_chunk, dist_chunk, ang_chunk, watermarks in chunks:
+        broken = get_hysteresis_states(dist_chunk, ang_chunk, open_distance, open_angle, previous)
+        if len(broken):
+            previous = broken[-1]
+        if groups is not None:
+            broken = np.logical_or.reduceat(broken, groups, axis=1)
+        time_chunks.append(time_chunk)
+        broken_chunks.append(broken)
+
+    return np.concatenate(time_chunks), np.concatenate(broken_chunks)
+
+def get_dwell_times(states):
+    """
+        Splits the series of states of every base pair into dwells (runs of consecutive frames in the
+        same state), for all base pairs at once: the matrix is read base pair after base pair and a
+        dwell starts wherever the state changes or a new base pair starts.
+
+        Parameters:
+            states    (numpy.ndarray) : state of each base pair in each frame (frames x base pairs), e.g.
+                                        True if broken (open)
+
+        Returns:
+            columns   (numpy.ndarray) : base pair (column) of each dwell
+            values    (numpy.ndarray) : state of each dwell
+            lengths   (numpy.ndarray) : number of frames of each dwell
+            first     (numpy.ndarray) : True if the dwell starts in the first frame (its start is unknown)
+            last      (numpy.ndarray) : True if the dwell ends in the last frame (its end is unknown)
+    """
+
+    states              = np.asarray(states)
+    n_frames, n_columns = states.shape
+    if states.size == 0:
+        empty = np.zeros(0, dtype=np.intp)
+        return empty, np.zeros(0, dtype=states.dtype), empty, empty.astype(bool), empty.astype(bool)
+
+    series             = states.T.ravel()
+    starts             = np.empty(series.size, dtype=bool)
+    starts[0]          = True
+    starts[1:]         = series[1:] != series[:-1]
+    starts[::n_frames] = True
+    starts             = np.flatnonzero(starts)
+    lengths            = np.diff(np.append(starts, series.size))
+    frames             = starts % n_frames
+
+    return starts//n_frames, series[starts], lengths, frames == 0, frames+lengths == n_frames
+
+def get_survival_functions(columns, lengths, censored, n_columns):
+    """
+        Kaplan-Meier estimate of the survival function of the dwell times of each base pair (the
+        probability that a dwell lasts longer than t frames), for all base pairs at once. Dwells whose
+        end is not known (censored) count as lasting at least their length.
+
+        Parameters:
+            columns      (numpy.ndarray) : base pair (column) of each dwell (see get_dwell_times)
+            lengths      (numpy.ndarray) : number of frames of each dwell
+            censored     (numpy.ndarray) : True if the dwell ends in the last frame
+            n_columns    (int)           : number of base pairs
+
+        Returns:
+            survival     (numpy.ndarray) : survival function, shape (base pairs, longest dwell + 1);
+                                           element [j, t] is the probability that a dwell of base pair j
+                                           lasts longer than t frames
+            distribution (numpy.ndarray) : number of complete (not censored) dwells of each length,
+                                           shape (base pairs, longest dwell + 1)
+    """
+
+    n_lengths    = (int(lengths.max()) if lengths.size else 0) + 1
+    index        = columns*n_lengths + lengths
+    distribution = np.bincount(index[~censored], minlength=n_columns*n_lengths).reshape(n_columns, n_lengths)
+    dwells       = np.bincount(index, minlength=n_columns*n_lengths).reshape(n_columns, n_lengths)
+
+    # number of dwells lasting at least t frames (at risk of ending after t frames)
+    at_risk = np.cumsum(dwells[:, ::-1], axis=1)[:, ::-1]
+    hazard  = distribution/np.maximum(at_risk, 1)
+
+    return np.cumprod(1-hazard, axis=1), distribution
+
+def get_lifetimes(states, time_step):
+    """
+        Dwell-time distributions, survival functions, and mean lifetimes of the open (broken) and
+        closed (intact) states of each base pair. The first dwell of each base pair is left out, since
+        it may have started before the first frame; the last one is censored (see
+        get_survival_functions). The mean lifetime is the area under the survival function, i.e. it is
+        restricted to the longest dwell.
+
+        Parameters:
+            states    (numpy.ndarray) : True if the base pair is broken (frames x base pairs)
+            time_step (float)         : time (measured in ns) between frames
+
+        Returns:
+            lifetimes (dict)          : for "open" and "closed":
+                                            survival      : see get_survival_functions
+                                            distribution  : see get_survival_functions
+                                            mean_lifetime : mean lifetime (measured in ns) of each base
+                                                            pair (nan without a dwell)
+                                            n_dwells      : number of complete dwells of each base pair
+    """
+
+    n_columns                             = np.shape(states)[1]
+    columns, values, lengths, first, last = get_dwell_times(states)
+
+    lifetimes = {}
+    for name, value in [("open", True), ("closed", False)]:
+        keep                   = (values == value) & ~first
+        survival, distribution = get_survival_functions(columns[keep], lengths[keep], last[keep], n_columns)
+        has_dwells             = np.bincount(columns[keep], minlength=n_columns) > 0
+        lifetimes[name] = {"survival"      : survival,
+                           "distribution"  : distribution,
+                           "mean_lifetime" : np.where(has_dwells, survival.sum(axis=1)*time_step, np.nan),
+                           "n_dwells"      : distribution.sum(axis=1)}
+
+    return lifetimes
+
+def pool_hbond_matrix(Z, n_rows):
+    """
+        Reduces the configurations (rows) of a bit-packed hydrogen bond existence matrix to at most
+        n_rows rows by max-pooling: a row of the pooled matrix covers consecutive configurations and
+        a hydrogen bond is broken in it if it is broken in any of them, so short breaking events are
+        kept however many configurations are pooled.
+
+        Parameters:
+            Z      (numpy.ndarray) : bit-packed matrix (see get_hbond_existence)
+            n_rows (int)           : maximum number of rows
+
+        Returns:
+            Z      (numpy.ndarray) : bit-packed matrix with min(configurations, n_rows) rows
+    """
+
+    if len(Z) <= n_rows:
+        return Z
+
+    # first configuration of each row (rows cover the same number of configurations, give or take one)
+    starts = (np.arange(n_rows)*len(Z))//n_rows
+
+    # the maximum of bits is their bitwise or, so the packed matrix is pooled without unpacking it
+    return np.bitwise_or.reduceat(Z, starts, axis=0)
+
+def plot_color_map(time, hbond_bool_matrix, n_base_pairs, annealing, font_leg, base_pairs=None, dpi=600):
     font_size   = font_leg.get_size()
     font_family = font_leg.get_family()[0]
     
@@ -231,7 +783,10 @@ def plot_color_map(time, hbond_bool_matrix, annealing, font_leg):
     cmap = mpl.colors.ListedColormap([(0.922, 0.922, 0.922), (0.62, 0.192, 0.961)])
 
     for scenario in range(len(hbond_bool_matrix)):
-        Z = hbond_bool_matrix[scenario]
+        # only unpack as many rows as the axes has pixels in the saved figure, so the time to render
+        # and the size of the image do not grow with the length of the trajectory
+        n_rows = int(np.ceil(axes[scenario].get_position().height*fig_height*dpi))
+        Z      = unpack_hbond_matrix(pool_hbond_matrix(hbond_bool_matrix[scenario], n_rows), n_base_pairs)
 
         time_step = time[1]-time[0]
         xleft     = 1
@@ -242,7 +797,8 @@ def plot_color_map(time, hbond_bool_matrix, annealing, font_leg):
         #ratio         = 1.0
         #aspect_square = abs((xright-xleft)/(ybottom-ytop))*ratio
 
-        # plot color plot
+        # plot color plot (the image is embedded in the .svg file as a raster, the axes and text stay
+        # vector)
         pixel_plot = axes[scenario].imshow(Z, cmap=cmap, interpolation='nearest', origin='lower', vmin=0, vmax=1,
                                            extent=[xleft, xright, ybottom, ytop], aspect='auto')
 
@@ -255,10 +811,11 @@ def plot_color_map(time, hbond_bool_matrix, annealing, font_leg):
         if annealing:
             y_axis_freq = 200
         axes[scenario].set_yticks(np.arange(ybottom+half_time_step, ytop+half_time_step, y_axis_freq), np.arange(ybottom, ytop, y_axis_freq, dtype=int))
-        axes[scenario].set_xticks(np.arange(xleft+0.5, xright+0.5, x_axis_freq), np.arange(xleft, xright, x_axis_freq))
+        base_pair_ids = np.arange(xleft, xright) if base_pairs is None else np.array(base_pairs)
+        axes[scenario].set_xticks(np.arange(xleft+0.5, xright+0.5, x_axis_freq), base_pair_ids[::x_axis_freq])
         
         # set minor tick locations on the x-axis
-        axes[scenario].xaxis.set_minor_locator(FixedLocator(np.arange(xleft+0.5, xright+0.5, 1)))
+        axes[scenario].xaxis.set_minor_locator(mpl.ticker.FixedLocator(np.arange(xleft+0.5, xright+0.5, 1)))
 
         # put x-axis label on centermost plot
         if scenario == len(hbond_bool_matrix)//2:
@@ -307,7 +864,52 @@ def plot_color_map(time, hbond_bool_matrix, annealing, font_leg):
     #plt.tight_layout()
 
     # save figure
-    plt.savefig(file_name, bbox_inches="tight", dpi=600)
+    with trace_stage("savefig " + file_name):
+        plt.savefig(file_name, bbox_inches="tight", dpi=dpi)
+
+def plot_survival(lifetimes, time_steps, n_base_pairs, font_leg, base_pairs=None, dpi=600):
+    """
+        Plots the survival function of the open state of each base pair, i.e. the probability that a
+        base pair is still open a time t after it opened, with one panel per scenario.
+
+        Parameters:
+            lifetimes  (list[dict])  : lifetimes of each scenario (see get_lifetimes)
+            time_steps (list[float]) : time (measured in ns) between frames of each scenario
+    """
+
+    # initialize file name
+    file_name = "hbond_open_survival.svg"
+
+    # base pairs are colored from the first (dark) to the last (light) one
+    base_pair_ids = np.arange(1, n_base_pairs+1) if base_pairs is None else np.array(base_pairs)
+    colors        = plt.cm.viridis(np.linspace(0, 1, n_base_pairs))
+
+    fig, axes = plt.subplots(nrows=1, ncols=len(lifetimes), sharey=True, figsize=(fig_width, fig_height), squeeze=False)
+    axes      = axes[0]
+    for scenario in range(len(lifetimes)):
+        survival = lifetimes[scenario]["open"]["survival"]
+        for bp in range(n_base_pairs):
+            # the survival function only changes where a dwell ends
+            steps = np.flatnonzero(np.diff(survival[bp], prepend=np.inf))
+            axes[scenario].step(steps*time_steps[scenario], survival[bp][steps], where="post", color=colors[bp], linewidth=0.75)
+
+        axes[scenario].set_title(legend[scenario])
+        axes[scenario].set_yscale("log")
+        axes[scenario].grid(True)
+
+        # put x-axis label on centermost plot
+        if scenario == len(lifetimes)//2:
+            axes[scenario].set_xlabel("Time open (ns)")
+        # put y-axis label on leftmost plot
+        if scenario == 0:
+            axes[scenario].set_ylabel("Survival")
+
+    cbar = fig.colorbar(plt.cm.ScalarMappable(norm=mpl.colors.Normalize(base_pair_ids[0], base_pair_ids[-1]), cmap="viridis"), ax=axes, pad=0.015, aspect=10)
+    cbar.set_label("Base pair", fontproperties=font_leg)
+
+    # save figure
+    with trace_stage("savefig " + file_name):
+        plt.savefig(file_name, bbox_inches="tight", dpi=dpi)
 
 ################################################################################################
 #
@@ -315,21 +917,23 @@ def plot_color_map(time, hbond_bool_matrix, annealing, font_leg):
 #
 ################################################################################################
 
+@trace_stage("plot_hbond")
 def main():  
     # get data from .xvg files
-    time, distances   = get_dist(paths, dist_xvg)
-    angles            = get_angle(paths, ang_xvg)
-    hbond_bool_matrix = get_hbond_existence(distances, angles)
-    n_broken_hbond    = get_n_broken_hbond(hbond_bool_matrix)
+    with trace_stage("read and analyze hydrogen bonds"):
+        time, hbond_bool_matrix, n_base_pairs, n_broken_hbond, n_broken_stats = get_hbond_existence_from_files(paths, dist_xvg, ang_xvg, chunk_size, stride, base_pairs, traj_inputs)
 
-    # set rcParams
-    font_leg = set_rcParameters()
+    if not stats_only:
+        # set rcParams
+        font_leg = set_rcParameters()
 
-    # plot boolean color map
-    plot_color_map(time, hbond_bool_matrix, annealing, font_leg)
+        # plot boolean color map
+        with trace_stage("plot color map"):
+            plot_color_map(time, hbond_bool_matrix, n_base_pairs, annealing, font_leg, base_pairs)
 
     """
     # plot other data as function of time
+    time, distances = get_dist(paths, dist_xvg)
     stop_residue_id = 6   # first six residues
     x_label         = "Simulation time (ns)"
     fig_width       = 3.35
@@ -363,17 +967,45 @@ def main():
               fig_height)
     """
 
-    # print statistics
-    frame_200ns  = 4000
-    frame_1000ns = 20000
+    # print statistics (with --errors, followed by the standard error of the mean, see get_error_estimate)
+    error = lambda i, window: format_error_estimate(time, n_broken_hbond[i], STATS_WINDOWS[window]) if errors else ""
     for i in range(len(n_broken_hbond)):
-        print("Average number of melted base pairs for file " + str(i+1) + ": " + str(round(statistics.mean(n_broken_hbond[i]),1)) + " +/- " + str(round(statistics.stdev(n_broken_hbond[i]),1)))
+        mean, stdev = get_mean_and_stdev(n_broken_stats[i]["all"])
+        print("Average number of melted base pairs for file " + str(i+1) + ": " + str(round(mean,1)) + " +/- " + str(round(stdev,1)) + error(i, "all"))
     for i in range(len(n_broken_hbond)):
-        if len(n_broken_hbond[i]) > frame_200ns+1:
-            print("Average number of melted base pairs for file " + str(i+1) + " (excluding first 200 ns): " + str(round(statistics.mean(n_broken_hbond[i][frame_200ns:]),1)) + " +/- " + str(round(statistics.stdev(n_broken_hbond[i][frame_200ns:]),1)))
+        if n_broken_stats[i]["after_200ns"][0] > 1:
+            mean, stdev = get_mean_and_stdev(n_broken_stats[i]["after_200ns"])
+            print("Average number of melted base pairs for file " + str(i+1) + " (excluding first 200 ns): " + str(round(mean,1)) + " +/- " + str(round(stdev,1)) + error(i, "after_200ns"))
     for i in range(len(n_broken_hbond)):
-        if len(n_broken_hbond[i]) > frame_1000ns+1:
-            print("Average number of melted base pairs for file " + str(i+1) + " (only including last 200 ns): " + str(round(statistics.mean(n_broken_hbond[i][frame_1000ns:]),1)) + " +/- " + str(round(statistics.stdev(n_broken_hbond[i][frame_1000ns:]),1)))
+        if n_broken_stats[i]["after_1000ns"][0] > 1:
+            mean, stdev = get_mean_and_stdev(n_broken_stats[i]["after_1000ns"])
+            print("Average number of melted base pairs for file " + str(i+1) + " (only including last 200 ns): " + str(round(mean,1)) + " +/- " + str(round(stdev,1)) + error(i, "after_1000ns"))
+
+    if errors:
+        # number of frames between uncorrelated samples of the state of each base pair (all base pairs at once)
+        for i in range(len(hbond_bool_matrix)):
+            g = get_statistical_inefficiency(unpack_hbond_matrix(hbond_bool_matrix[i], n_base_pairs))
+            print("Statistical inefficiency (frames) of the hydrogen bond state of each base pair for file " + str(i+1) + ": " + ", ".join(str(round(float(g_bp), 1)) for g_bp in g))
+
+    if lifetimes:
+        # dwell times of the open and closed states of each base pair
+        with trace_stage("base pair lifetimes"):
+            bp_lifetimes = []
+            time_steps   = []
+            for i in range(len(hbond_bool_matrix)):
+                if hysteresis:
+                    time_i, states = get_hysteresis_states_from_files(paths[i], dist_xvg, ang_xvg, open_distance, open_angle, chunk_size, stride, base_pairs, traj_inputs)
+                else:
+                    time_i, states = time, unpack_hbond_matrix(hbond_bool_matrix[i], n_base_pairs).astype(bool)
+                time_steps.append(float(np.median(np.diff(time_i))) if len(time_i) > 1 else 0.0)
+                bp_lifetimes.append(get_lifetimes(states, time_steps[i]))
+
+                print("Mean open lifetime (ns) of each base pair for file " + str(i+1) + ": " + ", ".join(str(round(float(t), 2)) for t in bp_lifetimes[i]["open"]["mean_lifetime"]))
+                print("Mean closed lifetime (ns) of each base pair for file " + str(i+1) + ": " + ", ".join(str(round(float(t), 2)) for t in bp_lifetimes[i]["closed"]["mean_lifetime"]))
+                print("Number of complete openings of each base pair for file " + str(i+1) + ": " + ", ".join(str(n) for n in bp_lifetimes[i]["open"]["n_dwells"]))
+
+            if not stats_only:
+                plot_survival(bp_lifetimes, time_steps, n_base_pairs, font_leg, base_pairs)
 
 if __name__ == "__main__": 
     main()
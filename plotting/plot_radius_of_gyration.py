@@ -12,6 +12,19 @@
       1. figure width
       2. figure height
       i. path to .xvg file outputted by GROMACS utility `gyrate` that you want to plot
+
+   optional arguments (can be given anywhere on the command line):
+      --chunk-size=N  read the .xvg files N frames at a time (default: 0, i.e. read each file at once)
+      --stride=N      only read every N-th frame (default: 1)
+      --max-points=N  draw each smoothed series with at most N vertices, chosen so that the line looks the
+                      same (default: 0, i.e. every frame)
+      --stats-only    only print the statistics, without plotting (matplotlib is then not imported)
+      --errors        also print the standard error of each mean, which accounts for the correlation
+                      between frames (see get_error_estimate in functions_for_plots.py)
+
+   The time series, its smoothed version, and its statistics of each .xvg file are saved in the analysis
+   store (ANALYSIS_STORE_DIR, see README.md). When a trajectory is extended and the .xvg file is regenerated with the new frames appended,
+   only the new frames are read and analysed on the next run.
    
    examples: python3 plot_radius_of_gyration.py \
              3.7 \
@@ -32,14 +45,24 @@
              /mnt/c/Users/brick/Documents/alkyl_chain_stuff/GROMACS_files/AMBER/ssDNA5/gyrate.xvg
 """
 
+import os
 import sys
 import numpy as np 
 from functions_for_plots import *
 
 # command line input
-fig_width  = float(sys.argv[1])
-fig_height = float(sys.argv[2])
-paths      = list(sys.argv[3:])
+argv, options = split_command_line(sys.argv[1:], {"chunk_size": 0, "stride": 1, "max_points": 0, "stats_only": False, "errors": False})
+fig_width     = float(argv[0])
+fig_height    = float(argv[1])
+paths         = list(argv[2:])
+chunk_size    = options["chunk_size"]
+stride        = options["stride"]
+max_points    = options["max_points"]
+stats_only    = options["stats_only"]
+errors        = options["errors"]
+
+# windows (measured in ns) of the statistics: all frames and excluding first 200 ns
+STATS_WINDOWS = {"all": [None, None], "after_200ns": [200, None]}
 
 ################################################################################################
 #
@@ -47,26 +70,78 @@ paths      = list(sys.argv[3:])
 #
 ################################################################################################
 
-def get_time_and_gyrate(paths):
-    gyrate = [[] for i in range(len(paths))]
-    time   = []
+def update_gyrate_analysis(file, chunk_size=0, stride=1):
+    """
+        Gets the radius of gyration of a .xvg file. The series and its statistics are saved in the
+        analysis store (see save_analysis_state), so that only the frames appended
+        since the last run are read when the trajectory is extended.
+
+        Parameters:
+            file         (str)                 : path to .xvg file outputted by GROMACS utility `gyrate`
+            chunk_size   (int)                 : read the new frames chunk_size frames at a time (0 for
+                                                 all at once)
+            stride       (int)                 : only read every stride-th frame
+
+        Returns:
+            time         (numpy.ndarray)       : time (measured in ns)
+            gyrate       (numpy.ndarray)       : radius of gyration of the molecule
+            smoothed     (list[numpy.ndarray]) : see smooth_data
+            window_stats (dict)                : see update_window_stats
+    """
+
+    windows = STATS_WINDOWS
+
+    entry       = get_analysis_store_entry(file, os.path.splitext(os.path.basename(file))[0])
+    settings    = {"file": os.path.basename(file), "stride": stride, "smoothing": SMOOTHING_WINDOWS, "windows": windows}
+    info, saved = load_analysis_state(entry, settings)
+    if info is None or not is_valid_watermark(file, info["watermark"]): # first run, or the file was rewritten
+        info  = {"watermark": None, "stats": {}}
+        saved = {"time": np.zeros(0), "gyrate": np.zeros(0)}
+
+    # read new frames chunk by chunk (only time and the radius of gyration of the molecule)
+    time_chunks   = [saved["time"]]
+    gyrate_chunks = [saved["gyrate"]]
+    watermark     = info["watermark"]
+    for chunk, watermark in iter_xvg_file(file, chunk_size, columns=[0, 1], stride=stride, watermark=watermark):
+        time_chunks.append(chunk[:, 0]/1000) # get time and convert ps -> ns
+        gyrate_chunks.append(chunk[:, 1])    # get radius of gyration of molecule
+    time   = np.concatenate(time_chunks)
+    gyrate = np.concatenate(gyrate_chunks)
+    if len(gyrate) == 0: # no complete frame yet (e.g. only the header of the .xvg file was written)
+        sys.exit("Error: no complete frame in " + file + ".")
+
+    n_old    = len(saved["gyrate"])
+    smoothed = [saved["smoothed_" + str(itr)] for itr in range(len(SMOOTHING_WINDOWS))] if n_old else None
+    if n_old and len(gyrate) == n_old: # nothing appended
+        return time, gyrate, smoothed, info["stats"]
+
+    smoothed     = smooth_data(gyrate, smoothed)
+    window_stats = update_window_stats(info["stats"], time[n_old:], gyrate[n_old:], windows)
+
+    arrays = {"time": time, "gyrate": gyrate}
+    for itr in range(len(smoothed)):
+        arrays["smoothed_" + str(itr)] = smoothed[itr]
+    save_analysis_state(entry, settings, {"watermark": watermark, "stats": window_stats}, arrays)
+
+    return time, gyrate, smoothed, window_stats
+
+def get_time_and_gyrate(paths, chunk_size=0, stride=1):
+    gyrate          = []
+    gyrate_smoothed = []
+    gyrate_stats    = []
+    time            = None
 
     # iterate over each .xvg file passed via command line
     for i in range(len(paths)):
-        file = paths[i]
-        with open(file, "r") as f:
-            data = read_xvg_file(f) # read data file
-
-            # iterate over configurations
-            for j in range(len(data)):
-                if i == 0:
-                    time.append(data[j][0]) # get time (measured in ps)
+        time_i, gyrate_i, smoothed_i, stats_i = update_gyrate_analysis(paths[i], chunk_size, stride)
 
-                gyrate[i].append(data[j][1]) # get radius of gyration of molecule
+        if i == 0:
+            time = time_i
+        gyrate.append(gyrate_i)
+        gyrate_smoothed.append(smoothed_i[-1])
+        gyrate_stats.append(stats_i)
 
-    time = [t/1000 for t in time] # convert ps -> ns
-
-    return time, gyrate
+    return time, gyrate, gyrate_smoothed, gyrate_stats
 
 ################################################################################################
 #
@@ -74,45 +149,52 @@ def get_time_and_gyrate(paths):
 #
 ################################################################################################
 
+@trace_stage("plot_radius_of_gyration")
 def main():
     # get data from .xvg files
-    time, gyrate = get_time_and_gyrate(paths)
+    with trace_stage("read and analyze radius of gyration"):
+        time, gyrate, gyrate_smoothed, gyrate_stats = get_time_and_gyrate(paths, chunk_size, stride)
     
-    # set rcParams
-    font_leg = set_rcParameters()
+    if not stats_only:
+        # set rcParams
+        font_leg = set_rcParameters()
 
-    # set figure dimensions
-    fig, ax = plt.subplots(1, figsize=(fig_width, fig_height))
+        # set figure dimensions
+        fig, ax = plt.subplots(1, figsize=(fig_width, fig_height))
 
-    # plot data
-    for i in range(len(gyrate)):
-        plt.plot(time, moving_average(moving_average(gyrate[i], 500), 100))
+        # plot data
+        for i in range(len(gyrate)):
+            plt.plot(*downsample_lttb(time, gyrate_smoothed[i], max_points))
 
-    # set x-axis label
-    plt.xlabel("Simulation time (ns)")
+        # set x-axis label
+        plt.xlabel("Simulation time (ns)")
         
-    # set y-axis label
-    plt.ylabel("Gyration radius (nm)")
+        # set y-axis label
+        plt.ylabel("Gyration radius (nm)")
 
-    # set x-axis limits
-    plt.xlim(time[0]-8, time[-1]+8)
+        # set x-axis limits
+        plt.xlim(time[0]-8, time[-1]+8)
 
-    # show grid
-    plt.grid()
+        # show grid
+        plt.grid()
 
-    plt.tight_layout()
+        plt.tight_layout()
 
-    # save figure
-    plt.savefig("gyrate_plot.svg", bbox_inches="tight", dpi=600)
+        # save figure
+        with trace_stage("savefig gyrate_plot.svg"):
+            plt.savefig("gyrate_plot.svg", bbox_inches="tight", dpi=600)
     
-    # print statistics
-    frame_200ns  = 4000
+    # print statistics (with --errors, followed by the standard error of the mean, see get_error_estimate)
     rounding     = 2
+    error        = lambda i, window: format_error_estimate(time, gyrate[i], STATS_WINDOWS[window]) if errors else ""
     for i in range(len(gyrate)):
-        print("Average radius of gyration value for file " + str(i+1) + ": " + str(round(statistics.mean(gyrate[i]),rounding)) + " +/- " + str(round(statistics.stdev(gyrate[i]),rounding)))
+        mean, stdev = get_mean_and_stdev(gyrate_stats[i]["all"])
+        print("Average radius of gyration value for file " + str(i+1) + ": " + str(round(mean,rounding)) + " +/- " + str(round(stdev,rounding)) + error(i, "all"))
         
     for i in range(len(gyrate)):
-        print("Average radius of gyration value for file " + str(i+1) + " (excluding first 200 ns): " + str(round(statistics.mean(gyrate[i][frame_200ns:]),rounding)) + " +/- " + str(round(statistics.stdev(gyrate[i][frame_200ns:]),rounding)))
+        if gyrate_stats[i]["after_200ns"][0] > 1:
+            mean, stdev = get_mean_and_stdev(gyrate_stats[i]["after_200ns"])
+            print("Average radius of gyration value for file " + str(i+1) + " (excluding first 200 ns): " + str(round(mean,rounding)) + " +/- " + str(round(stdev,rounding)) + error(i, "after_200ns"))
 
 if __name__ == "__main__": 
     main()
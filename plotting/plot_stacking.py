@@ -70,6 +70,31 @@ r"""
       5. enter 1 if double-stranded, 0 if single-stranded
       i. path to directories that contain arguments (2.) and (3.) that you want to plot
 
+   optional arguments (can be given anywhere on the command line):
+      --float32        compute the stacking coordinates in single precision (half the memory)
+      --xtc=FILE       compute the nucleobase coordinates from the trajectory FILE inside each
+                       directory (i.) instead of the .xvg files of `traj` (arguments (2.) and (3.) are
+                       then ignored); the atoms of the trajectory must be numbered as in the .gro and
+                       index files
+      --gro=FILE       .gro file inside each directory (i.), used for the atom masses (default: em.gro)
+      --com-ndx=FILE   index file of the nucleobase atoms inside each directory (i.)
+                       (default: nucleobase_COM_atoms.ndx)
+      --vec-ndx=FILE   index file of the vector atoms inside each directory (i.)
+                       (default: nucleobase_vec_atoms.ndx)
+      --max-points=N   draw each smoothed time series with at most N vertices, chosen so that the line
+                       looks the same (default: 0, i.e. every frame)
+      --stats-only     only print the statistics, without plotting (matplotlib is then not imported)
+      --chunk-size=N   analyse N frames of a scenario at a time (default: 4096); only the counts of
+                       each frame and the histogram are kept, so memory does not grow with the length
+                       of the trajectory or the number of scenarios
+      --errors         also print the standard error of each mean, which accounts for the correlation
+                       between frames (see get_error_estimate in functions_for_plots.py)
+
+   On the first run, the .xvg files of each directory (i.) are packed into the memory-mapped arrays of a
+   store in NUCLEOBASE_COORD_STORE_DIR (see `make_nucleobase_coord_store` in functions_for_plots.py and
+   README.md), which later runs open instead of the .xvg files. With --xtc, the store is computed from the
+   trajectory, in chunks of frames, so `traj` does not need to be run.
+
    example: python3 plot_stacking.py \
             "(a),(b),(d)" \
             com_files \
@@ -86,13 +111,30 @@ import numpy as np
 from functions_for_plots import *
 
 # command line input
-input_list = sys.argv[1].replace("\\n", "\n").replace("\\t", "\t").replace("\\(", "(").replace("\\)", ")")
-legend     = input_list.split(',')
-com_dir    = str(sys.argv[2])
-vec_dir    = str(sys.argv[3])
-n_residues = int(sys.argv[4])
-ds         = bool(int(sys.argv[5]))
-paths      = list(sys.argv[6:])
+argv, options = split_command_line(sys.argv[1:], {"float32": False, "xtc": None, "gro": "em.gro",
+                                                  "com_ndx": "nucleobase_COM_atoms.ndx",
+                                                  "vec_ndx": "nucleobase_vec_atoms.ndx", "max_points": 0,
+                                                  "stats_only": False, "chunk_size": 4096, "errors": False})
+input_list    = argv[0].replace("\\n", "\n").replace("\\t", "\t").replace("\\(", "(").replace("\\)", ")")
+legend        = input_list.split(',')
+com_dir       = str(argv[1])
+vec_dir       = str(argv[2])
+n_residues    = int(argv[3])
+ds            = bool(int(argv[4]))
+paths         = list(argv[5:])
+dtype         = np.float32 if options["float32"] else np.float64
+max_points    = options["max_points"]
+stats_only    = options["stats_only"]
+chunk_size    = options["chunk_size"]
+errors        = options["errors"]
+
+# files (inside each directory i.) the nucleobase coordinates are computed from when reading a trajectory
+xtc_inputs = None
+if options["xtc"] is not None:
+    xtc_inputs = {key: options[key] for key in ["xtc", "gro", "com_ndx", "vec_ndx"]}
+
+# number of nucleotides of each strand
+strand_lengths = [n_residues//2, n_residues-(n_residues//2)] if ds else [n_residues]
 
 # add trailing forward slash to directory path if necessary
 for path in range(len(paths)):
@@ -115,152 +157,170 @@ def S(alpha):
 def xi(COM_dist, alpha):
     return ( COM_dist / ( S(alpha) ) )
 
-def get_data(paths, n_residues, com_dir, vec_dir, ds):
-    stacking_coords = [ [] for scenario in range(len(paths)) ]
+def get_stacking_coords(COM_coords, vec_coords, ds, dtype=np.float64, chunk_size=4096):
+    """
+        Computes the stacking coordinate, xi, of every base step in every frame with array
+        operations over (frames x residues).
+
+        Parameters:
+            COM_coords      (numpy.ndarray) : center of mass of each nucleobase, shape
+                                              (frames, residues, 3)
+            vec_coords      (numpy.ndarray) : x, y, z position of the two atoms that define the
+                                              vectors a and b of each nucleobase, shape
+                                              (frames, residues, 2, 3)
+            ds              (bool)          : True if double-stranded, i.e. the step at residue
+                                              n_residues//2 is a strand break
+            dtype           (numpy.dtype)   : precision of the computation (numpy.float64 or
+                                              numpy.float32)
+            chunk_size      (int)           : number of frames computed at once (bounds the size
+                                              of the temporary arrays)
+
+        Returns:
+            stacking_coords (numpy.ndarray) : xi (measured in nm), shape (frames, base steps)
+    """
+
+    n_frames, n_residues = COM_coords.shape[:2]
+
+    # base steps (residue i and residue i+1); there is no following base at the terminals
+    first  = np.array([resi for resi in range(n_residues-1) if not (ds and resi == (n_residues//2))])
+    second = first+1
+
+    stacking_coords = np.empty((n_frames, first.size), dtype=dtype)
+    for start in range(0, n_frames, chunk_size):
+        COM = np.asarray(COM_coords[start:start+chunk_size], dtype=dtype)
+        vec = np.asarray(vec_coords[start:start+chunk_size], dtype=dtype)
+
+        # normal vectors of the base planes, a x b
+        norms = np.cross(vec[:, :, 0] - COM, vec[:, :, 1] - COM)
+
+        # distance between mass centers of consecutive bases
+        delta    = COM[:, second] - COM[:, first]
+        COM_dist = np.sqrt(np.sum(delta*delta, axis=-1))
+
+        # angle between consecutive base planes (radians)
+        u         = norms[:, first]
+        v         = norms[:, second]
+        cos_theta = np.sum(u*v, axis=-1) / (np.sqrt(np.sum(u*u, axis=-1)) * np.sqrt(np.sum(v*v, axis=-1)))
+        alpha     = np.arccos(np.clip(cos_theta, -1.0, 1.0))
+
+        stacking_coords[start:start+chunk_size] = xi(COM_dist, alpha)
+
+    return stacking_coords
+
+def get_stacked_segments(stacking_coords, strand_lengths, transient_pt=0.6):
+    """
+        Finds the runs of consecutively-stacked base steps of every frame. A base step is stacked if
+        xi is less than or equal to the transient point; the end of each strand breaks a run.
+
+        Parameters:
+            stacking_coords (numpy.ndarray) : xi (measured in nm), shape (frames, base steps); the
+                                              base steps of each strand are listed strand after strand
+            strand_lengths  (list[int])     : number of nucleotides of each strand
+            transient_pt    (float)         : xi, measured in nm, that separates the pools of the
+                                              stacked and unstacked configurations
+
+        Returns:
+            n_broken        (numpy.ndarray) : number of broken stacking interactions per frame
+            frames          (numpy.ndarray) : frame of each stacked segment
+            lengths         (numpy.ndarray) : number of consecutively-stacked nucleotides of each
+                                              stacked segment (base steps + 1)
+    """
+
+    stacked  = np.asarray(stacking_coords) <= transient_pt
+    n_broken = stacked.shape[1] - np.count_nonzero(stacked, axis=1)
+
+    # separate and pad the strands with unstacked steps, so that the runs start where the
+    # difference is +1 and end where it is -1 without crossing a strand end
+    strand_ends = np.cumsum([n_nucleotides-1 for n_nucleotides in strand_lengths])
+    if strand_ends[-1] != stacked.shape[1]:
+        sys.exit("The strand lengths " + str(list(strand_lengths)) + " do not add up to the " + str(stacked.shape[1]) + " base steps.")
+    padded = np.insert(stacked, strand_ends[:-1], False, axis=1)
+    padded = np.pad(padded, ((0, 0), (1, 1)))
+
+    edges         = np.diff(padded.view(np.int8), axis=1)
+    frames, first = np.nonzero(edges == 1)
+    _, last       = np.nonzero(edges == -1)
+
+    return n_broken, frames, last-first+1
+
+def analyze_stacking(COM_coords, vec_coords, ds, strand_lengths, dtype=np.float64, chunk_size=4096):
+    """
+        Counts the broken stacking interactions of every frame and builds the histogram of the
+        number of consecutively-stacked nucleotides of a scenario, one window of frames at a time:
+        xi is computed for the frames of the window only, and only the counts of the window are
+        kept, so the memory used is set by chunk_size rather than by the number of frames.
+
+        Parameters:
+            COM_coords     (numpy.ndarray) : center of mass of each nucleobase, shape (frames, residues, 3)
+                                             (e.g. memory-mapped, see open_nucleobase_coord_store)
+            vec_coords     (numpy.ndarray) : x, y, z position of the two atoms that define the vectors
+                                             a and b of each nucleobase, shape (frames, residues, 2, 3)
+            ds             (bool)          : True if double-stranded
+            strand_lengths (list[int])     : number of nucleotides of each strand
+            dtype          (numpy.dtype)   : precision of xi (numpy.float64 or numpy.float32)
+            chunk_size     (int)           : number of frames analysed at once
+
+        Returns:
+            n_broken       (numpy.ndarray) : number of broken stacking interactions per frame
+            counts         (numpy.ndarray) : number of stacked segments of each length, i.e. element n
+                                             counts the segments of n consecutively-stacked nucleotides;
+                                             element 0 counts the frames without stacked bases
+    """
+
+    n_frames = len(COM_coords)
+    n_broken = np.empty(n_frames, dtype=np.intp)
+    counts   = np.zeros(max(strand_lengths)+1, dtype=np.intp)
+    for start in range(0, n_frames, chunk_size):
+        stacking_coords                  = get_stacking_coords(COM_coords[start:start+chunk_size], vec_coords[start:start+chunk_size], ds, dtype, chunk_size)
+        chunk_broken, frames, lengths    = get_stacked_segments(stacking_coords, strand_lengths)
+        n_broken[start:start+chunk_size] = chunk_broken
+
+        # the histograms of the windows add up to the histogram of the scenario
+        counts    += np.bincount(lengths, minlength=counts.size)
+        counts[0] += np.count_nonzero(chunk_broken == stacking_coords.shape[1])    # frames with NO stacked bases
+
+    return n_broken, counts
+
+def get_data(paths, n_residues, com_dir, vec_dir, ds, strand_lengths, dtype=np.float64, xtc_inputs=None, chunk_size=4096):
+    """
+        Analyses the stacking of every scenario (see analyze_stacking), reading the nucleobase
+        coordinates of one scenario at a time from its memory-mapped store.
+
+        Returns:
+            time                (numpy.ndarray)       : time (measured in ns) of the last scenario
+            n_broken_stacking   (list[numpy.ndarray]) : number of broken stacking interactions per frame
+            consecutive_stacked (list[numpy.ndarray]) : histogram of the number of consecutively-stacked
+                                                        nucleotides (see analyze_stacking)
+    """
+
+    n_broken_stacking   = []
+    consecutive_stacked = []
     for scenario in range(len(paths)):
-        time       = []
-        COM_coords = [ [] for resi in range(n_residues) ]
+        # time has shape (frames,), COM_coords has shape (frames, residues, 3), and vec_coords has
+        # shape (frames, residues, 2, 3), i.e. the x, y, z position of the two atoms that define the
+        # vectors a and b of each nucleobase
+        time, COM_coords, vec_coords = open_nucleobase_coord_store(paths[scenario], n_residues, com_dir, vec_dir, xtc_inputs)
+
+        # measure the angle alpha, in radians, between base planes and the distance between mass
+        # centers of consecutive bases, combine them into the stacking coordinate, xi (measured in
+        # nm), and count the stacked segments
+        n_broken, counts = analyze_stacking(COM_coords, vec_coords, ds, strand_lengths, dtype, chunk_size)
+
+        n_broken_stacking.append(n_broken)
+        consecutive_stacked.append(counts)
 
-        # iterate over residues
-        for resi in range(n_residues):
-            file = paths[scenario] + com_dir + "/nucleobase_COM_coord_" + str(resi+1) + ".xvg"
-            with open(file, "r") as f:
-                data = read_xvg_file(f) # read data file
-
-                # iterate over time
-                for t in range(len(data)):
-                    time_step = data[t].pop(0)
-
-                    # only record time once
-                    if resi == 0:
-                        time.append(time_step) # get time (measured in ps)
-
-                    COM_coords[resi].append(data[t])
-
-        time = [t/1000 for t in time] # convert ps -> ns
-
-        atoms_xyz = []
-        norms     = [ [] for resi in range(n_residues) ] # base plane normal vectors
-
-        # iterate over residues
-        for resi in range(n_residues):
-            file = paths[scenario] + vec_dir + "/nucleobase_vec_coord_" + str(resi+1) + ".xvg"
-            with open(file, "r") as f:
-                data = read_xvg_file(f) # read data file
-
-                # iterate over time
-                for t in range(len(data)):
-                    data[t].pop(0) # time was already recorded, so discard it
-
-                    # record the xyz coordinates of atoms
-                    # data is written like: a1x, a1y, a1z, a2x, a2y, a2z, ...
-                    atoms_xyz = [data[t][i:i+3] for i in range(0, len(data[t]), 3)]
-
-                    COM_coord = COM_coords[resi][t]
-                    vec_a     = np.array([atoms_xyz[0][0]-COM_coord[0],
-                                          atoms_xyz[0][1]-COM_coord[1],
-                                          atoms_xyz[0][2]-COM_coord[2]])
-                    vec_b     = np.array([atoms_xyz[1][0]-COM_coord[0],
-                                          atoms_xyz[1][1]-COM_coord[1],
-                                          atoms_xyz[1][2]-COM_coord[2]])
-                 
-                    # record normal vector of base plane
-                    norms[resi].append(np.cross(vec_a, vec_b))
-
-        # measure the angle alpha, in radians, between base planes
-        # and the distance between mass centers of consecutive bases
-
-        # iterate over time
-        for t in range(len(time)):
-            time_step = []
-            # iterate over residues
-            for resi in range(n_residues):
-                if ( (ds and resi == (n_residues//2)) or (resi+1 == n_residues) ):
-                    # we are at a terminal, so there is no following base
-                    continue
-
-                # distance between mass centers
-                first_COM_pos  = COM_coords[resi][t]      # grab the center of mass position of nucleobase i
-                second_COM_pos = COM_coords[resi+1][t]    # grab the center of mass position of nucleobase i+1
-
-                # get the differences between the corresponding x, y, and z values for the distance formula
-                delta_x = second_COM_pos[0] - first_COM_pos[0]    # change in x-coordinate
-                delta_y = second_COM_pos[1] - first_COM_pos[1]    # change in y-coordinate
-                delta_z = second_COM_pos[2] - first_COM_pos[2]    # change in z-coordinate
-
-                # apply distance formula
-                COM_dist = np.sqrt(delta_x**2 + delta_y**2 + delta_z**2)
-
-                # angle between base planes
-                u         = norms[resi][t]      # normal of base plane of residue i
-                v         = norms[resi+1][t]    # normal of base plane of residue i+1
-                cos_theta = np.dot(u, v) / (np.linalg.norm(u) * np.linalg.norm(v))
-                alpha     = np.arccos(np.clip(cos_theta, -1.0, 1.0))    # angle between consecutive base planes (radians)
-
-                time_step.append(xi(COM_dist, alpha))
-
-            stacking_coords[scenario].append(time_step)    # the stacking coordinate, xi, is measured in nm
-
-    return time, stacking_coords
-
-def analyze_data(stacking_coords, max_strand_len=21):
-    # records the number of consecutively stacked bases for each scenario for each configuration
-    consecutive_stacked = [ [ [] for t in range(len(stacking_coords[scenario])) ] for scenario in range(len(stacking_coords)) ]
-
-    # records the number of broken stacked bases for each scenario for each configuration
-    n_broken_stacking = [ [] for scenario in range(len(stacking_coords)) ]
-
-    # will allow us to determine if we are at the last recorded stacking coordinate of a strand
-    n_stacking_coord_per_strand = max_strand_len-1
-
-    # transient point, measured in nm, that separates the pools of the stacked and unstacked configurations
-    transient_pt = 0.6
-
-    # loop over scenarios
-    for scenario in range(len(stacking_coords)):
-        # loop over time
-        for t in range(len(stacking_coords[scenario])):
-
-            # iterate through the stacking coordinate values
-            consecutive_count = 1   # tracks the number of consecutive bases stacked
-            broken_count      = 0   # tracks the number of broken stacking
-            prev              = -1  # records previous data point
-
-            # loop over recorded stacking coordinates at time 't'
-            for coord_itr in range(len(stacking_coords[scenario][t])):
-                coord_value = stacking_coords[scenario][t][coord_itr]
-                if coord_value > transient_pt:
-                    if prev <= transient_pt and prev != -1:
-                        consecutive_stacked[scenario][t].append(consecutive_count)
-                    consecutive_count = 1
-                    broken_count     += 1
-                elif (coord_itr == n_stacking_coord_per_strand-1) or (coord_itr == (n_stacking_coord_per_strand*2)-1): # check if we are at a terminal of a strand
-                    consecutive_count += 1 # add terminal nucleotide
-                    consecutive_stacked[scenario][t].append(consecutive_count)
-                    prev  = -1
-                    consecutive_count = 1
-                    continue
-                else:
-                    consecutive_count += 1
-                prev = coord_value
-
-            n_broken_stacking[scenario].append(broken_count)
-
-            if not consecutive_stacked[scenario][t]: # if there are NO stacked bases
-                consecutive_stacked[scenario][t].append(0)
-
-    return n_broken_stacking, consecutive_stacked
+    return time, n_broken_stacking, consecutive_stacked
 
 def plot_histogram(consecutive_stacked):
     fig      = plt.figure()
     ax       = fig.add_axes(111, projection='3d')
     binwidth = 1
     for i in range(len(consecutive_stacked)):
-        data = sum(consecutive_stacked[i], [])
-        n, bins = np.histogram(data,
-                               density=True,
-                               bins=np.arange(min(data)-binwidth/2, max(data)+1+binwidth/2, binwidth))
-        bincenters = 0.5*(bins[1:] + bins[:-1])
+        # probability density over the lengths from the shortest to the longest segment
+        counts     = consecutive_stacked[i]
+        lengths    = np.flatnonzero(counts)
+        n          = counts[lengths[0]:lengths[-1]+1] / (counts.sum()*binwidth)
+        bincenters = np.arange(lengths[0], lengths[-1]+1)
         ax.bar3d(bincenters, i-0.2, 0, 0.3, 0.1, n)
 
     # set viewing angle
@@ -292,7 +352,8 @@ def plot_histogram(consecutive_stacked):
     ax.zaxis._axinfo['juggled'] = (1,2,0) # z-axis left side
     ax.set_zlabel("Probability density", labelpad=-2)
 
-    plt.savefig("stacking_hist.svg", bbox_inches="tight", dpi=600)
+    with trace_stage("savefig stacking_hist.svg"):
+        plt.savefig("stacking_hist.svg", bbox_inches="tight", dpi=600)
 
 ################################################################################################
 #
@@ -300,39 +361,48 @@ def plot_histogram(consecutive_stacked):
 #
 ################################################################################################
 
+@trace_stage("plot_stacking")
 def main():
     # get data from .xvg files
-    time, stacking_coords                  = get_data(paths, n_residues, com_dir, vec_dir, ds)
-    n_broken_stacking, consecutive_stacked = analyze_data(stacking_coords)
-
-    # set rcParams
-    font_leg = set_rcParameters()
-
-    # set figure dimensions
-    fig_width   = 5
-    golden_mean = (np.sqrt(5)-1.0)/2.0     # aesthetic ratio
-    fig_height  = fig_width*golden_mean    # height in inches
-
-    # plot the data
-    plot_data(time,
-              n_broken_stacking,
-              "Simulation time (ns)",
-              "Number of broken stacking interactions",
-              "Simulated Annealing",
-              legend,
-              "broken_stacking_vs_time.svg",
-              fig_width,
-              fig_height)
-
-    plot_histogram(consecutive_stacked)
-
-    # print statistics
-    frame_600ns = 12000
+    with trace_stage("read and analyze stacking"):
+        time, n_broken_stacking, consecutive_stacked = get_data(paths, n_residues, com_dir, vec_dir, ds, strand_lengths, dtype, xtc_inputs, chunk_size)
+
+    if not stats_only:
+        # set rcParams
+        font_leg = set_rcParameters()
+
+        # set figure dimensions
+        fig_width   = 5
+        golden_mean = (np.sqrt(5)-1.0)/2.0     # aesthetic ratio
+        fig_height  = fig_width*golden_mean    # height in inches
+
+        # plot the data
+        with trace_stage("plot broken stacking"):
+            plot_data(time,
+                      n_broken_stacking,
+                      "Simulation time (ns)",
+                      "Number of broken stacking interactions",
+                      "Simulated Annealing",
+                      legend,
+                      "broken_stacking_vs_time.svg",
+                      fig_width,
+                      fig_height,
+                      max_points)
+
+        with trace_stage("plot stacking histogram"):
+            plot_histogram(consecutive_stacked)
+
+    # print statistics (windows measured in ns: all frames and excluding first 600 ns)
+    windows      = {"all": [None, None], "after_600ns": [600, None]}
+    broken_stats = [update_window_stats({}, time, n_broken_stacking[i], windows) for i in range(len(n_broken_stacking))]
+    error        = lambda i, window: format_error_estimate(time, n_broken_stacking[i], windows[window]) if errors else ""
     for i in range(len(n_broken_stacking)):
-        print("Average number of broken stacking for file " + str(i+1) + ": " + str(round(statistics.mean(n_broken_stacking[i]),1)) + " +/- " + str(round(statistics.stdev(n_broken_stacking[i]),1)))
+        mean, stdev = get_mean_and_stdev(broken_stats[i]["all"])
+        print("Average number of broken stacking for file " + str(i+1) + ": " + str(round(mean,1)) + " +/- " + str(round(stdev,1)) + error(i, "all"))
     for i in range(len(n_broken_stacking)):
-        if len(n_broken_stacking[i]) > frame_600ns+1:
-            print("Average number of broken stacking for file " + str(i+1) + " (excluding first 600 ns): " + str(round(statistics.mean(n_broken_stacking[i][frame_600ns:]),1)) + " +/- " + str(round(statistics.stdev(n_broken_stacking[i][frame_600ns:]),1)))
+        if broken_stats[i]["after_600ns"][0] > 1:
+            mean, stdev = get_mean_and_stdev(broken_stats[i]["after_600ns"])
+            print("Average number of broken stacking for file " + str(i+1) + " (excluding first 600 ns): " + str(round(mean,1)) + " +/- " + str(round(stdev,1)) + error(i, "after_600ns"))
 
 if __name__ == "__main__": 
     main()
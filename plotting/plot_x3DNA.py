@@ -6,11 +6,22 @@
 """
    usage: python3 plot_x3DNA.py
       1. list of model names for legend (must be parallel w.r.t the arguments i to i+n)
-      2. run duration in ns
+      2. run duration in ns, i.e. the .dat files <file name>_1.dat to <file name>_<duration/30>.dat are read
+         (0 to read every <file name>_<i>.dat on disk)
       3. file name
       4. parameter
       i. path to directories that contain arguments (2.) and (3.) that you want to plot
 
+   optional arguments (can be given anywhere on the command line):
+      --max-points=N  draw each smoothed series with at most N vertices, chosen so that the line looks the
+                      same (default: 0, i.e. every frame)
+      --stats-only    only print the statistics, without plotting (matplotlib is then not imported)
+      --errors        also print the standard error of each mean, which accounts for the correlation
+                      between frames (see get_error_estimate in functions_for_plots.py)
+
+   The averaged parameter, its smoothed version, and its statistics of each directory (i.) are saved in the
+   analysis store (ANALYSIS_STORE_DIR, see README.md). When a trajectory is extended, only the new .dat files are read on the next run.
+
    examples: python3 plot_x3DNA.py \
             "(a),(b),(d),(a),(b),(d)" \
             600 \
@@ -38,18 +49,26 @@
 
 import sys
 import numpy as np 
+import os
+import re
 import math
-import copy
 from functions_for_plots import *
 
 # command line input
-input_list  = sys.argv[1].replace("\\n", "\n").replace("\\t", "\t").replace("\\(", "(").replace("\\)", ")")
-legend      = input_list.split(',')
-duration    = float(sys.argv[2])
-file_prefix = str(sys.argv[3])
-parameter   = str(sys.argv[4])
-y_label     = sys.argv[5].replace("\\n", "\n").replace("\\t", "\t").replace("\\(", "(").replace("\\)", ")")
-paths       = list(sys.argv[6:])
+argv, options = split_command_line(sys.argv[1:], {"max_points": 0, "stats_only": False, "errors": False})
+input_list    = argv[0].replace("\\n", "\n").replace("\\t", "\t").replace("\\(", "(").replace("\\)", ")")
+legend        = input_list.split(',')
+duration      = float(argv[1])
+file_prefix   = str(argv[2])
+parameter     = str(argv[3])
+y_label       = argv[4].replace("\\n", "\n").replace("\\t", "\t").replace("\\(", "(").replace("\\)", ")")
+paths         = list(argv[5:])
+max_points    = options["max_points"]
+stats_only    = options["stats_only"]
+errors        = options["errors"]
+
+# windows (measured in ns) of the statistics: excluding first 200 ns
+STATS_WINDOWS = {"after_200ns": [200, None]}
 
 # add trailing forward slash to directory path if necessary
 for path in range(len(paths)):
@@ -85,52 +104,160 @@ def normalize_range(old_angle : np.float64, start : float, end : float) -> np.fl
 
     return new_angle
 
-def get_data(file_name):
-    # template dictionary
-    dict_temp = {}
-
-    # stores the data
-    data = {}
-
-    # records the time step
-    time_step = None
-
-    # iterating over multiple files because I analyzed the trajectory in 30 ns intervals
-    n_files = int(duration/30)
-    for i in range(1,n_files+1):
-        n_skipped = 0
-        skipping  = False # skip first time step of every file except the very first file (i.e. ignore repetitive data)
-        with open(file_name+"_"+str(i)+".dat", "r") as f:
-            for line in f:
-                if len(line.strip()) != 0 : # make sure line isn't empty
-                    line_split = line.split()
-                    if line[0] in ['#']: # title, labels, and comments in file
-                        if line_split[1] == 'Time':
-                            if n_skipped == 0 and i != 1:
-                                skipping = True
-                                n_skipped += 1
-                            else:
-                                time_step       = float(line_split[3])/1000 # convert ps -> ns
-                                data[time_step] = copy.deepcopy(dict_temp)
-                                skipping        = False
-                        else:
-                            dict_temp = {str(line_split[0][1:]).lower(): [],
-                                         str(line_split[1]).lower(): [],
-                                         str(line_split[2]).lower(): [],
-                                         str(line_split[3]).lower(): [],
-                                         str(line_split[4]).lower(): [],
-                                         str(line_split[5]).lower(): []}
-                            # list of DNA parameters
-                            parameters = list(dict_temp.keys())
-                        continue
-                    elif not skipping:
-                        for j in range(len(parameters)):
-                            param = parameters[j]
-                            value = float(line_split[j])
-                            #if param == "twist":
-                                #value = normalize_range(value, 0, 360) # convert range of angle from [-180, 180] -> [0, 360]
-                            data[time_step][param].append(value)
-    return data
+def get_chunk_files(file_name, duration=0):
+    """
+        Lists the .dat files of a run, i.e. `<file_name>_1.dat`, `<file_name>_2.dat`, ... (I analyzed the
+        trajectory in 30 ns intervals).
+
+        Parameters:
+            file_name   (str)       : path and prefix of the .dat files
+            duration    (float)     : run duration in ns; only the first int(duration/30) files are listed
+                                      (0 for every file on disk)
+
+        Returns:
+            chunk_files (list[str]) : paths of the .dat files in the order of the trajectory
+    """
+
+    chunk_files = []
+    while os.path.isfile(file_name + "_" + str(len(chunk_files)+1) + ".dat"):
+        chunk_files.append(file_name + "_" + str(len(chunk_files)+1) + ".dat")
+
+    if duration:
+        n_files = int(duration/30)
+        if len(chunk_files) < n_files:
+            sys.exit("Expected " + str(n_files) + " files " + file_name + "_<i>.dat for a " + str(duration) + " ns run, found " + str(len(chunk_files)) + ".")
+        chunk_files = chunk_files[:n_files]
+    elif not chunk_files:
+        sys.exit("No files " + file_name + "_<i>.dat found.")
+
+    return chunk_files
+
+def read_dat_file(file_name):
+    """
+        Reads a .dat file of base-step parameters into an array.
+
+        Parameters:
+            file_name  (str)           : path to .dat file
+
+        Returns:
+            time       (numpy.ndarray) : time (measured in ns) of each frame
+            data       (numpy.ndarray) : parameters, shape (frames, base steps, parameters)
+            parameters (list[str])     : names of the parameters (lower case), e.g. "twist"
+    """
+
+    with open(file_name, "rb") as f:
+        text = f.read()
+
+    # title, labels, and comments in file: "# Time = <ps>" starts a frame, and the last other comment
+    # before the first data line holds the parameter names
+    time       = np.array(re.findall(rb"#\s*Time\s*=\s*(\S+)", text), dtype=np.float64)/1000 # convert ps -> ns
+    first_data = re.search(rb"^[ \t]*[^#\s]", text, flags=re.M)
+    headers    = re.findall(rb"^#(?!\s*Time\b)(.*)$", text[:first_data.start() if first_data else len(text)], flags=re.M)
+    if not headers:
+        sys.exit("No comment line naming the parameters found before the data of " + file_name + ".")
+    parameters = headers[-1].decode().lower().split()
+    values     = parse_xvg_body(b"".join(line for line in text.splitlines(keepends=True) if line.strip() and not line.startswith(b"#")))
+
+    if (len(time) == 0) or (len(values) % len(time) != 0):
+        sys.exit("Could not split the " + str(len(values)) + " lines of " + file_name + " into " + str(len(time)) + " frames.")
+
+    return time, values.reshape(len(time), len(values)//len(time), values.shape[1]), parameters
+
+def get_data(file_name, parameters=None, duration=0, start=0):
+    """
+        Reads every .dat file of a run (see get_chunk_files). The first frame of every file except the
+        very first one repeats the last frame of the previous file and is skipped.
+
+        Parameters:
+            file_name  (str)           : path and prefix of the .dat files
+            parameters (list[str])     : names of the parameters to keep, e.g. ["twist"] (None for all)
+            duration   (float)         : run duration in ns (0 for every file on disk)
+            start      (int)           : number of .dat files to skip (i.e. that were read before)
+
+        Returns:
+            time       (numpy.ndarray) : time (measured in ns) of each frame
+            data       (numpy.ndarray) : parameters, shape (frames, base steps, parameters)
+            parameters (list[str])     : names of the parameters along the last axis of data
+    """
+
+    time_chunks = []
+    data_chunks = []
+    for i, chunk_file in enumerate(get_chunk_files(file_name, duration)[start:], start):
+        time, data, names = read_shared_input(read_dat_file, chunk_file)
+
+        if parameters is None:
+            parameters = names
+        missing = [param for param in parameters if param not in names]
+        if missing:
+            sys.exit("Parameter(s) " + ", ".join(missing) + " not found in " + chunk_file + " (parameters: " + ", ".join(names) + ").")
+        columns = [names.index(param) for param in parameters]
+
+        skip = 0 if i == 0 else 1 # ignore repetitive data
+        time_chunks.append(time[skip:])
+        data_chunks.append(data[skip:, :, columns])
+
+    return np.concatenate(time_chunks), np.concatenate(data_chunks), parameters
+
+def get_avg_param(data, parameter):
+    # average of the parameter over the base steps of each configuration
+    included = np.ones(data.shape[1], dtype=bool)
+    if parameter == "twist":
+        # exclude terminal base pairs at each end of the DNA duplex for twist
+        n_bp_excluded = 3
+        included[:n_bp_excluded]  = False
+        included[-n_bp_excluded:] = False
+    return np.mean(data[:, :, 0], axis=1, where=included)
+
+def update_x3DNA_analysis(file_name, parameter, duration=0):
+    """
+        Gets the average of a parameter per configuration. The series and its statistics are saved in
+        the analysis store (see save_analysis_state) together with the size and
+        modification time of each .dat file read, so that only the .dat files added since the last run
+        are read when the trajectory is extended.
+
+        Parameters:
+            file_name    (str)                 : path and prefix of the .dat files
+            parameter    (str)                 : name of the parameter, e.g. "twist"
+            duration     (float)               : run duration in ns (0 for every file on disk)
+
+        Returns:
+            time         (numpy.ndarray)       : time (measured in ns)
+            avg_param    (numpy.ndarray)       : see get_avg_param
+            smoothed     (list[numpy.ndarray]) : see smooth_data
+            window_stats (dict)                : see update_window_stats
+    """
+
+    windows = STATS_WINDOWS
+
+    chunks = []
+    for chunk_file in get_chunk_files(file_name, duration):
+        stat = os.stat(chunk_file)
+        chunks.append([os.path.basename(chunk_file), stat.st_size, stat.st_mtime_ns])
+
+    entry       = get_analysis_store_entry(file_name, os.path.basename(file_name) + "_" + parameter)
+    settings    = {"file_name": os.path.basename(file_name), "parameter": parameter, "smoothing": SMOOTHING_WINDOWS, "windows": windows}
+    info, saved = load_analysis_state(entry, settings)
+    if info is None or info["chunks"] != chunks[:len(info["chunks"])]: # first run, or a .dat file that was read changed
+        info  = {"chunks": [], "stats": {}}
+        saved = {"time": np.zeros(0), "avg_param": np.zeros(0)}
+
+    n_old    = len(saved["avg_param"])
+    smoothed = [saved["smoothed_" + str(itr)] for itr in range(len(SMOOTHING_WINDOWS))] if n_old else None
+    if n_old and len(info["chunks"]) == len(chunks): # no new .dat files
+        return saved["time"], saved["avg_param"], smoothed, info["stats"]
+
+    time, data, _ = get_data(file_name, [parameter], duration, start=len(info["chunks"]))
+    time          = np.concatenate((saved["time"], time))
+    avg_param     = np.concatenate((saved["avg_param"], get_avg_param(data, parameter)))
+    smoothed      = smooth_data(avg_param, smoothed)
+    window_stats  = update_window_stats(info["stats"], time[n_old:], avg_param[n_old:], windows)
+
+    arrays = {"time": time, "avg_param": avg_param}
+    for itr in range(len(smoothed)):
+        arrays["smoothed_" + str(itr)] = smoothed[itr]
+    save_analysis_state(entry, settings, {"chunks": chunks, "stats": window_stats}, arrays)
+
+    return time, avg_param, smoothed, window_stats
 
 # this function was grabbed from:
 # https://matplotlib.org/stable/gallery/subplots_axes_and_figures/secondary_axis.html
@@ -151,6 +278,7 @@ inverse = forward
 #
 ################################################################################################
 
+@trace_stage("plot_x3DNA")
 def main():
     # rgb colors used for plots
     colors = {"(a)": (0.894, 0.102, 0.11),
@@ -160,39 +288,35 @@ def main():
               "(e)": (1,     0.498, 0) 
     }
 
-    # set rcParams
-    font_leg = set_rcParameters()
+    if not stats_only:
+        # set rcParams
+        font_leg = set_rcParameters()
 
-    # set figure dimensions
-    fig, axes = plt.subplots(1, 2, sharey=True, figsize=(6.7, 1.4))
+        # set figure dimensions
+        fig, axes = plt.subplots(1, 2, sharey=True, figsize=(6.7, 1.4))
 
     for i in range(len(paths)):
         path = paths[i]
+        # get the average twist per configuration
+        with trace_stage("read and analyze file " + str(i+1)):
+            time, avg_param, smoothed, window_stats = update_x3DNA_analysis(path+file_prefix, parameter, duration)
+
+        # print statistics (not for a run shorter than 200 ns)
+        if window_stats["after_200ns"][0] > 1:
+            mean, stdev = get_mean_and_stdev(window_stats["after_200ns"])
+            error       = format_error_estimate(time, avg_param, STATS_WINDOWS["after_200ns"]) if errors else ""
+            print("Average twist for file " + str(i+1) + " (excluding 3 terminal base pairs on each end and first 200 ns): " + str(round(mean,1)) + " +/- " + str(round(stdev,1)) + error)
+
+        if stats_only:
+            continue
+
         if i < (len(paths)//2):
             ax1 = axes[0]
         elif i == (len(paths)//2):
             ax1 = axes[1]
-        data = get_data(path+file_prefix)
-
-        # get the average twist per configuration
-        avg_param = []
-        for dt in data:
-            if parameter == "twist":
-                # exclude terminal base pairs at each end of the DNA duplex for twist
-                n_bp_excluded = 3
-                avg_param.append(statistics.mean(data[dt][parameter][n_bp_excluded:-n_bp_excluded]))
-            else:
-                avg_param.append(statistics.mean(data[dt][parameter]))
-
-        # print statistics
-        frame_200ns  = 4000
-        print("Average twist for file " + str(i+1) + " (excluding 3 terminal base pairs on each end and first 200 ns): " + str(round(statistics.mean(avg_param[frame_200ns:]),1)) + " +/- " + str(round(statistics.stdev(avg_param[frame_200ns:]),1)))
-
-        # get time
-        time = list(data.keys())
 
         # plot data
-        ax1.plot(time, moving_average(moving_average(avg_param, 500), 100), label=legend[i], color=colors[legend[i]])
+        ax1.plot(*downsample_lttb(time, smoothed[-1], max_points), label=legend[i], color=colors[legend[i]])
 
         if i == 0:
             # label leftmost y-axis
@@ -223,6 +347,9 @@ def main():
         # show grid
         ax1.grid(True)
 
+    if stats_only:
+        return
+
     # set the range of y-axis
     plt.ylim(22, 38)
 
@@ -232,7 +359,8 @@ def main():
     plt.tight_layout()
 
     # save figure
-    plt.savefig(parameter+"_plot.svg", bbox_inches="tight", dpi=600)
+    with trace_stage("savefig " + parameter + "_plot.svg"):
+        plt.savefig(parameter+"_plot.svg", bbox_inches="tight", dpi=600)
 
 if __name__ == "__main__": 
     main()
@@ -0,0 +1,311 @@
+"""
+    Author: Rachel Bricker
+    Year:   2025
+"""
+
+"""
+    Draws the figures listed in a job-spec file (JSON or TOML) with the plotting scripts of this directory.
+
+    Each job runs one plotting script (e.g. plot_hbond.py) with the arguments it takes on the command line. The
+    jobs run concurrently in worker processes on the non-interactive Agg backend; each worker imports the
+    scripts' dependencies and sets the rcParams (see set_rcParameters) once, instead of once per figure. Jobs
+    that read the same input file (e.g. two figures of `hbond.xvg` of the same scenario) run one after the other
+    in the same worker, so that the files parsed by the first one (the .xvg files of plot_hbond.py and
+    plot_radius_of_gyration.py and the .dat files of plot_x3DNA.py) are reused by the others (see
+    read_shared_input); jobs that only share a scenario directory run in parallel, and reuse each other's
+    parsed files and analyses through the on-disk cache and analysis stores.
+
+    Every job writes its figure and a log of what the script printed (`<name>.log`) into its own output
+    directory, `<output_dir>/<name>/`.
+"""
+
+"""
+   usage: python3 run_figures.py
+      1. path to job-spec file (.json or .toml)
+
+   optional arguments:
+      --jobs=N          number of worker processes (default: 0, i.e. number of CPUs)
+      --only=NAME,...   only run the jobs with these names
+
+   job-spec file: a list of jobs, each with
+      name          name of the job (and of its output directory)
+      script        plotting script, e.g. "plot_hbond.py"
+      args          positional arguments of the script, as on the command line (numbers may be given as
+                    numbers); relative paths are relative to the job-spec file
+      options       (optional) optional arguments of the script, e.g. {"stride": 2} for --stride=2 (true
+                    for switches, e.g. {"float32": true})
+   and optionally
+      output_dir    directory holding the output directories of the jobs (default: directory of the
+                    job-spec file)
+
+   example (JSON):
+      {"output_dir": "figures",
+       "jobs": [{"name": "hbond", "script": "plot_hbond.py",
+                 "args": ["(a),(b),(d)", "hbond.xvg", "hbond_angle.xvg", 0, 9.1, 1.4, 0,
+                          "AMBER/dsDNA1/", "AMBER/dsDNA3/", "AMBER/dsDNA2/"],
+                 "options": {"stride": 2}},
+                {"name": "gyrate", "script": "plot_radius_of_gyration.py",
+                 "args": [3.7, 1.57, "CHARMM36/ssDNA1/gyrate.xvg", "CHARMM36/ssDNA3/gyrate.xvg"]}]}
+
+   example (TOML, Python 3.11 or later):
+      output_dir = "figures"
+
+      [[jobs]]
+      name   = "twist"
+      script = "plot_x3DNA.py"
+      args   = ["(a),(b)", 3000, "bp_step", "twist", "Twist (deg)", "AMBER/dsDNA1/", "AMBER/dsDNA3/"]
+
+   example: python3 run_figures.py figures.json --jobs=4
+"""
+
+import os
+import sys
+import time
+import json
+import runpy
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# the workers draw the figures without a display
+os.environ["MPLBACKEND"] = "Agg"
+
+import matplotlib as mpl
+import matplotlib.pyplot as plt
+import functions_for_plots
+from functions_for_plots import split_command_line, set_rcParameters
+
+# directory of the plotting scripts
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# rcParams of the worker after set_rcParameters, restored after every job
+worker_rc_params = None
+
+################################################################################################
+#
+# FUNCTIONS
+#
+################################################################################################
+
+def read_job_spec(spec_path):
+    """
+        Reads a job-spec file and turns each job into the command line of its script.
+
+        Parameters:
+            spec_path (str)        : path to job-spec file (.json or .toml)
+
+        Returns:
+            jobs      (list[dict]) : jobs in the order of the file, each with its name, the path to the
+                                     script, its command line arguments (argv), its output directory,
+                                     and its inputs (see get_job_inputs)
+    """
+
+    if spec_path.endswith(".toml"):
+        try:
+            import tomllib
+        except ImportError:
+            sys.exit("Reading " + spec_path + " needs Python 3.11 or later (tomllib); use a .json job-spec file instead.")
+        with open(spec_path, "rb") as f:
+            spec = tomllib.load(f)
+    else:
+        with open(spec_path) as f:
+            spec = json.load(f)
+
+    spec_dir   = os.path.dirname(os.path.abspath(spec_path))
+    output_dir = os.path.join(spec_dir, spec.get("output_dir", ""))
+
+    jobs  = []
+    names = set()
+    for job in spec.get("jobs", []):
+        for key in ["name", "script", "args"]:
+            if key not in job:
+                sys.exit("Error: job " + str(len(jobs)+1) + " of " + spec_path + " has no '" + key + "'")
+        if job["name"] in names:
+            sys.exit("Error: two jobs of " + spec_path + " are named '" + job["name"] + "'")
+        names.add(job["name"])
+
+        script = os.path.join(SCRIPT_DIR, job["script"])
+        if not os.path.isfile(script):
+            sys.exit("Error: job '" + job["name"] + "': no script " + script)
+
+        # relative paths are relative to the job-spec file (the script runs in the output directory)
+        argv = []
+        for arg in [str(arg) for arg in job["args"]]:
+            path = os.path.join(spec_dir, arg)
+            if os.path.exists(path):
+                arg = os.path.abspath(path) + ("/" if arg.endswith("/") else "")
+            argv.append(arg)
+
+        for name, value in job.get("options", {}).items():
+            if value is True:
+                argv.append("--" + name)
+            elif value is not False:
+                argv.append("--" + name + "=" + str(value))
+
+        jobs.append({"name"       : job["name"],
+                     "script"     : script,
+                     "argv"       : argv,
+                     "output_dir" : os.path.join(output_dir, job["name"]),
+                     "inputs"     : get_job_inputs(spec_dir, job)})
+
+    return jobs
+
+def get_job_inputs(spec_dir, job):
+    """
+        Finds the input files and data directories a job reads: the arguments that are files, and the
+        arguments and option values that name something inside a directory argument (e.g.
+        "hbond.xvg" or "com_files" inside a scenario directory). The directory arguments themselves
+        are not inputs, since jobs of different scripts read different data from the same scenario
+        directory.
+
+        Parameters:
+            spec_dir (str)       : directory of the job-spec file
+            job      (dict)      : job as written in the job-spec file
+
+        Returns:
+            inputs   (list[str]) : real paths of the inputs
+    """
+
+    args        = [str(arg) for arg in job["args"]]
+    names       = args + [str(value) for value in job.get("options", {}).values() if not isinstance(value, bool)]
+    directories = [os.path.join(spec_dir, arg) for arg in args if os.path.isdir(os.path.join(spec_dir, arg))]
+
+    inputs = [os.path.realpath(os.path.join(spec_dir, arg)) for arg in args if os.path.isfile(os.path.join(spec_dir, arg))]
+    for directory in directories:
+        for name in names:
+            path = os.path.join(directory, name)
+            if name and not os.path.exists(os.path.join(spec_dir, name)) and os.path.exists(path):
+                inputs.append(os.path.realpath(path))
+
+    return inputs
+
+def group_jobs(jobs):
+    """
+        Groups the jobs that have an input file in common (directly, or through other jobs), so that
+        they run in the same worker.
+
+        Parameters:
+            jobs   (list[dict])       : jobs (see read_job_spec)
+
+        Returns:
+            groups (list[list[dict]]) : groups of jobs, each in the order of the job-spec file
+    """
+
+    # union-find over the jobs: `parent` links each job to a job of its group
+    parent = list(range(len(jobs)))
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i         = parent[i]
+        return i
+
+    first_user = {} # first job using each input
+    for i, job in enumerate(jobs):
+        for path in job["inputs"]:
+            if path in first_user:
+                parent[find(i)] = find(first_user[path])
+            else:
+                first_user[path] = i
+
+    groups = {}
+    for i, job in enumerate(jobs):
+        groups.setdefault(find(i), []).append(job)
+
+    return list(groups.values())
+
+def init_worker():
+    # set the rcParams once per worker (the scripts' calls of set_rcParameters then only return the
+    # legend font) and keep the loaded inputs in memory
+    global worker_rc_params
+    mpl.use("Agg")
+    functions_for_plots.WORKER_FONT_LEG = set_rcParameters()
+    worker_rc_params = mpl.rcParams.copy()
+    functions_for_plots.SHARED_INPUTS = {}
+
+def run_job(job):
+    """
+        Runs the script of a job in the worker, as if it was run from the command line in the output
+        directory of the job. What the script prints is written to `<name>.log`.
+
+        Parameters:
+            job     (dict)  : job (see read_job_spec)
+
+        Returns:
+            seconds (float) : time taken by the job
+            error   (str)   : why the job failed (None if it did not)
+    """
+
+    os.makedirs(job["output_dir"], exist_ok=True)
+
+    cwd   = os.getcwd()
+    argv  = sys.argv
+    start = time.perf_counter()
+    error = None
+    with open(os.path.join(job["output_dir"], job["name"] + ".log"), "w") as log, contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            os.chdir(job["output_dir"])
+            sys.argv = [job["script"]] + job["argv"]
+            runpy.run_path(job["script"], run_name="__main__")
+        except SystemExit as exit:
+            if exit.code not in [None, 0]:
+                error = str(exit.code)
+        except Exception as exception:
+            error = type(exception).__name__ + ": " + str(exception)
+        finally:
+            os.chdir(cwd)
+            sys.argv = argv
+            plt.close("all")
+            mpl.rcParams.update(worker_rc_params) # undo rcParams changed by the script
+
+    return time.perf_counter()-start, error
+
+def run_job_group(group):
+    # runs jobs that share inputs one after the other; the inputs are only kept in memory for the group
+    functions_for_plots.SHARED_INPUTS.clear()
+    results = [(job["name"],) + run_job(job) for job in group]
+    functions_for_plots.SHARED_INPUTS.clear()
+    return results
+
+def run_figures(spec_path, jobs=None, only=None):
+    all_jobs = read_job_spec(spec_path)
+    if only:
+        unknown = set(only) - set(job["name"] for job in all_jobs)
+        if unknown:
+            sys.exit("Error: no job named " + ", ".join(sorted(unknown)) + " in " + spec_path)
+        all_jobs = [job for job in all_jobs if job["name"] in only]
+    groups = group_jobs(all_jobs)
+
+    start  = time.perf_counter()
+    failed = 0
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker) as pool:
+        # the largest groups first, so that they do not finish last
+        futures = [pool.submit(run_job_group, group) for group in sorted(groups, key=len, reverse=True)]
+        for future in as_completed(futures):
+            for name, seconds, error in future.result():
+                job = next(job for job in all_jobs if job["name"] == name)
+                if error is None:
+                    print(name + ": %.2f s (" % seconds + job["output_dir"] + ")")
+                else:
+                    failed += 1
+                    print(name + ": FAILED (" + error + "), see " + os.path.join(job["output_dir"], name + ".log"))
+
+    print(str(len(all_jobs)-failed) + " figures drawn, " + str(failed) + " failed in %.2f s (%d groups of jobs with shared inputs)" % (time.perf_counter()-start, len(groups)))
+    if failed:
+        sys.exit(1)
+
+################################################################################################
+#
+# MAIN PROGRAM
+#
+################################################################################################
+
+def main():
+    # command line input
+    argv, options = split_command_line(sys.argv[1:], {"jobs": 0, "only": ""})
+    spec_path     = str(argv[0])
+    jobs          = options["jobs"] or None
+    only          = options["only"].split(",") if options["only"] else None
+
+    run_figures(spec_path, jobs, only)
+
+if __name__ == "__main__":
+    main()
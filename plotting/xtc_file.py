@@ -0,0 +1,424 @@
+# Function file for reading and writing GROMACS .xtc trajectories without GROMACS
+# usage: from xtc_file import *
+# Author: Rachel Bricker
+
+"""
+    A .xtc file is a sequence of frames written in the XDR format (big-endian 4-byte integers and
+    floats). Each frame is:
+        magic number (1995), number of atoms, step, time (ps)
+        box vectors (3 x 3 floats, nm)
+        number of atoms (again)
+        if there are 9 atoms or fewer: the coordinates (3 x atoms floats, nm)
+        otherwise the compressed coordinates:
+            precision, minimum (3 ints), maximum (3 ints), smallidx, number of bytes, bytes
+            (padded to a multiple of 4)
+
+    The compressed coordinates are the coordinates multiplied by the precision and rounded to integers.
+    Each atom is written in the bits needed for the range [minimum, maximum] of the frame, unless it
+    is close to the previous atom, in which case only its (small) difference to that atom is written.
+    The algorithm is the one of `xdrfile.c` (xdrfile_decompress_coord_float) of the GROMACS xdrfile
+    library.
+"""
+
+import os
+import struct
+import numpy as np
+
+XTC_MAGIC = 1995
+
+# integer sizes used to encode the differences between neighboring atoms (from xdrfile.c)
+MAGICINTS = [0, 0, 0, 0, 0, 0, 0, 0, 0, 8, 10, 12, 16, 20, 25, 32, 40, 50, 64,
+             80, 101, 128, 161, 203, 256, 322, 406, 512, 645, 812, 1024, 1290,
+             1625, 2048, 2580, 3250, 4096, 5060, 6501, 8192, 10321, 13003,
+             16384, 20642, 26007, 32768, 41285, 52015, 65536, 82570, 104031,
+             131072, 165140, 208063, 262144, 330280, 416127, 524287, 660561,
+             832255, 1048576, 1321122, 1664510, 2097152, 2642245, 3329021,
+             4194304, 5284491, 6658042, 8388607, 10568983, 13316085, 16777216]
+FIRSTIDX   = 9    # first index of MAGICINTS that is used
+MAX_RUN    = 10   # maximum number of small differences written after an atom (the run is written in 5 bits)
+
+################################################################################################
+#
+# DECOMPRESSION
+#
+################################################################################################
+
+def decompress_xtc_coords(buf, natoms, minint, maxint, smallidx, n_needed=None):
+    """
+        Decodes the compressed coordinates of one frame into integers.
+
+        Parameters:
+            buf      (bytes)         : compressed coordinates
+            natoms   (int)           : number of atoms
+            minint   (list[int])     : minimum of the integer coordinates of each dimension
+            maxint   (list[int])     : maximum of the integer coordinates of each dimension
+            smallidx (int)           : index of MAGICINTS of the first small differences
+            n_needed (int)           : stop after the first n_needed atoms are decoded (None for all
+                                       atoms), e.g. when only the first atoms are analysed
+
+        Returns:
+            coords   (numpy.ndarray) : integer coordinates, shape (n_needed or natoms, 3)
+    """
+
+    if n_needed is None:
+        n_needed = natoms
+
+    sizeint = [maxint[0]-minint[0]+1, maxint[1]-minint[1]+1, maxint[2]-minint[2]+1]
+    if max(sizeint) > 0xffffff:
+        # large range: each dimension is written separately
+        bitsizeint = [size.bit_length() for size in sizeint]
+        bitsize    = 0
+    else:
+        bitsizeint = None
+        bitsize    = (sizeint[0]*sizeint[1]*sizeint[2]).bit_length()
+
+    smaller   = MAGICINTS[max(FIRSTIDX, smallidx-1)]//2
+    smallnum  = MAGICINTS[smallidx]//2
+    sizesmall = MAGICINTS[smallidx]
+
+    coords = []
+    pos    = 0 # bit position in buf
+
+    def receivebits(n_bits):
+        nonlocal pos
+        start = pos >> 3
+        end   = (pos + n_bits + 7) >> 3
+        value = int.from_bytes(buf[start:end], "big") >> ((end << 3) - pos - n_bits)
+        pos  += n_bits
+        return value & ((1 << n_bits) - 1)
+
+    def receiveints(n_bits, size_y, size_z):
+        # the three integers are the digits of one number in a mixed radix, written as bytes
+        # from the least to the most significant
+        value = 0
+        shift = 0
+        while n_bits > 8:
+            value  |= receivebits(8) << shift
+            shift  += 8
+            n_bits -= 8
+        if n_bits > 0:
+            value |= receivebits(n_bits) << shift
+        value, z = divmod(value, size_z)
+        x, y     = divmod(value, size_y)
+        return x, y, z
+
+    run = 0
+    while len(coords) < n_needed:
+        if bitsize == 0:
+            x = receivebits(bitsizeint[0]) + minint[0]
+            y = receivebits(bitsizeint[1]) + minint[1]
+            z = receivebits(bitsizeint[2]) + minint[2]
+        else:
+            x, y, z = receiveints(bitsize, sizeint[1], sizeint[2])
+            x += minint[0]
+            y += minint[1]
+            z += minint[2]
+        prev = (x, y, z)
+
+        # the run (number of small differences x 3) is only written when it changes
+        is_smaller = 0
+        if receivebits(1):
+            run        = receivebits(5)
+            is_smaller = run % 3
+            run       -= is_smaller
+            is_smaller -= 1
+
+        if run > 0:
+            for k in range(0, run, 3):
+                dx, dy, dz = receiveints(smallidx, sizesmall, sizesmall)
+                this = (prev[0]+dx-smallnum, prev[1]+dy-smallnum, prev[2]+dz-smallnum)
+                if k == 0:
+                    # the first atom was interchanged with the second one for a better compression
+                    # of water molecules
+                    coords.append(this)
+                    coords.append(prev)
+                    prev = this
+                else:
+                    coords.append(this)
+                    prev = this
+        else:
+            coords.append(prev)
+
+        smallidx += is_smaller
+        if is_smaller < 0:
+            smallnum = smaller
+            smaller  = MAGICINTS[smallidx-1]//2 if smallidx > FIRSTIDX else 0
+        elif is_smaller > 0:
+            smaller  = smallnum
+            smallnum = MAGICINTS[smallidx]//2
+        sizesmall = MAGICINTS[smallidx]
+
+    return np.array(coords[:n_needed], dtype=np.int64).reshape(-1, 3)
+
+################################################################################################
+#
+# COMPRESSION
+#
+################################################################################################
+
+def compress_xtc_coords(coords):
+    """
+        Encodes the integer coordinates of one frame (inverse of decompress_xtc_coords). Runs of atoms
+        whose differences to the previous atom fit in the small integers are written as differences;
+        the size of the small integers is not changed within a frame.
+
+        Parameters:
+            coords   (numpy.ndarray) : integer coordinates, shape (atoms, 3)
+
+        Returns:
+            minint   (list[int])     : minimum of the integer coordinates of each dimension
+            maxint   (list[int])     : maximum of the integer coordinates of each dimension
+            smallidx (int)           : index of MAGICINTS of the small differences
+            buf      (bytes)         : compressed coordinates
+    """
+
+    coords = np.asarray(coords, dtype=np.int64)
+    natoms = len(coords)
+    minint = coords.min(axis=0).tolist()
+    maxint = coords.max(axis=0).tolist()
+
+    sizeint = [maxint[0]-minint[0]+1, maxint[1]-minint[1]+1, maxint[2]-minint[2]+1]
+    if max(sizeint) > 0xffffff:
+        bitsizeint = [size.bit_length() for size in sizeint]
+        bitsize    = 0
+    else:
+        bitsizeint = None
+        bitsize    = (sizeint[0]*sizeint[1]*sizeint[2]).bit_length()
+
+    # size of the small integers: large enough for the typical distance between neighboring atoms
+    steps    = np.abs(np.diff(coords, axis=0)).max(axis=1) if natoms > 1 else np.zeros(1, dtype=np.int64)
+    target   = 2*np.median(steps) + 2
+    smallidx = FIRSTIDX
+    while smallidx < len(MAGICINTS)-1 and MAGICINTS[smallidx] < target:
+        smallidx += 1
+    smallnum  = MAGICINTS[smallidx]//2
+    sizesmall = MAGICINTS[smallidx]
+
+    out   = bytearray()
+    acc   = 0 # bits not written to out yet
+    n_acc = 0
+
+    def sendbits(value, n_bits):
+        nonlocal acc, n_acc
+        acc    = (acc << n_bits) | value
+        n_acc += n_bits
+        while n_acc >= 8:
+            n_acc -= 8
+            out.append((acc >> n_acc) & 0xff)
+        acc &= (1 << n_acc) - 1
+
+    def sendints(n_bits, size_y, size_z, x, y, z):
+        value = (x*size_y + y)*size_z + z
+        while n_bits > 8:
+            sendbits(value & 0xff, 8)
+            value  >>= 8
+            n_bits  -= 8
+        sendbits(value, n_bits)
+
+    # whether the difference of atom i to atom i+1 (resp. i-1, i-2) fits in the small integers
+    def fits(diff):
+        diff = diff + smallnum
+        return ((diff >= 0) & (diff < sizesmall)).all(axis=1).tolist()
+    fits_next = fits(coords[:-1] - coords[1:]) + [False]
+    fits_prev = [False] + fits(coords[1:] - coords[:-1])
+    fits_skip = [False, False] + fits(coords[2:] - coords[:-2])
+
+    i = 0
+    while i < natoms:
+        # atoms written as small differences after atom `big`; atom i is interchanged with atom i+1
+        big   = i
+        small = []
+        if fits_next[i]:
+            big   = i+1
+            small = [(i, i+1)]
+            prev  = i
+            atom  = i+2
+            while len(small) < MAX_RUN and atom < natoms and (fits_skip[atom] if prev == atom-2 else fits_prev[atom]):
+                small.append((atom, prev))
+                prev  = atom
+                atom += 1
+
+        x, y, z = (coords[big] - minint).tolist()
+        if bitsize == 0:
+            sendbits(x, bitsizeint[0])
+            sendbits(y, bitsizeint[1])
+            sendbits(z, bitsizeint[2])
+        else:
+            sendints(bitsize, sizeint[1], sizeint[2], x, y, z)
+
+        # always write the run: 3 x number of small differences + 1 (the size of the small
+        # integers is unchanged)
+        sendbits(1, 1)
+        sendbits(3*len(small)+1, 5)
+        for atom, prev in small:
+            dx, dy, dz = (coords[atom] - coords[prev] + smallnum).tolist()
+            sendints(smallidx, sizesmall, sizesmall, dx, dy, dz)
+
+        i += 1 + len(small)
+
+    if n_acc:
+        out.append((acc << (8-n_acc)) & 0xff)
+
+    return minint, maxint, smallidx, bytes(out)
+
+################################################################################################
+#
+# FILES
+#
+################################################################################################
+
+def read_xtc_frame(f, n_needed=None):
+    """
+        Reads the next frame of an open .xtc file.
+
+        Parameters:
+            f        (file)          : .xtc file opened in binary mode
+            n_needed (int)           : only decode the first n_needed atoms (None for all atoms)
+
+        Returns:
+            frame    (tuple)         : step (int), time (float, ps), box (numpy.ndarray, shape (3, 3),
+                                       nm), and coordinates (numpy.ndarray, shape (atoms, 3), nm); None
+                                       at the end of the file or if the frame is not complete (i.e.
+                                       still being written)
+    """
+
+    header = f.read(56)
+    if len(header) < 56:
+        return None
+    magic, natoms, step, time = struct.unpack(">iiif", header[:16])
+    if magic != XTC_MAGIC:
+        raise ValueError("Not a .xtc frame (magic number " + str(magic) + ") at byte " + str(f.tell()-56) + " of " + str(f.name))
+    box = np.array(struct.unpack(">9f", header[16:52]), dtype=np.float32).reshape(3, 3)
+
+    if natoms <= 9: # not compressed
+        buf = f.read(12*natoms)
+        if len(buf) < 12*natoms:
+            return None
+        coords = np.frombuffer(buf, dtype=">f4").reshape(natoms, 3).astype(np.float32)
+        return step, time, box, coords[:n_needed]
+
+    buf = f.read(36)
+    if len(buf) < 36:
+        return None
+    precision, minx, miny, minz, maxx, maxy, maxz, smallidx, n_bytes = struct.unpack(">f7ii", buf)
+    buf = f.read(n_bytes + (-n_bytes % 4)) # padded to a multiple of 4 bytes
+    if len(buf) < n_bytes + (-n_bytes % 4):
+        return None
+
+    coords = decompress_xtc_coords(buf, natoms, [minx, miny, minz], [maxx, maxy, maxz], smallidx,
+                                   natoms if n_needed is None else min(n_needed, natoms))
+
+    # same float operations as xdrfile.c
+    inv_precision = np.float32(1.0/np.float64(np.float32(precision)))
+
+    return step, time, box, coords.astype(np.float32)*inv_precision
+
+def iter_xtc_file(file, chunk_size=256, atoms=None, offset=0):
+    """
+        Reads a .xtc file in chunks of frames, so that the memory used does not depend on the length
+        of the trajectory. A last frame that is not complete is left for a later read.
+
+        Parameters:
+            file       (str)           : path to .xtc file
+            chunk_size (int)           : maximum number of frames per chunk
+            atoms      (numpy.ndarray) : indices (starting at 0) of the atoms to keep (None for all
+                                         atoms); the atoms after the last one needed are not decoded
+            offset     (int)           : byte position of the first frame to read (e.g. the offset
+                                         yielded by an earlier read, to only read the frames appended
+                                         since then)
+
+        Yields:
+            step       (numpy.ndarray) : step of each frame
+            time       (numpy.ndarray) : time (measured in ps) of each frame
+            box        (numpy.ndarray) : box vectors (measured in nm), shape (frames, 3, 3)
+            coords     (numpy.ndarray) : coordinates (measured in nm), shape (frames, atoms, 3)
+            offset     (int)           : byte position after the chunk
+    """
+
+    n_needed = None if atoms is None else int(np.max(atoms))+1
+
+    def stack(frames):
+        step   = np.array([frame[0] for frame in frames], dtype=np.int64)
+        time   = np.array([frame[1] for frame in frames], dtype=np.float64)
+        box    = np.stack([frame[2] for frame in frames])
+        coords = np.stack([frame[3] if atoms is None else frame[3][atoms] for frame in frames])
+        return step, time, box, coords
+
+    with open(file, "rb") as f:
+        f.seek(offset)
+        frames = []
+        while True:
+            frame = read_xtc_frame(f, n_needed)
+            if frame is None:
+                break
+            offset = f.tell()
+            frames.append(frame)
+            if len(frames) == chunk_size:
+                yield stack(frames) + (offset,)
+                frames = []
+        if frames:
+            yield stack(frames) + (offset,)
+
+def count_xtc_frames(file):
+    # number of frames of a .xtc file (only the frame headers are read)
+    n_frames = 0
+    size     = os.path.getsize(file)
+    with open(file, "rb") as f:
+        while True:
+            header = f.read(56)
+            if len(header) < 56:
+                break
+            natoms = struct.unpack(">i", header[4:8])[0]
+            if natoms <= 9:
+                f.seek(12*natoms, 1)
+            else:
+                buf = f.read(36)
+                if len(buf) < 36:
+                    break
+                n_bytes = struct.unpack(">i", buf[32:36])[0]
+                f.seek(n_bytes + (-n_bytes % 4), 1)
+            if f.tell() > size: # frame not complete
+                break
+            n_frames += 1
+    return n_frames
+
+def write_xtc_file(file, coords, time, step=None, box=None, precision=1000.0):
+    """
+        Writes a .xtc file (e.g. a synthetic trajectory to test the analysis).
+
+        Parameters:
+            file      (str)           : path to .xtc file
+            coords    (numpy.ndarray) : coordinates (measured in nm), shape (frames, atoms, 3)
+            time      (numpy.ndarray) : time (measured in ps) of each frame
+            step      (numpy.ndarray) : step of each frame (default: frame number)
+            box       (numpy.ndarray) : box vectors (measured in nm), shape (frames, 3, 3) or (3, 3)
+                                        (default: zeros)
+            precision (float)         : coordinates are rounded to 1/precision nm
+    """
+
+    coords    = np.asarray(coords, dtype=np.float32)
+    n_frames  = coords.shape[0]
+    natoms    = coords.shape[1]
+    precision = np.float32(precision)
+    if step is None:
+        step = np.arange(n_frames)
+    if box is None:
+        box = np.zeros((3, 3), dtype=np.float32)
+    box = np.broadcast_to(np.asarray(box, dtype=np.float32), (n_frames, 3, 3))
+
+    with open(file, "wb") as f:
+        for frame in range(n_frames):
+            f.write(struct.pack(">iiif", XTC_MAGIC, natoms, int(step[frame]), float(time[frame])))
+            f.write(box[frame].astype(">f4").tobytes())
+            f.write(struct.pack(">i", natoms))
+            if natoms <= 9:
+                f.write(coords[frame].astype(">f4").tobytes())
+                continue
+
+            # round half away from zero, as xdrfile.c
+            scaled = coords[frame]*precision
+            ints   = np.where(scaled >= 0, scaled+np.float32(0.5), scaled-np.float32(0.5)).astype(np.int64)
+
+            minint, maxint, smallidx, buf = compress_xtc_coords(ints)
+            f.write(struct.pack(">f7ii", precision, *minint, *maxint, smallidx, len(buf)))
+            f.write(buf + bytes(-len(buf) % 4))